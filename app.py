@@ -1,602 +1,514 @@
 # SIDIZ Dashboard v2.5 - 객단가 정합성 수정 완료 버전
 import streamlit as st
-from google.cloud import bigquery
-import pandas as pd
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+import config
+from dashboard_data import (
+    DATA_SOURCES,
+    bulk_detail_queries,
+    bulk_share,
+    bulk_summary_needed,
+    bulk_summary_queries,
+    choose_sources,
+    covers,
+    dashboard_queries,
+    default_periods,
+    insight_queries,
+    mirror_covers,
+    purchase_items_cover,
+    postprocess_insight,
+    rollup_enabled,
+    script_query,
+    split_script_results,
+    timeseries_queries,
+    with_bulk_summary,
+)
+from formatting import change_lines, count, format_bytes, query_stats_by_name, query_stats_frame, show_table
+from query_runner import dry_run, run_queries, run_script, script_stored
+from queries import BULK_REVENUE_THRESHOLD, SCRIPT_SECTIONS
+from result_cache import ResultCache, make_key, query_key, ttl_for
+from result_store import open_store
+from single_flight import SingleFlight
+from rollups import list_source_shards, rollup_coverage
+from timeseries_store import TimeseriesStore, rebucket
+from warmer import start_thread
+
 # 1. 페이지 설정
 st.set_page_config(page_title="SIDIZ Intelligence Dashboard", layout="wide")
 
 @st.cache_resource
 def get_bq_client():
+    # 실행 백엔드 (config.BACKEND) - 'local'이면 local_data.py sync로 받아 둔 Parquet을 DuckDB로 실행 (BigQuery 인증 없음)
+    if config.BACKEND == 'local':
+        try:
+            from local_data import open_client
+            return open_client()
+        except Exception as e:
+            st.error(f"❌ 로컬 데이터 열기 실패: {e}")
+            return None
     try:
+        from google.cloud import bigquery
         info = json.loads(st.secrets["gcp_service_account"]["json_key"])
-        return bigquery.Client.from_service_account_info(info, location="asia-northeast3")
+        return bigquery.Client.from_service_account_info(info, location=config.BQ_LOCATION)
     except Exception as e:
         st.error(f"❌ BigQuery 인증 실패: {e}")
         return None
 
 client = get_bq_client()
 
+@st.cache_resource
+def get_result_cache():
+    # 프로세스 단위 결과 캐시 - 모든 세션/rerun이 공유
+    return ResultCache()
+
+result_cache = get_result_cache()
+
+@st.cache_resource
+def get_timeseries_store():
+    # 프로세스 단위 일별 추이 저장소 - 모든 세션/rerun이 공유
+    return TimeseriesStore()
+
+timeseries_store = get_timeseries_store()
+
+@st.cache_resource
+def get_result_store():
+    # 쿼리별 결과 Parquet 저장소 (result_store.py) - 재시작/재배포 후에도 남고, 같은 디렉터리를 쓰는 replica끼리 공유
+    # 로컬 백엔드는 저장하지 않음 (조회가 충분히 빠르고, 일부 일자만 받아 둔 결과가 BigQuery 백엔드와 공유되면 안 됨)
+    if config.BACKEND == 'local':
+        return None
+    return open_store()
+
+result_store = get_result_store()
+
+@st.cache_resource
+def get_single_flight():
+    # 프로세스 단위 동일 쿼리 합치기 - 여러 세션이 같은 쿼리를 동시에 조회하면 BigQuery job 하나의 결과를 함께 사용
+    return SingleFlight()
+
+single_flight = get_single_flight()
+
+@st.cache_resource
+def get_prefetch_pool():
+    # KPI/추이를 그리는 동안 인사이트 쿼리를 미리 실행하는 백그라운드 스레드 (prefetch_insight_data)
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix='sidiz-prefetch')
+
+prefetch_pool = get_prefetch_pool()
+
+@st.cache_resource
+def get_prefetches():
+    # 미리 조회 {캐시 키: (future, 그 조회의 job 통계 list)} + lock - 모든 세션이 공유
+    # query_log는 rerun마다 새로 만들어지므로 백그라운드 job 통계는 따로 모았다가 결과를 쓰는 load_insight_data가 query_log로 옮김
+    return {}, threading.Lock()
+
+prefetches, prefetch_lock = get_prefetches()
+
+@st.cache_resource
+def start_cache_warmer():
+    # 프로세스당 한 번 - GA4 일별 export가 들어오면 기본 기간 조회를 결과 캐시/추이 저장소에 미리 채움 (warmer.py)
+    if client is None or not config.WARMER_ENABLED:
+        return None
+    return start_thread(client, result_cache, timeseries_store, result_store=result_store, flight=single_flight)
+
+start_cache_warmer()
+
+# 추이 분석 단위 (selectbox 라벨 -> timeseries_store.rebucket group_by)
+TIME_UNITS = {"일별": 'daily', "주별": 'weekly', "월별": 'monthly'}
+
+# 근사 고유 수 모드 HLL++ 상대 표준 오차 (1.04 / √(2^정밀도))
+HLL_RELATIVE_ERROR = 1.04 / (2 ** config.HLL_PRECISION) ** 0.5
+
+# 이번 rerun에서 실행된 BigQuery job 통계 (query_runner.job_stats) - 사이드바 계측 패널에 표시
+query_log = []
+# 조회 비용 가드 결과 (guard_query_budget) - 생략한 조회 구분, 구분별 dry run 예상 바이트
+skipped, estimated_bytes = set(), {}
+
+@st.cache_data(ttl=600)
+def get_rollup_coverage(name='session_daily'):
+    # 롤업에 적재된 일자 목록 (테이블이 아직 없으면 빈 목록 → 원본 쿼리 사용)
+    if client is None or not rollup_enabled(name):
+        return []
+    try:
+        return rollup_coverage(client, name)
+    except Exception:
+        return []
+
+@st.cache_data(ttl=60)
+def local_missing_days(start_c, end_c, start_p, end_p):
+    # 로컬 백엔드에 아직 받지 않은 GA4 일자 (YYYYMMDD, 오늘 이전만) - 이 일자는 집계에서 빠짐
+    if client is None or config.BACKEND != 'local':
+        return []
+    days = set()
+    for start, end in ((start_c, end_c), (start_p, end_p)):
+        day = start
+        while day <= min(end, datetime.now().date() - timedelta(days=1)):
+            days.add(day.strftime('%Y%m%d'))
+            day += timedelta(days=1)
+    if not days:
+        return []
+    try:
+        synced = list_source_shards(client, min(days), max(days))
+    except Exception:
+        return []
+    return sorted(days - set(synced))
+
+def rollup_covers(start_c, end_c, start_p, end_p, name='session_daily'):
+    return covers(get_rollup_coverage(name), start_c, end_c, start_p, end_p)
+
+def query_sources(start_c, end_c, start_p, end_p, approximate=False):
+    return choose_sources(get_rollup_coverage, start_c, end_c, start_p, end_p, approximate)
+
+def mirror_ready(start, end):
+    # 한 기간만 읽는 조회(일별 추이, 대량 구매 상세)의 원본 사본 사용 여부
+    return mirror_covers(get_rollup_coverage, start, end)
+
+def purchase_items_ready(start_c, end_c, start_p=None, end_p=None):
+    return purchase_items_cover(get_rollup_coverage, start_c, end_c, start_p, end_p)
+
+def separate_bulk(start_c, end_c, start_p, end_p, bulk_threshold):
+    # 대량 구매 요약/상세를 요약 쿼리(스크립트) 대신 따로 조회할지 - 기준이 기본값과 다르거나 구매 품목 테이블이 있을 때
+    return bulk_summary_needed(bulk_threshold, purchase_items_ready(start_c, end_c, start_p, end_p))
+
 # -------------------------------------------------
 # 2. 데이터 추출 함수 (객단가 수정)
 # -------------------------------------------------
-def get_dashboard_data(start_c, end_c, start_p, end_p, group_by='daily', data_source="온라인 단독"):
+def get_dashboard_data(queries, ttl):
     if client is None:
-        return None, None
-    
-    s_c = start_c.strftime('%Y%m%d')
-    e_c = end_c.strftime('%Y%m%d')
-    s_p = start_p.strftime('%Y%m%d')
-    e_p = end_p.strftime('%Y%m%d')
-    
-    min_date = min(s_c, s_p)
-    max_date = max(e_c, e_p)
-    
-    # 그룹화 SQL
-    if group_by == 'daily':
-        group_sql = "PARSE_DATE('%Y%m%d', event_date)"
-    elif group_by == 'weekly':
-        group_sql = "DATE_TRUNC(PARSE_DATE('%Y%m%d', event_date), WEEK)"
-    elif group_by == 'monthly':
-        group_sql = "DATE_TRUNC(PARSE_DATE('%Y%m%d', event_date), MONTH)"
-    else:
-        group_sql = "PARSE_DATE('%Y%m%d', event_date)"
-    
-    # 매장 소스 리스트
-    store_sources = ('qr_store_247486', 'qr_store_247482', 'qr_store_252941', 'qr_store_247476',
-                     'store_register_qr', 'qr_store_247483', 'qr_store_247488', 'qr_store_247474',
-                     'qr_store_247489', 'qr_store_247475', 'qr_store_247485', 'qr_store_')
+        return None
     
-    # ========================================
-    # 전체 모드 (기존 유지)
-    # ========================================
-    if data_source == "전체":
-        query = f"""
-        WITH base AS (
-            SELECT 
-                PARSE_DATE('%Y%m%d', event_date) as date,
-                user_pseudo_id,
-                event_name,
-                ecommerce.purchase_revenue,
-                ecommerce.transaction_id,
-                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
-                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
-                items
-            FROM `sidiz-458301.analytics_487246344.events_*`
-            WHERE _TABLE_SUFFIX BETWEEN '{min_date}' AND '{max_date}'
-        ),
-        easy_repair_only_orders AS (
-            SELECT transaction_id
-            FROM base, UNNEST(items) as item
-            WHERE event_name = 'purchase'
-            GROUP BY transaction_id
-            HAVING LOGICAL_AND(
-                REGEXP_CONTAINS(UPPER(IFNULL(item.item_category, '')), r'EASY.REPAIR') OR 
-                REGEXP_CONTAINS(UPPER(IFNULL(item.item_name, '')), r'EASY.REPAIR') OR
-                REGEXP_CONTAINS(item.item_name, r'pad|headrest|cover|leg|wheel|glide|block|seat|easy.repair')
-            )
-        )
-        SELECT 
-            CASE WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_c}') AND PARSE_DATE('%Y%m%d', '{e_c}') THEN 'Current' ELSE 'Previous' END as type,
-            COUNT(DISTINCT user_pseudo_id) as users,
-            COUNT(DISTINCT CASE WHEN s_num = 1 THEN user_pseudo_id END) as new_users,
-            COUNT(DISTINCT CONCAT(user_pseudo_id, CAST(sid AS STRING))) as sessions,
-            COUNTIF(event_name = 'sign_up') as signups,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' THEN transaction_id END) as orders,
-            SUM(IFNULL(purchase_revenue, 0)) as revenue,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' AND purchase_revenue >= 1500000 THEN transaction_id END) as bulk_orders,
-            SUM(CASE WHEN event_name = 'purchase' AND purchase_revenue >= 1500000 THEN purchase_revenue ELSE 0 END) as bulk_revenue,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' AND transaction_id NOT IN (SELECT transaction_id FROM easy_repair_only_orders) THEN transaction_id END) as filtered_orders,
-            SUM(CASE WHEN event_name = 'purchase' AND transaction_id NOT IN (SELECT transaction_id FROM easy_repair_only_orders) THEN purchase_revenue ELSE 0 END) as filtered_revenue
-        FROM base
-        GROUP BY 1 
-        HAVING type IS NOT NULL
-        """
-        
-        ts_query = f"""
-        SELECT 
-            CAST({group_sql} AS STRING) as period_label,
-            COUNT(DISTINCT CONCAT(user_pseudo_id, CAST((SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) AS STRING))) as sessions,
-            SUM(IFNULL(ecommerce.purchase_revenue, 0)) as revenue,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' THEN ecommerce.transaction_id END) as orders
-        FROM `sidiz-458301.analytics_487246344.events_*`
-        WHERE _TABLE_SUFFIX BETWEEN '{s_c}' AND '{e_c}'
-        GROUP BY 1 ORDER BY 1
-        """
+    results, errors = run_queries(client, queries, record=query_log, store=result_store, ttl=ttl, flight=single_flight)
+    if 'summary' in errors:
+        st.error(f"⚠️ 요약 쿼리 오류: {errors['summary']}")
+    return results.get('summary')
+
+
+def get_timeseries_data(queries, ttl):
+    if client is None:
+        return None
+
+    results, errors = run_queries(client, queries, record=query_log, store=result_store, ttl=ttl, flight=single_flight)
+    if 'timeseries' in errors:
+        st.error(f"⚠️ 추이 쿼리 오류: {errors['timeseries']}")
+    return results.get('timeseries')
+
+
+# 상세 분석 탭: (탭 제목, 인사이트 키, 표시 컬럼) - 컬럼 표시 형식은 formatting.COLUMN_FORMATS
+INSIGHT_TABLES = [
+    ("제품별 분석", 'product', ['순위', '제품명', '현재매출', '매출비중', '이전매출', '매출변화', '증감율',
+                              '현재세션', '이전세션', '세션변화', '현재수량', '이전수량', '수량변화']),
+    ("채널별 분석", 'channel_combined', ['순위', '채널', '현재매출', '매출비중', '이전매출', '매출변화', '매출증감율',
+                                       '현재세션', '이전세션', '세션변화', '세션증감율']),
+    ("인구통계별 분석", 'demographics_combined', ['순위', '인구통계', '현재매출', '매출비중', '이전매출', '매출변화', '매출증감율',
+                                                 '현재세션', '이전세션', '세션변화', '세션증감율']),
+    ("지역별 분석", 'demo', ['순위', '지역', '현재매출', '매출비중', '이전매출', '매출변화', '증감율']),
+    ("디바이스별 분석", 'device', ['순위', '디바이스', '현재매출', '매출비중', '이전매출', '매출변화', '증감율']),
+]
+
+INSIGHT_QUERY_LABELS = {
+    'product': '제품별',
+    'breakdown': '채널/지역/디바이스/인구통계별',
+    'channel_combined': '채널별',
+    'demo': '지역별',
+    'device': '디바이스별',
+    'demographics_combined': '인구통계별'
+}
+
+def get_insight_data(queries, ttl):
+    if client is None:
+        return None
     
-    # ========================================
-    # 매장/온라인 모드 (세션 기준 필터링)
-    # ========================================
-    else:
-        # 매장 여부에 따라 필터 조건 결정
-        if data_source == "매장 단독":
-            source_filter = f"sfs.first_source IN {store_sources}"
-        else:  # 온라인 단독
-            source_filter = f"sfs.first_source NOT IN {store_sources}"
-        
-        query = f"""
-        WITH session_first_source_raw AS (
-            SELECT 
-                user_pseudo_id,
-                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
-                FIRST_VALUE(LOWER(COALESCE(
-                    (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
-                    traffic_source.source,
-                    '(direct)'
-                ))) OVER (
-                    PARTITION BY user_pseudo_id, (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1)
-                    ORDER BY event_timestamp
-                ) as first_source
-            FROM `sidiz-458301.analytics_487246344.events_*`
-            WHERE _TABLE_SUFFIX BETWEEN '{min_date}' AND '{max_date}'
-        ),
-        session_first_source AS (
-            SELECT 
-                user_pseudo_id,
-                sid,
-                ANY_VALUE(first_source) as first_source
-            FROM session_first_source_raw
-            GROUP BY user_pseudo_id, sid
-        ),
-        filtered_sessions AS (
-            SELECT user_pseudo_id, sid
-            FROM session_first_source sfs
-            WHERE {source_filter}
-        ),
-        base AS (
-            SELECT 
-                PARSE_DATE('%Y%m%d', e.event_date) as date,
-                e.user_pseudo_id,
-                e.event_name,
-                e.ecommerce.purchase_revenue,
-                e.ecommerce.transaction_id,
-                (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
-                (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
-                e.items
-            FROM `sidiz-458301.analytics_487246344.events_*` e
-            INNER JOIN filtered_sessions fs
-            ON e.user_pseudo_id = fs.user_pseudo_id 
-            AND (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_id' LIMIT 1) = fs.sid
-            WHERE e._TABLE_SUFFIX BETWEEN '{min_date}' AND '{max_date}'
-        ),
-        easy_repair_only_orders AS (
-            SELECT transaction_id
-            FROM base, UNNEST(items) as item
-            WHERE event_name = 'purchase'
-            GROUP BY transaction_id
-            HAVING LOGICAL_AND(
-                REGEXP_CONTAINS(UPPER(IFNULL(item.item_category, '')), r'EASY.REPAIR') OR 
-                REGEXP_CONTAINS(UPPER(IFNULL(item.item_name, '')), r'EASY.REPAIR') OR
-                REGEXP_CONTAINS(item.item_name, r'pad|headrest|cover|leg|wheel|glide|block|seat|easy.repair')
-            )
-        )
-        SELECT 
-            CASE WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_c}') AND PARSE_DATE('%Y%m%d', '{e_c}') THEN 'Current' ELSE 'Previous' END as type,
-            COUNT(DISTINCT user_pseudo_id) as users,
-            COUNT(DISTINCT CASE WHEN s_num = 1 THEN user_pseudo_id END) as new_users,
-            COUNT(DISTINCT CONCAT(user_pseudo_id, CAST(sid AS STRING))) as sessions,
-            COUNTIF(event_name = 'sign_up') as signups,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' THEN transaction_id END) as orders,
-            SUM(IFNULL(purchase_revenue, 0)) as revenue,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' AND purchase_revenue >= 1500000 THEN transaction_id END) as bulk_orders,
-            SUM(CASE WHEN event_name = 'purchase' AND purchase_revenue >= 1500000 THEN purchase_revenue ELSE 0 END) as bulk_revenue,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' AND transaction_id NOT IN (SELECT transaction_id FROM easy_repair_only_orders) THEN transaction_id END) as filtered_orders,
-            SUM(CASE WHEN event_name = 'purchase' AND transaction_id NOT IN (SELECT transaction_id FROM easy_repair_only_orders) THEN purchase_revenue ELSE 0 END) as filtered_revenue
-        FROM base
-        GROUP BY 1 
-        HAVING type IS NOT NULL
-        """
-        
-        ts_query = f"""
-        WITH session_first_source_raw AS (
-            SELECT 
-                user_pseudo_id,
-                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
-                FIRST_VALUE(LOWER(COALESCE(
-                    (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
-                    traffic_source.source,
-                    '(direct)'
-                ))) OVER (
-                    PARTITION BY user_pseudo_id, (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1)
-                    ORDER BY event_timestamp
-                ) as first_source
-            FROM `sidiz-458301.analytics_487246344.events_*`
-            WHERE _TABLE_SUFFIX BETWEEN '{s_c}' AND '{e_c}'
-        ),
-        session_first_source AS (
-            SELECT 
-                user_pseudo_id,
-                sid,
-                ANY_VALUE(first_source) as first_source
-            FROM session_first_source_raw
-            GROUP BY user_pseudo_id, sid
-        ),
-        filtered_sessions AS (
-            SELECT user_pseudo_id, sid
-            FROM session_first_source sfs
-            WHERE {source_filter}
-        ),
-        base AS (
-            SELECT 
-                {group_sql} as period_date,
-                e.user_pseudo_id,
-                e.event_name,
-                e.ecommerce.purchase_revenue,
-                e.ecommerce.transaction_id,
-                (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid
-            FROM `sidiz-458301.analytics_487246344.events_*` e
-            INNER JOIN filtered_sessions fs
-            ON e.user_pseudo_id = fs.user_pseudo_id 
-            AND (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_id' LIMIT 1) = fs.sid
-            WHERE e._TABLE_SUFFIX BETWEEN '{s_c}' AND '{e_c}'
-        )
-        SELECT 
-            CAST(period_date AS STRING) as period_label,
-            COUNT(DISTINCT CONCAT(user_pseudo_id, CAST(sid AS STRING))) as sessions,
-            SUM(IFNULL(purchase_revenue, 0)) as revenue,
-            COUNT(DISTINCT CASE WHEN event_name = 'purchase' THEN transaction_id END) as orders
-        FROM base
-        GROUP BY 1 ORDER BY 1
-        """
+    results, errors = run_queries(client, queries, record=query_log, store=result_store, ttl=ttl, flight=single_flight)
+    for key, e in errors.items():
+        st.sidebar.error(f"❌ {INSIGHT_QUERY_LABELS[key]} 쿼리 실행 오류: {e}")
+    if errors:
+        st.warning(f"⚠️ 일부 인사이트 데이터를 불러오지 못했습니다: {', '.join(INSIGHT_QUERY_LABELS[k] for k in errors)}")
+
+    try:
+        return postprocess_insight(results)
+    except Exception as e:
+        st.sidebar.error(f"❌ 쿼리 결과 처리 오류: {str(e)}")
+        st.error(f"⚠️ 인사이트 데이터 오류: {e}")
+        import traceback
+        st.sidebar.code(traceback.format_exc())
+        return None
+
 
+def get_script_data(query, ttl):
+    if client is None:
+        return None
+
+    results, errors = run_script(client, query, SCRIPT_SECTIONS, record=query_log, store=result_store, ttl=ttl, flight=single_flight)
+    if errors:
+        st.error(f"⚠️ 스크립트 조회 오류: {next(iter(errors.values()))}")
+        return None
     try:
-        return client.query(query).to_dataframe(), client.query(ts_query).to_dataframe()
+        return split_script_results(results)
     except Exception as e:
-        st.error(f"⚠️ 쿼리 오류: {e}")
-        return None, None
+        st.error(f"⚠️ 스크립트 결과 처리 오류: {e}")
+        return None
 
 
-def get_insight_data(start_c, end_c, start_p, end_p, data_source="온라인 단독"):
+def get_bulk_detail_data(queries, ttl):
     if client is None:
         return None
-    
-    s_c = start_c.strftime('%Y%m%d')
-    e_c = end_c.strftime('%Y%m%d')
-    s_p = start_p.strftime('%Y%m%d')
-    e_p = end_p.strftime('%Y%m%d')
-    
-    min_date = min(s_c, s_p)
-    max_date = max(e_c, e_p)
-
-    product_query = """
-    WITH base AS (
-        SELECT 
-            PARSE_DATE('%Y%m%d', event_date) as date,
-            user_pseudo_id,
-            event_name,
-            ecommerce.purchase_revenue,
-            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
-            items
-        FROM `sidiz-458301.analytics_487246344.events_*`
-        WHERE _TABLE_SUFFIX BETWEEN '{min_date}' AND '{max_date}'
-    ),
-    product_items AS (
-        SELECT 
-            b.date,
-            b.user_pseudo_id,
-            b.sid,
-            b.event_name,
-            item.item_id,
-            item.item_name,
-            item.price,
-            item.quantity
-        FROM base b, UNNEST(items) as item
-    ),
-    latest_product_names AS (
-        SELECT 
-            item_id as match_key,
-            ARRAY_AGG(item_name ORDER BY date DESC LIMIT 1)[OFFSET(0)] as product_name
-        FROM product_items
-        GROUP BY match_key
-    ),
-    product_metrics AS (
-        SELECT 
-            item_id as match_key,
-            SUM(CASE 
-                WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_c}') AND PARSE_DATE('%Y%m%d', '{e_c}')
-                AND event_name = 'purchase'
-                THEN COALESCE(price, 0) * COALESCE(quantity, 0)
-                ELSE 0
-            END) as curr_rev,
-            SUM(CASE 
-                WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_p}') AND PARSE_DATE('%Y%m%d', '{e_p}')
-                AND event_name = 'purchase'
-                THEN COALESCE(price, 0) * COALESCE(quantity, 0)
-                ELSE 0
-            END) as prev_rev,
-            COUNT(DISTINCT CASE 
-                WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_c}') AND PARSE_DATE('%Y%m%d', '{e_c}')
-                THEN CONCAT(user_pseudo_id, CAST(sid AS STRING))
-            END) as curr_sess,
-            COUNT(DISTINCT CASE 
-                WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_p}') AND PARSE_DATE('%Y%m%d', '{e_p}')
-                THEN CONCAT(user_pseudo_id, CAST(sid AS STRING))
-            END) as prev_sess,
-            SUM(CASE 
-                WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_c}') AND PARSE_DATE('%Y%m%d', '{e_c}')
-                AND event_name = 'purchase'
-                THEN COALESCE(quantity, 0)
-                ELSE 0
-            END) as curr_qty,
-            SUM(CASE 
-                WHEN date BETWEEN PARSE_DATE('%Y%m%d', '{s_p}') AND PARSE_DATE('%Y%m%d', '{e_p}')
-                AND event_name = 'purchase'
-                THEN COALESCE(quantity, 0)
-                ELSE 0
-            END) as prev_qty
-        FROM product_items
-        GROUP BY match_key
+
+    results, errors = run_queries(client, queries, record=query_log, store=result_store, ttl=ttl, flight=single_flight)
+    if 'bulk_detail' in errors:
+        st.error(f"대량 구매 상세 조회 오류: {errors['bulk_detail']}")
+    return results.get('bulk_detail')
+
+
+def get_bulk_summary_data(queries, ttl):
+    if client is None:
+        return None
+
+    results, errors = run_queries(client, queries, record=query_log, store=result_store, ttl=ttl, flight=single_flight)
+    if 'bulk_summary' in errors:
+        st.error(f"대량 구매 요약 조회 오류: {errors['bulk_summary']}")
+    return results.get('bulk_summary')
+
+# -------------------------------------------------
+# 3. 캐시 경유 조회 (rerun마다 BigQuery 재실행 방지)
+# 캐시 키는 쿼리 템플릿 + 파라미터 fingerprint (result_cache.query_key)
+# -------------------------------------------------
+def load_dashboard_data(start_c, end_c, start_p, end_p, data_source="온라인 단독", approximate=False):
+    ranges = [(start_c, end_c), (start_p, end_p)]
+    queries = dashboard_queries(start_c, end_c, start_p, end_p, data_source, **query_sources(start_c, end_c, start_p, end_p, approximate))
+    return result_cache.get_or_compute(
+        query_key('dashboard', queries), ttl_for(ranges),
+        lambda: get_dashboard_data(queries, ttl_for(ranges))
     )
-    SELECT 
-        n.product_name as product_name,
-        m.curr_rev as current_revenue,
-        m.prev_rev as previous_revenue,
-        m.curr_rev - m.prev_rev as revenue_change,
-        ROUND(SAFE_DIVIDE((m.curr_rev - m.prev_rev) * 100, NULLIF(m.prev_rev, 0)), 1) as revenue_change_pct,
-        m.curr_sess as current_sessions,
-        m.prev_sess as previous_sessions,
-        m.curr_qty as current_quantity,
-        m.prev_qty as previous_quantity
-    FROM product_metrics m
-    JOIN latest_product_names n ON m.match_key = n.match_key
-    WHERE m.curr_rev > 0 OR m.prev_rev > 0
-    ORDER BY m.curr_rev DESC
-    LIMIT 20
-    """.format(min_date=min_date, max_date=max_date, s_c=s_c, e_c=e_c, s_p=s_p, e_p=e_p)
-    
-    channel_combined_query = """
-    WITH base_events AS (
-        SELECT 
-            _TABLE_SUFFIX as suffix,
-            user_pseudo_id,
-            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as session_id,
-            event_name,
-            ecommerce.purchase_revenue,
-            event_timestamp,
-            LOWER(NULLIF(TRIM(COALESCE(traffic_source.source, '')), '')) as raw_source,
-            LOWER(NULLIF(TRIM(COALESCE(traffic_source.medium, '')), '')) as raw_medium
-        FROM `sidiz-458301.analytics_487246344.events_*`
-        WHERE _TABLE_SUFFIX BETWEEN '{min_date}' AND '{max_date}'
-    ),
-    session_mapping AS (
-        SELECT 
-            suffix,
-            user_pseudo_id,
-            session_id,
-            event_name,
-            purchase_revenue,
-            COALESCE(
-                FIRST_VALUE(raw_source IGNORE NULLS) OVER (
-                    PARTITION BY user_pseudo_id, session_id 
-                    ORDER BY event_timestamp 
-                    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-                ),
-                '(direct)'
-            ) as final_source,
-            COALESCE(
-                FIRST_VALUE(raw_medium IGNORE NULLS) OVER (
-                    PARTITION BY user_pseudo_id, session_id 
-                    ORDER BY event_timestamp 
-                    ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
-                ),
-                '(none)'
-            ) as final_medium
-        FROM base_events
-    ),
-    events_with_channel AS (
-        SELECT 
-            suffix,
-            CONCAT(final_source, ' / ', final_medium) as channel,
-            CONCAT(user_pseudo_id, '-', CAST(session_id AS STRING)) as unique_session,
-            event_name,
-            purchase_revenue
-        FROM session_mapping
-    ),
-    aggregated AS (
-        SELECT 
-            channel,
-            SUM(CASE WHEN suffix BETWEEN '{s_c}' AND '{e_c}' AND event_name = 'purchase' THEN IFNULL(purchase_revenue, 0) ELSE 0 END) as current_revenue,
-            SUM(CASE WHEN suffix BETWEEN '{s_p}' AND '{e_p}' AND event_name = 'purchase' THEN IFNULL(purchase_revenue, 0) ELSE 0 END) as previous_revenue,
-            COUNT(DISTINCT CASE WHEN suffix BETWEEN '{s_c}' AND '{e_c}' THEN unique_session END) as current_sessions,
-            COUNT(DISTINCT CASE WHEN suffix BETWEEN '{s_p}' AND '{e_p}' THEN unique_session END) as previous_sessions
-        FROM events_with_channel
-        GROUP BY 1
+
+
+def select_script_query(start_c, end_c, start_p, end_p, data_source, approximate=False):
+    # 스크립트 모드로 조회할 기간이면 스크립트 Query, 아니면 None (dashboard_data.script_query)
+    return script_query(start_c, end_c, start_p, end_p, data_source, **query_sources(start_c, end_c, start_p, end_p, approximate))
+
+
+def load_script_data(start_c, end_c, start_p, end_p, data_source="온라인 단독", approximate=False):
+    # 스크립트 모드: {summary, timeseries(일별), insight, bulk_detail} - 스크립트 모드가 아니거나 실패하면 None (기존 조회 경로)
+    query = select_script_query(start_c, end_c, start_p, end_p, data_source, approximate)
+    if query is None:
+        return None
+    ranges = [(start_c, end_c), (start_p, end_p)]
+    return result_cache.get_or_compute(
+        query_key('script', {'script': query}), ttl_for(ranges),
+        lambda: get_script_data(query, ttl_for(ranges))
     )
-    SELECT 
-        channel,
-        IFNULL(current_revenue, 0) as current_revenue,
-        IFNULL(previous_revenue, 0) as previous_revenue,
-        IFNULL(current_revenue - previous_revenue, 0) as revenue_change,
-        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
-        IFNULL(current_sessions, 0) as current_sessions,
-        IFNULL(previous_sessions, 0) as previous_sessions,
-        IFNULL(current_sessions - previous_sessions, 0) as sessions_change,
-        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
-    FROM aggregated
-    WHERE current_revenue > 0 OR previous_revenue > 0 OR current_sessions > 0 OR previous_sessions > 0
-    ORDER BY ABS(IFNULL(current_revenue - previous_revenue, 0)) DESC
-    LIMIT 10
-    """.format(min_date=min_date, max_date=max_date, s_c=s_c, e_c=e_c, s_p=s_p, e_p=e_p)
-    
-    demo_query = """
-    WITH current_demo AS (
-        SELECT CONCAT(IFNULL(geo.country, 'Unknown'), ' / ', IFNULL(geo.city, 'Unknown')) as location, SUM(ecommerce.purchase_revenue) as revenue 
-        FROM `sidiz-458301.analytics_487246344.events_*` 
-        WHERE _TABLE_SUFFIX BETWEEN '{s_c}' AND '{e_c}' AND event_name = 'purchase' 
-        GROUP BY 1
-    ),
-    previous_demo AS (
-        SELECT CONCAT(IFNULL(geo.country, 'Unknown'), ' / ', IFNULL(geo.city, 'Unknown')) as location, SUM(ecommerce.purchase_revenue) as revenue 
-        FROM `sidiz-458301.analytics_487246344.events_*` 
-        WHERE _TABLE_SUFFIX BETWEEN '{s_p}' AND '{e_p}' AND event_name = 'purchase'
-        GROUP BY 1
+
+
+def timeseries_pending(start_c, end_c, data_source):
+    # (저장소 키, 다시 조회할 구간의 쿼리) - 저장된 일별 추이로 충분하면 쿼리는 None
+    use_rollup = rollup_covers(start_c, end_c, start_c, end_c)
+    key = (data_source, use_rollup)
+    missing = timeseries_store.missing_range(key, start_c, end_c)
+    if missing is None:
+        return key, None, None
+    return key, missing, timeseries_queries(missing[0], missing[1], data_source, use_rollup, mirror_ready(missing[0], missing[1]))
+
+
+def load_timeseries_data(start_c, end_c, group_by='daily', data_source="온라인 단독"):
+    # 없는 일자/확정되지 않은 일자만 조회해서 저장소에 추가 -> 저장된 일별 추이를 group_by 단위로 묶음
+    key, missing, queries = timeseries_pending(start_c, end_c, data_source)
+    if queries is not None:
+        daily = get_timeseries_data(queries, ttl_for([missing]))
+        if daily is None:
+            return None
+        timeseries_store.update(key, missing[0], missing[1], daily)
+    return rebucket(timeseries_store.daily(key, start_c, end_c), group_by)
+
+
+def select_insight_queries(start_c, end_c, start_p, end_p, approximate=False):
+    # 인사이트 쿼리는 데이터 소스와 무관 - 소스를 바꿔도 같은 캐시 항목을 사용
+    sources = query_sources(start_c, end_c, start_p, end_p, approximate)
+    return insight_queries(start_c, end_c, start_p, end_p, sources['use_rollup'], sources['use_sketches'], sources['mirrored'])
+
+
+def prefetch_insight_data(start_c, end_c, start_p, end_p, approximate=False):
+    # KPI를 그린 직후 인사이트 쿼리를 백그라운드에서 실행해서 결과 캐시에 넣음 -> 추이 차트와 겹쳐서 실행
+    # 이후 load_insight_data는 미리 조회가 끝나길 기다려서(collect_prefetch) 캐시 적중 + job 통계를 query_log로 옮김
+    # (백그라운드 스레드에서는 st.* 호출 불가 - 실패하면 캐시에 넣지 않고, load_insight_data가 다시 조회하며 오류 표시)
+    if client is None:
+        return
+    ranges = [(start_c, end_c), (start_p, end_p)]
+    queries = select_insight_queries(start_c, end_c, start_p, end_p, approximate)
+    key = query_key('insight', queries)
+    if result_cache.contains(key):
+        return
+
+    record = []
+
+    def run():
+        results, errors = run_queries(client, queries, record=record, store=result_store, ttl=ttl_for(ranges), flight=single_flight)
+        if not errors:
+            result_cache.put(key, postprocess_insight(results), ttl_for(ranges))
+
+    with prefetch_lock:
+        if key in prefetches:
+            return
+        # 끝났는데 가져가지 않은 이전 미리 조회(다른 기간으로 바꾼 경우 등)는 버림
+        for done in [k for k, (future, _) in prefetches.items() if future.done()]:
+            del prefetches[done]
+        future = prefetch_pool.submit(run)
+        future.add_done_callback(log_prefetch_error)
+        prefetches[key] = (future, record)
+
+
+def log_prefetch_error(future):
+    # 백그라운드 스레드의 예외(postprocess_insight/result_cache.put 등)는 st.*로 표시할 수 없어서 로그로 남김
+    error = future.exception()
+    if error is not None:
+        print(f"[prefetch] 인사이트 미리 조회 오류: {error!r}")
+
+
+def collect_prefetch(key):
+    # 같은 쿼리의 미리 조회가 있으면 끝날 때까지 기다리고 그 job 통계를 이번 rerun의 query_log로 옮김
+    with prefetch_lock:
+        prefetch = prefetches.pop(key, None)
+    if prefetch is None:
+        return
+    future, record = prefetch
+    try:
+        future.result()
+    except Exception:
+        # 오류는 log_prefetch_error가 기록 - 결과 캐시에 없으므로 load_insight_data가 다시 조회하며 표시
+        pass
+    query_log.extend(record)
+
+
+def load_insight_data(start_c, end_c, start_p, end_p, approximate=False):
+    ranges = [(start_c, end_c), (start_p, end_p)]
+    queries = select_insight_queries(start_c, end_c, start_p, end_p, approximate)
+    collect_prefetch(query_key('insight', queries))
+    return result_cache.get_or_compute(
+        query_key('insight', queries), ttl_for(ranges),
+        lambda: get_insight_data(queries, ttl_for(ranges)),
+        should_cache=lambda r: all(key in r for _, key, _ in INSIGHT_TABLES)
     )
-    SELECT 
-        COALESCE(c.location, p.location), 
-        IFNULL(c.revenue, 0), 
-        IFNULL(p.revenue, 0), 
-        IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0), 
-        ROUND(SAFE_DIVIDE((IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) * 100, IFNULL(p.revenue, 0)), 1)
-    FROM current_demo c 
-    FULL OUTER JOIN previous_demo p ON c.location = p.location 
-    ORDER BY ABS(IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) DESC 
-    LIMIT 10
-    """.format(s_c=s_c, e_c=e_c, s_p=s_p, e_p=e_p)
-
-    device_query = """
-    WITH current_device AS (
-        SELECT device.category as device, SUM(ecommerce.purchase_revenue) as revenue 
-        FROM `sidiz-458301.analytics_487246344.events_*` 
-        WHERE _TABLE_SUFFIX BETWEEN '{s_c}' AND '{e_c}' AND event_name = 'purchase' 
-        GROUP BY 1
-    ),
-    previous_device AS (
-        SELECT device.category as device, SUM(ecommerce.purchase_revenue) as revenue 
-        FROM `sidiz-458301.analytics_487246344.events_*` 
-        WHERE _TABLE_SUFFIX BETWEEN '{s_p}' AND '{e_p}' AND event_name = 'purchase'
-        GROUP BY 1
+
+
+def select_bulk_detail_queries(start_c, end_c, bulk_threshold=BULK_REVENUE_THRESHOLD):
+    return bulk_detail_queries(start_c, end_c, mirror_ready(start_c, end_c), bulk_threshold, purchase_items_ready(start_c, end_c))
+
+
+def load_bulk_detail_data(start_c, end_c, bulk_threshold=BULK_REVENUE_THRESHOLD):
+    ranges = [(start_c, end_c)]
+    queries = select_bulk_detail_queries(start_c, end_c, bulk_threshold)
+    return result_cache.get_or_compute(
+        query_key('bulk_detail', queries), ttl_for(ranges),
+        lambda: get_bulk_detail_data(queries, ttl_for(ranges))
     )
-    SELECT 
-        COALESCE(c.device, p.device), 
-        IFNULL(c.revenue, 0), 
-        IFNULL(p.revenue, 0), 
-        IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0), 
-        ROUND(SAFE_DIVIDE((IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) * 100, IFNULL(p.revenue, 0)), 1)
-    FROM current_device c 
-    FULL OUTER JOIN previous_device p ON c.device = p.device 
-    ORDER BY ABS(IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) DESC
-    """.format(s_c=s_c, e_c=e_c, s_p=s_p, e_p=e_p)
-
-    demographics_combined_query = """
-    WITH base_events AS (
-        SELECT 
-            _TABLE_SUFFIX as suffix,
-            user_pseudo_id,
-            event_name,
-            ecommerce.purchase_revenue,
-            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as session_id,
-            COALESCE(
-                LOWER((SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
-                LOWER((SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
-                ''
-            ) as gender_raw,
-            COALESCE(
-                (SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
-                (SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
-                'Unknown'
-            ) as age_raw
-        FROM `sidiz-458301.analytics_487246344.events_*`
-        WHERE _TABLE_SUFFIX BETWEEN '{min_date}' AND '{max_date}'
-    ),
-    normalized_demographics AS (
-        SELECT 
-            suffix,
-            user_pseudo_id,
-            session_id,
-            event_name,
-            purchase_revenue,
-            CASE 
-                WHEN gender_raw IN ('male', 'm', 'male_ko', '1') THEN 'Male'
-                WHEN gender_raw IN ('female', 'f', 'female_ko', '2') THEN 'Female'
-                ELSE 'Unknown'
-            END as gender_normalized,
-            COALESCE(NULLIF(age_raw, ''), 'Unknown') as age_normalized
-        FROM base_events
-    ),
-    aggregated AS (
-        SELECT 
-            CONCAT(
-                COALESCE(gender_normalized, 'Unknown'), 
-                ' / ', 
-                COALESCE(age_normalized, 'Unknown')
-            ) as demographic,
-            SUM(CASE WHEN suffix BETWEEN '{s_c}' AND '{e_c}' AND event_name = 'purchase' THEN IFNULL(purchase_revenue, 0) ELSE 0 END) as current_revenue,
-            SUM(CASE WHEN suffix BETWEEN '{s_p}' AND '{e_p}' AND event_name = 'purchase' THEN IFNULL(purchase_revenue, 0) ELSE 0 END) as previous_revenue,
-            COUNT(DISTINCT CASE WHEN suffix BETWEEN '{s_c}' AND '{e_c}' THEN CONCAT(user_pseudo_id, '-', CAST(session_id AS STRING)) END) as current_sessions,
-            COUNT(DISTINCT CASE WHEN suffix BETWEEN '{s_p}' AND '{e_p}' THEN CONCAT(user_pseudo_id, '-', CAST(session_id AS STRING)) END) as previous_sessions
-        FROM normalized_demographics
-        GROUP BY 1
+
+
+def select_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source, bulk_threshold):
+    return bulk_summary_queries(
+        start_c, end_c, start_p, end_p, data_source, bulk_threshold,
+        mirror_covers(get_rollup_coverage, start_c, end_c, start_p, end_p), purchase_items_ready(start_c, end_c, start_p, end_p)
     )
-    SELECT 
-        COALESCE(demographic, 'Unknown / Unknown') as demographic,
-        IFNULL(current_revenue, 0) as current_revenue,
-        IFNULL(previous_revenue, 0) as previous_revenue,
-        IFNULL(current_revenue - previous_revenue, 0) as revenue_change,
-        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
-        IFNULL(current_sessions, 0) as current_sessions,
-        IFNULL(previous_sessions, 0) as previous_sessions,
-        IFNULL(current_sessions - previous_sessions, 0) as sessions_change,
-        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
-    FROM aggregated
-    ORDER BY ABS(IFNULL(revenue_change, 0)) DESC
-    LIMIT 10
-    """.format(min_date=min_date, max_date=max_date, s_c=s_c, e_c=e_c, s_p=s_p, e_p=e_p)
 
-    try:
-        results = {
-            'product': client.query(product_query).to_dataframe(),
-            'channel_combined': client.query(channel_combined_query).to_dataframe(),
-            'demo': client.query(demo_query).to_dataframe(),
-            'device': client.query(device_query).to_dataframe(),
-            'demographics_combined': client.query(demographics_combined_query).to_dataframe()
-        }
-        
-        for key in results:
-            if results[key] is not None and not results[key].empty:
-                numeric_cols = results[key].select_dtypes(include=['float64', 'int64']).columns
-                results[key][numeric_cols] = results[key][numeric_cols].fillna(0)
-        
-        if 'product' in results and not results['product'].empty:
-            results['product'].rename(columns={
-                'product_name': '제품명',
-                'current_revenue': '현재매출',
-                'previous_revenue': '이전매출',
-                'revenue_change': '매출변화',
-                'revenue_change_pct': '증감율',
-                'current_sessions': '현재세션',
-                'previous_sessions': '이전세션',
-                'current_quantity': '현재수량',
-                'previous_quantity': '이전수량'
-            }, inplace=True)
-        
-        if 'product' in results and not results['product'].empty:
-            pdf = results['product']
-            pdf['세션변화'] = pdf['현재세션'] - pdf['이전세션']
-            pdf['수량변화'] = pdf['현재수량'] - pdf['이전수량']
-            total_revenue = pdf['현재매출'].sum()
-            pdf['매출비중'] = (pdf['현재매출'] / total_revenue * 100 if total_revenue > 0 else 0).round(1)
-            pdf = pdf.sort_values(by='현재매출', ascending=False).reset_index(drop=True)
-            results['product'] = pdf
-        
-        results['channel_combined'].columns = ['채널', '현재매출', '이전매출', '매출변화', '매출증감율', '현재세션', '이전세션', '세션변화', '세션증감율']
-        if 'channel_combined' in results and not results['channel_combined'].empty:
-            results['channel_combined'] = results['channel_combined'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
-        
-        results['demo'].columns = ['지역', '현재매출', '이전매출', '매출변화', '증감율']
-        if 'demo' in results and not results['demo'].empty:
-            results['demo'] = results['demo'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
-        
-        results['device'].columns = ['디바이스', '현재매출', '이전매출', '매출변화', '증감율']
-        if 'device' in results and not results['device'].empty:
-            results['device'] = results['device'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
-        
-        results['demographics_combined'].columns = ['인구통계', '현재매출', '이전매출', '매출변화', '매출증감율', '현재세션', '이전세션', '세션변화', '세션증감율']
-        if 'demographics_combined' in results and not results['demographics_combined'].empty:
-            results['demographics_combined'] = results['demographics_combined'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
-        
-        return results
-    except Exception as e:
-        st.sidebar.error(f"❌ 쿼리 실행 오류: {str(e)}")
-        st.error(f"⚠️ 인사이트 데이터 오류: {e}")
-        import traceback
-        st.sidebar.code(traceback.format_exc())
-        return None
 
-def generate_insights(curr, prev, insight_data):
+def load_bulk_summary_data(start_c, end_c, start_p, end_p, data_source, bulk_threshold):
+    ranges = [(start_c, end_c), (start_p, end_p)]
+    queries = select_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source, bulk_threshold)
+    return result_cache.get_or_compute(
+        query_key('bulk_summary', queries), ttl_for(ranges),
+        lambda: get_bulk_summary_data(queries, ttl_for(ranges))
+    )
+
+
+def bulk_detail_loaded(start_c, end_c, bulk_threshold=BULK_REVENUE_THRESHOLD):
+    # 결과 캐시/저장소에 이미 있으면 (워머, 다른 세션) 요청 없이 바로 표시
+    queries = select_bulk_detail_queries(start_c, end_c, bulk_threshold)
+    if result_cache.contains(query_key('bulk_detail', queries)):
+        return True
+    return result_store is not None and all(result_store.contains(q) for q in queries.values())
+
+# -------------------------------------------------
+# 3-1. 조회 비용 가드 (dry run 예상 처리량 vs 예산)
+# -------------------------------------------------
+@st.cache_data(ttl=600, show_spinner=False)
+def estimate_bytes(queries):
+    # queries: ((이름, queries.Query), ...) - 같은 템플릿 + 파라미터의 dry run 결과는 10분간 재사용
+    return dry_run(client, dict(queries))
+
+
+def pending_queries(start_c, end_c, start_p, end_p, data_source, approximate=False, include_bulk=True,
+                    bulk_threshold=BULK_REVENUE_THRESHOLD):
+    # 결과 캐시/추이 저장소/결과 저장소에 없어서 이번 조회에서 실제로 BigQuery에 보낼 쿼리 {구분: {이름: queries.Query}}
+    # include_bulk: 대량 구매 상세는 요청했을 때만 조회 (bulk_detail_requested)
+    # 스크립트 모드면 스크립트 하나 (대량 구매 상세 포함) + 대량 구매를 따로 조회할 때(separate_bulk)는 그 쿼리
+    sources = query_sources(start_c, end_c, start_p, end_p, approximate)
+    script = script_query(start_c, end_c, start_p, end_p, data_source, **sources)
+    bulk_apart = separate_bulk(start_c, end_c, start_p, end_p, bulk_threshold)
+    candidates = {}
+    if script is None:
+        candidates['dashboard'] = dashboard_queries(start_c, end_c, start_p, end_p, data_source, **sources)
+        candidates['insight'] = insight_queries(start_c, end_c, start_p, end_p, sources['use_rollup'], sources['use_sketches'], sources['mirrored'])
+    if bulk_apart:
+        candidates['bulk_summary'] = select_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source, bulk_threshold)
+    if include_bulk and (script is None or bulk_apart):
+        candidates['bulk_detail'] = select_bulk_detail_queries(start_c, end_c, bulk_threshold)
+    pending = {
+        kind: queries for kind, queries in candidates.items()
+        if not result_cache.contains(query_key(kind, queries))
+    }
+    if script is None:
+        _, _, ts_queries = timeseries_pending(start_c, end_c, data_source)
+        if ts_queries is not None:
+            pending['timeseries'] = ts_queries
+    if result_store is not None:
+        # 결과 저장소에 있는 쿼리는 BigQuery로 보내지 않음
+        pending = {kind: {name: q for name, q in queries.items() if not result_store.contains(q)} for kind, queries in pending.items()}
+        pending = {kind: queries for kind, queries in pending.items() if queries}
+    if script is not None and not result_cache.contains(query_key('script', {'script': script})):
+        if result_store is None or not script_stored(result_store, script, SCRIPT_SECTIONS):
+            pending['script'] = {'script': script}
+    return pending
+
+
+def guard_query_budget(start_c, end_c, start_p, end_p, data_source, approximate=False, bulk_threshold=BULK_REVENUE_THRESHOLD):
+    # 반환: (생략할 구분 set, 구분별 예상 바이트) - 확인이 필요한데 승인되지 않았으면 여기서 st.stop()
+    if client is None or config.QUERY_BUDGET_BYTES <= 0:
+        return set(), {}
+    include_bulk = st.session_state.get('bulk_detail_requested', False)
+    pending = pending_queries(start_c, end_c, start_p, end_p, data_source, approximate, include_bulk, bulk_threshold)
+    estimates = {
+        kind: sum(b or 0 for b in estimate_bytes(tuple(queries.items())).values())
+        for kind, queries in pending.items()
+    }
+    total = sum(estimates.values())
+    budget = config.QUERY_BUDGET_BYTES
+    interaction = make_key('budget', data_source, [(start_c, end_c), (start_p, end_p)])
+    if total <= budget or st.session_state.get('budget_approved') == interaction:
+        return set(), estimates
+
+    # downgrade: 인사이트/대량 구매 상세를 생략해서 예산 안에 들어오면 요약/추이만 조회
+    optional = {kind for kind in ('insight', 'bulk_detail') if kind in estimates}
+    if config.BUDGET_POLICY == 'downgrade' and total - sum(estimates[k] for k in optional) <= budget:
+        st.warning(
+            f"💸 예상 처리량 {format_bytes(total)} (조회 예산 {format_bytes(budget)} 초과) - "
+            f"인사이트/대량 구매 상세 조회를 생략했습니다."
+        )
+        if st.button(f"전체 조회 실행 ({format_bytes(total)})"):
+            st.session_state['budget_approved'] = interaction
+            return set(), estimates
+        return optional, estimates
+
+    st.warning(
+        f"💸 예상 처리량 {format_bytes(total)} (조회 예산 {format_bytes(budget)} 초과) - "
+        f"기간을 줄이거나 실행을 확인해주세요."
+    )
+    if st.button(f"조회 실행 ({format_bytes(total)})"):
+        st.session_state['budget_approved'] = interaction
+        return set(), estimates
+    st.stop()
+
+
+def generate_insights(curr, prev, insight_data, bulk_label):
     insights = []
     
     if not insight_data:
@@ -612,25 +524,16 @@ def generate_insights(curr, prev, insight_data):
     
     if 'product' in insight_data and insight_data['product'] is not None and not insight_data['product'].empty:
         insights.append(f"\n### 🏆 주요 제품 영향 TOP3")
-        for idx, row in insight_data['product'].head(3).iterrows():
-            if abs(row['매출변화']) > 500000:
-                direction = "↑" if row['매출변화'] > 0 else "↓"
-                insights.append(f"**{idx+1}. {row['제품명']}** {direction} ₩{abs(row['매출변화']):,.0f} ({row['증감율']:+.1f}%)")
+        insights.extend(change_lines(insight_data['product'].head(3), '제품명', '매출변화', '증감율', 500000))
     
     if 'channel_combined' in insight_data and insight_data['channel_combined'] is not None and not insight_data['channel_combined'].empty:
         insights.append(f"\n### 🎯 주요 채널 매출 영향 TOP3")
-        for idx, row in insight_data['channel_combined'].head(3).iterrows():
-            if abs(row['매출변화']) > 300000:
-                direction = "↑" if row['매출변화'] > 0 else "↓"
-                insights.append(f"**{idx+1}. {row['채널']}** {direction} ₩{abs(row['매출변화']):,.0f} ({row['매출증감율']:+.1f}%)")
+        insights.extend(change_lines(insight_data['channel_combined'].head(3), '채널', '매출변화', '매출증감율', 300000))
     
     if 'channel_combined' in insight_data and insight_data['channel_combined'] is not None and not insight_data['channel_combined'].empty:
         insights.append(f"\n### 🚪 주요 채널 유입 영향 TOP3")
         channel_sessions_top3 = insight_data['channel_combined'].sort_values('세션변화', ascending=False, key=abs).head(3)
-        for idx, (i, row) in enumerate(channel_sessions_top3.iterrows()):
-            if abs(row['세션변화']) > 100:
-                direction = "↑" if row['세션변화'] > 0 else "↓"
-                insights.append(f"**{idx+1}. {row['채널']}** {direction} {abs(row['세션변화']):,.0f}세션 ({row['세션증감율']:+.1f}%)")
+        insights.extend(change_lines(channel_sessions_top3, '채널', '세션변화', '세션증감율', 100, value=count, unit="세션"))
     
     if 'demographics_combined' in insight_data and insight_data['demographics_combined'] is not None and not insight_data['demographics_combined'].empty:
         try:
@@ -639,10 +542,7 @@ def generate_insights(curr, prev, insight_data):
             
             if not demo_df_filtered.empty and len(demo_df_filtered) > 0:
                 insights.append(f"\n### 👥 인구통계 매출 영향 TOP3")
-                for idx, row in demo_df_filtered.head(3).iterrows():
-                    if abs(row['매출변화']) > 300000:
-                        direction = "↑" if row['매출변화'] > 0 else "↓"
-                        insights.append(f"**{idx+1}. {row['인구통계']}** {direction} ₩{abs(row['매출변화']):,.0f} ({row['매출증감율']:+.1f}%)")
+                insights.extend(change_lines(demo_df_filtered.head(3), '인구통계', '매출변화', '매출증감율', 300000))
         except Exception as e:
             pass
     
@@ -655,10 +555,7 @@ def generate_insights(curr, prev, insight_data):
                 demo_ses_top3 = demo_df_filtered.sort_values('세션변화', ascending=False, key=abs).head(3)
                 if not demo_ses_top3.empty:
                     insights.append(f"\n### 🚶 인구통계 유입 영향 TOP3")
-                    for idx, (i, row) in enumerate(demo_ses_top3.iterrows()):
-                        if abs(row['세션변화']) > 100:
-                            direction = "↑" if row['세션변화'] > 0 else "↓"
-                            insights.append(f"**{idx+1}. {row['인구통계']}** {direction} {abs(row['세션변화']):,.0f}세션 ({row['세션증감율']:+.1f}%)")
+                    insights.extend(change_lines(demo_ses_top3, '인구통계', '세션변화', '세션증감율', 100, value=count, unit="세션"))
         except Exception as e:
             pass
     
@@ -668,7 +565,9 @@ def generate_insights(curr, prev, insight_data):
     if abs(bulk_pct) > 10 or abs(bulk_change) > 5000000:
         direction = "증가" if bulk_change > 0 else "감소"
         insights.append(f"\n### 💼 대량 구매 영향")
-        insights.append(f"대량 구매(150만원↑) 매출이 **₩{abs(bulk_change):,.0f} ({abs(bulk_pct):.1f}%) {direction}**했습니다.")
+        insights.append(f"대량 구매({bulk_label}↑) 매출이 **₩{abs(bulk_change):,.0f} ({abs(bulk_pct):.1f}%) {direction}**했습니다.")
+        # 비중은 대량 구매 매출과 같은 기준(구매 품목 테이블이면 중복 제거)의 전체 구매 매출 대비
+        insights.append(f"구매 매출 중 대량 구매 비중: {bulk_share(prev):.1f}% → {bulk_share(curr):.1f}%")
     
     if 'demo' in insight_data and insight_data['demo'] is not None and not insight_data['demo'].empty:
         top_demo = insight_data['demo'].iloc[0]
@@ -700,14 +599,32 @@ with st.sidebar:
     
     data_source = st.selectbox(
         "📊 데이터 소스",
-        options=["온라인 단독", "전체", "매장 단독"],
+        options=DATA_SOURCES,
         index=0,
         help="온라인 단독: 매장 제외 | 전체: 모든 데이터 | 매장 단독: 매장 QR만"
     )
     
-    curr_date = st.date_input("분석 기간", [today - timedelta(days=7), today - timedelta(days=1)])
-    comp_date = st.date_input("비교 기간", [today - timedelta(days=14), today - timedelta(days=8)])
+    default_curr, default_comp = default_periods(today)
+    curr_date = st.date_input("분석 기간", list(default_curr))
+    comp_date = st.date_input("비교 기간", list(default_comp))
     time_unit = st.selectbox("추이 분석 단위", ["일별", "주별", "월별"])
+    distinct_mode = st.radio(
+        "고유 수 집계",
+        options=["정확", "근사 (HLL++)"],
+        horizontal=True,
+        help="근사: 사용자/신규 사용자/세션 수를 일별 HLL++ 스케치 병합으로 계산 (매출/주문은 항상 정확) - 세션/스케치 롤업이 적재된 기간에만 적용"
+    )
+    approximate = distinct_mode != "정확"
+    if approximate:
+        st.caption(f"HLL++ 정밀도 {config.HLL_PRECISION}: 상대 표준 오차 약 ±{HLL_RELATIVE_ERROR:.2%} (95% 구간 약 ±{2 * HLL_RELATIVE_ERROR:.2%})")
+    bulk_threshold = int(st.number_input(
+        "대량 구매 기준 (원)",
+        min_value=100000,
+        value=BULK_REVENUE_THRESHOLD,
+        step=100000,
+        help="주문 매출이 이 금액 이상이면 대량 구매 - 바꾸면 대량 구매 요약/상세만 다시 조회"
+    ))
+    bulk_label = f"{bulk_threshold / 10000:,.0f}만 원"
 
 if len(curr_date) == 2 and len(comp_date) == 2:
     if data_source == "온라인 단독":
@@ -717,17 +634,45 @@ if len(curr_date) == 2 and len(comp_date) == 2:
     else:
         st.info("📊 **전체 데이터 모드** - 모든 세션 집계")
     
-    summary_df, ts_df = get_dashboard_data(
-        curr_date[0], curr_date[1], 
-        comp_date[0], comp_date[1], 
-        time_unit, 
-        data_source
+    missing_days = local_missing_days(curr_date[0], curr_date[1], comp_date[0], comp_date[1])
+    if missing_days:
+        st.warning(
+            f"🗂️ 로컬 데이터에 없는 일자 {len(missing_days)}일 ({missing_days[0]} ~ {missing_days[-1]})은 집계에서 빠집니다 - "
+            f"`python local_data.py sync --from {missing_days[0]} --to {missing_days[-1]}`"
+        )
+    
+    skipped, estimated_bytes = guard_query_budget(
+        curr_date[0], curr_date[1], comp_date[0], comp_date[1], data_source, approximate, bulk_threshold
     )
+    if approximate and not query_sources(curr_date[0], curr_date[1], comp_date[0], comp_date[1], approximate)['use_sketches']:
+        st.caption("ℹ️ 선택한 기간에 고유 수 스케치 롤업이 없어 정확한 집계로 표시합니다.")
+    
+    # 스크립트 모드: 요약/추이/인사이트/대량 구매 상세를 한 번에 (아니면 None -> 섹션별 조회)
+    script_data = load_script_data(curr_date[0], curr_date[1], comp_date[0], comp_date[1], data_source, approximate)
+    if script_data is not None:
+        summary_df = script_data['summary']
+    else:
+        summary_df = load_dashboard_data(
+            curr_date[0], curr_date[1], 
+            comp_date[0], comp_date[1], 
+            data_source, approximate
+        )
+
+    # 대량 구매 요약을 따로 조회하는 경우 요약의 bulk_orders/bulk_revenue를 바꿈 (실패하면 요약 쿼리 값 그대로)
+    bulk_apart = separate_bulk(curr_date[0], curr_date[1], comp_date[0], comp_date[1], bulk_threshold)
+    if bulk_apart and summary_df is not None and not summary_df.empty:
+        bulk_summary = load_bulk_summary_data(curr_date[0], curr_date[1], comp_date[0], comp_date[1], data_source, bulk_threshold)
+        if bulk_summary is not None:
+            summary_df = with_bulk_summary(summary_df, bulk_summary)
     
     if summary_df is not None and not summary_df.empty:
         curr = summary_df[summary_df['type'] == 'Current'].iloc[0]
         prev = summary_df[summary_df['type'] == 'Previous'].iloc[0] if 'Previous' in summary_df['type'].values else curr
 
+        # 첫 KPI는 요약 쿼리만 기다림 - 인사이트는 여기서 백그라운드로 시작해서 아래 인사이트 섹션에서 결과를 받음
+        if script_data is None and 'insight' not in skipped:
+            prefetch_insight_data(curr_date[0], curr_date[1], comp_date[0], comp_date[1], approximate)
+
         def get_delta(c, p):
             if p == 0:
                 return "0%"
@@ -767,52 +712,45 @@ if len(curr_date) == 2 and len(comp_date) == 2:
             cols[4].metric("필터링 객단가", "데이터 없음", help="EASY REPAIR만 구매한 주문 제외")
 
         st.markdown("---")
-        st.subheader("📦 대량 구매 세그먼트 (150만 원↑)")
+        st.subheader(f"📦 대량 구매 세그먼트 ({bulk_label}↑)")
         b1, b2, b3 = st.columns(3)
         b1.metric("대량 주문 건수", f"{int(curr['bulk_orders'])}건", f"{int(curr['bulk_orders'] - prev['bulk_orders']):+}건")
         b2.metric("대량 구매 매출", f"₩{int(curr['bulk_revenue']):,}", get_delta(curr['bulk_revenue'], prev['bulk_revenue']))
-        b3.metric("대량 매출 비중", f"{(curr['bulk_revenue']/curr['revenue']*100 if curr['revenue']>0 else 0):.1f}%")
+        b3.metric("대량 매출 비중", f"{bulk_share(curr):.1f}%", f"{bulk_share(curr) - bulk_share(prev):+.1f}%p")
         
         with st.expander("🔍 대량 구매 품목별 상세 보기"):
-            bulk_detail_query = f"""
-            SELECT 
-                item.item_name as product_name,
-                COUNT(DISTINCT ecommerce.transaction_id) as order_count,
-                SUM(item.quantity) as total_quantity,
-                SUM(item.price * item.quantity) as item_revenue
-            FROM `sidiz-458301.analytics_487246344.events_*`,
-            UNNEST(items) as item
-            WHERE _TABLE_SUFFIX BETWEEN '{curr_date[0].strftime('%Y%m%d')}' AND '{curr_date[1].strftime('%Y%m%d')}'
-            AND event_name = 'purchase'
-            AND ecommerce.purchase_revenue >= 1500000
-            GROUP BY item.item_name
-            ORDER BY item_revenue DESC
-            LIMIT 20
-            """
-            try:
-                bulk_detail = client.query(bulk_detail_query).to_dataframe()
-                if not bulk_detail.empty:
-                    bulk_detail.columns = ['제품명', '주문수', '수량', '매출액']
-                    bulk_detail['매출비중'] = (bulk_detail['매출액'] / bulk_detail['매출액'].sum() * 100).round(1)
-                    
-                    display_bulk = bulk_detail.copy()
-                    display_bulk.insert(0, '순위', range(1, len(display_bulk) + 1))
-                    display_bulk['주문수'] = display_bulk['주문수'].apply(lambda x: f"{int(x)}건")
-                    display_bulk['수량'] = display_bulk['수량'].apply(lambda x: f"{int(x)}개")
-                    display_bulk['매출액'] = display_bulk['매출액'].apply(lambda x: f"₩{int(x):,}")
-                    display_bulk['매출비중'] = display_bulk['매출비중'].apply(lambda x: f"{x:.1f}%")
-                    
-                    st.dataframe(display_bulk, use_container_width=True, height=400)
-                else:
-                    st.info("대량 구매 품목 데이터가 없습니다.")
-            except Exception as e:
-                st.error(f"대량 구매 상세 조회 오류: {e}")
+            # 요청했거나 이미 조회된 결과가 있을 때만 조회 (펼치지 않는 사용자는 쿼리 비용 없음)
+            script_bulk = script_data is not None and not bulk_apart
+            bulk_requested = script_bulk or bulk_detail_loaded(curr_date[0], curr_date[1], bulk_threshold) or st.toggle(
+                "품목별 상세 불러오기", key='bulk_detail_requested'
+            )
+            bulk_detail = None
+            if script_bulk:
+                bulk_detail = script_data['bulk_detail']
+            elif 'bulk_detail' in skipped:
+                st.info("💸 조회 예산 초과로 대량 구매 상세 조회를 생략했습니다.")
+            elif bulk_requested:
+                bulk_detail = load_bulk_detail_data(curr_date[0], curr_date[1], bulk_threshold)
+            if bulk_detail is not None and not bulk_detail.empty:
+                bulk_detail = bulk_detail.copy()
+                bulk_detail.columns = ['제품명', '주문수', '수량', '매출액']
+                bulk_detail['매출비중'] = (bulk_detail['매출액'] / bulk_detail['매출액'].sum() * 100).round(1)
+                
+                bulk_detail.insert(0, '순위', range(1, len(bulk_detail) + 1))
+                show_table(bulk_detail, list(bulk_detail.columns), height=400)
+            elif bulk_detail is not None:
+                st.info("대량 구매 품목 데이터가 없습니다.")
 
         st.markdown("---")
         st.subheader(f"📊 {time_unit} 매출 추이")
         
+        if script_data is not None:
+            ts_df = rebucket(script_data['timeseries'], TIME_UNITS[time_unit])
+        else:
+            ts_df = load_timeseries_data(curr_date[0], curr_date[1], TIME_UNITS[time_unit], data_source)
         if ts_df is not None and not ts_df.empty:
-            ts_df['conversion_rate'] = (ts_df['orders'] / ts_df['sessions'] * 100).fillna(0)
+            # 캐시된 DataFrame을 직접 수정하지 않도록 assign 사용
+            ts_df = ts_df.assign(conversion_rate=(ts_df['orders'] / ts_df['sessions'] * 100).fillna(0))
             
             fig = make_subplots(specs=[[{"secondary_y": True}]])
             
@@ -835,7 +773,7 @@ if len(curr_date) == 2 and len(comp_date) == 2:
                     name="매출액",
                     marker_color='#50C878',
                     opacity=0.7,
-                    text=ts_df['revenue'].apply(lambda x: f'₩{x/1000000:.1f}M'),
+                    text=(ts_df['revenue'] / 1000000).map('₩{:.1f}M'.format),
                     textposition='outside'
                 ),
                 secondary_y=True
@@ -881,168 +819,95 @@ if len(curr_date) == 2 and len(comp_date) == 2:
         st.subheader("🧠 데이터 기반 인사이트")
         
         with st.spinner("분석 중..."):
-            insight_data = get_insight_data(curr_date[0], curr_date[1], comp_date[0], comp_date[1], data_source)
-            insights = generate_insights(curr, prev, insight_data)
-            st.markdown(insights)
+            if 'insight' in skipped:
+                insight_data = None
+                st.info("💸 조회 예산 초과로 인사이트 분석을 생략했습니다.")
+            else:
+                if script_data is not None:
+                    insight_data = script_data['insight']
+                else:
+                    insight_data = load_insight_data(curr_date[0], curr_date[1], comp_date[0], comp_date[1], approximate)
+                insights = generate_insights(curr, prev, insight_data, bulk_label)
+                st.markdown(insights)
             
             with st.expander("📋 상세 분석 데이터 보기"):
                 if insight_data:
-                    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-                        "제품별 분석", 
-                        "채널별 분석",
-                        "인구통계별 분석",
-                        "지역별 분석", 
-                        "디바이스별 분석"
-                    ])
-                    
-                    def format_currency(val):
-                        try:
-                            if pd.isna(val) or val == 0:
-                                return "₩0"
-                            return f"₩{val:,.0f}"
-                        except:
-                            return "₩0"
-                    
-                    def format_number(val):
-                        try:
-                            if pd.isna(val) or val == 0:
-                                return "0"
-                            return f"{val:,.0f}"
-                        except:
-                            return "0"
-                    
-                    def format_percent(val):
-                        try:
-                            if pd.isna(val):
-                                return "-"
-                            return f"{val:+.1f}%"
-                        except:
-                            return "-"
-                    
-                    with tab1:
-                        if 'product' in insight_data and not insight_data['product'].empty:
-                            display_df = insight_data['product'].copy()
-                            display_df.insert(0, '순위', range(1, len(display_df) + 1))
-                            
-                            display_df['현재매출'] = display_df['현재매출'].apply(format_currency)
-                            display_df['이전매출'] = display_df['이전매출'].apply(format_currency)
-                            display_df['매출변화'] = display_df['매출변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_currency(abs(x))}")
-                            display_df['증감율'] = display_df['증감율'].apply(lambda x: f"{x:+.1f}%")
-                            display_df['매출비중'] = display_df['매출비중'].apply(lambda x: f"{x:.1f}%")
-                            display_df['현재세션'] = display_df['현재세션'].apply(format_number)
-                            display_df['이전세션'] = display_df['이전세션'].apply(format_number)
-                            display_df['세션변화'] = display_df['세션변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_number(abs(x))}")
-                            display_df['현재수량'] = display_df['현재수량'].apply(lambda x: f"{int(x)}개")
-                            display_df['이전수량'] = display_df['이전수량'].apply(lambda x: f"{int(x)}개")
-                            display_df['수량변화'] = display_df['수량변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {int(abs(x))}개")
-                            
-                            cols_to_show = ['순위', '제품명', '현재매출', '매출비중', '이전매출', '매출변화', '증감율', 
-                                          '현재세션', '이전세션', '세션변화', '현재수량', '이전수량', '수량변화']
-                            st.dataframe(display_df[cols_to_show], use_container_width=True, height=600)
-                        else:
-                            st.info("데이터가 없습니다.")
-                    
-                    with tab2:
-                        if 'channel_combined' in insight_data and not insight_data['channel_combined'].empty:
-                            df = insight_data['channel_combined'].copy()
-                            
-                            total_revenue = df['현재매출'].sum()
-                            if total_revenue > 0:
-                                df['매출비중'] = (df['현재매출'] / total_revenue * 100).round(1)
-                            else:
-                                df['매출비중'] = 0
-                            
-                            df.insert(0, '순위', range(1, len(df) + 1))
-                            
-                            df['현재매출'] = df['현재매출'].apply(format_currency)
-                            df['이전매출'] = df['이전매출'].apply(format_currency)
-                            df['매출변화'] = df['매출변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_currency(abs(x))}")
-                            df['매출증감율'] = df['매출증감율'].apply(format_percent)
-                            df['매출비중'] = df['매출비중'].apply(lambda x: f"{x:.1f}%")
-                            df['현재세션'] = df['현재세션'].apply(format_number)
-                            df['이전세션'] = df['이전세션'].apply(format_number)
-                            df['세션변화'] = df['세션변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_number(abs(x))}")
-                            df['세션증감율'] = df['세션증감율'].apply(format_percent)
-                            
-                            cols_to_show = ['순위', '채널', '현재매출', '매출비중', '이전매출', '매출변화', '매출증감율',
-                                          '현재세션', '이전세션', '세션변화', '세션증감율']
-                            st.dataframe(df[cols_to_show], use_container_width=True, height=600)
-                        else:
-                            st.info("데이터가 없습니다.")
-                    
-                    with tab3:
-                        if 'demographics_combined' in insight_data and not insight_data['demographics_combined'].empty:
-                            df = insight_data['demographics_combined'].copy()
-                            
-                            total_revenue = df['현재매출'].sum()
-                            if total_revenue > 0:
-                                df['매출비중'] = (df['현재매출'] / total_revenue * 100).round(1)
-                            else:
-                                df['매출비중'] = 0
-                            
-                            df.insert(0, '순위', range(1, len(df) + 1))
-                            
-                            df['현재매출'] = df['현재매출'].apply(format_currency)
-                            df['이전매출'] = df['이전매출'].apply(format_currency)
-                            df['매출변화'] = df['매출변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_currency(abs(x))}")
-                            df['매출증감율'] = df['매출증감율'].apply(format_percent)
-                            df['매출비중'] = df['매출비중'].apply(lambda x: f"{x:.1f}%")
-                            df['현재세션'] = df['현재세션'].apply(format_number)
-                            df['이전세션'] = df['이전세션'].apply(format_number)
-                            df['세션변화'] = df['세션변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_number(abs(x))}")
-                            df['세션증감율'] = df['세션증감율'].apply(format_percent)
-                            
-                            cols_to_show = ['순위', '인구통계', '현재매출', '매출비중', '이전매출', '매출변화', '매출증감율',
-                                          '현재세션', '이전세션', '세션변화', '세션증감율']
-                            st.dataframe(df[cols_to_show], use_container_width=True, height=600)
-                        else:
-                            st.info("데이터가 없습니다.")
-                    
-                    with tab4:
-                        if 'demo' in insight_data and not insight_data['demo'].empty:
-                            df = insight_data['demo'].copy()
-                            
-                            total_revenue = df['현재매출'].sum()
-                            if total_revenue > 0:
-                                df['매출비중'] = (df['현재매출'] / total_revenue * 100).round(1)
+                    tabs = st.tabs([title for title, _, _ in INSIGHT_TABLES])
+                    for tab, (_, key, cols_to_show) in zip(tabs, INSIGHT_TABLES):
+                        with tab:
+                            if key in insight_data and not insight_data[key].empty:
+                                table_df = insight_data[key].copy()
+                                
+                                if '매출비중' not in table_df.columns:
+                                    total_revenue = table_df['현재매출'].sum()
+                                    table_df['매출비중'] = (table_df['현재매출'] / total_revenue * 100).round(1) if total_revenue > 0 else 0
+                                
+                                table_df.insert(0, '순위', range(1, len(table_df) + 1))
+                                show_table(table_df, cols_to_show)
                             else:
-                                df['매출비중'] = 0
-                            
-                            df.insert(0, '순위', range(1, len(df) + 1))
-                            
-                            df['현재매출'] = df['현재매출'].apply(format_currency)
-                            df['이전매출'] = df['이전매출'].apply(format_currency)
-                            df['매출변화'] = df['매출변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_currency(abs(x))}")
-                            df['증감율'] = df['증감율'].apply(format_percent)
-                            df['매출비중'] = df['매출비중'].apply(lambda x: f"{x:.1f}%")
-                            
-                            cols_to_show = ['순위', '지역', '현재매출', '매출비중', '이전매출', '매출변화', '증감율']
-                            st.dataframe(df[cols_to_show], use_container_width=True, height=600)
-                        else:
-                            st.info("데이터가 없습니다.")
-                    
-                    with tab5:
-                        if 'device' in insight_data and not insight_data['device'].empty:
-                            df = insight_data['device'].copy()
-                            
-                            total_revenue = df['현재매출'].sum()
-                            if total_revenue > 0:
-                                df['매출비중'] = (df['현재매출'] / total_revenue * 100).round(1)
-                            else:
-                                df['매출비중'] = 0
-                            
-                            df.insert(0, '순위', range(1, len(df) + 1))
-                            
-                            df['현재매출'] = df['현재매출'].apply(format_currency)
-                            df['이전매출'] = df['이전매출'].apply(format_currency)
-                            df['매출변화'] = df['매출변화'].apply(lambda x: f"{'↑' if x > 0 else '↓'} {format_currency(abs(x))}")
-                            df['증감율'] = df['증감율'].apply(format_percent)
-                            df['매출비중'] = df['매출비중'].apply(lambda x: f"{x:.1f}%")
-                            
-                            cols_to_show = ['순위', '디바이스', '현재매출', '매출비중', '이전매출', '매출변화', '증감율']
-                            st.dataframe(df[cols_to_show], use_container_width=True, height=600)
-                        else:
-                            st.info("데이터가 없습니다.")
+                                st.info("데이터가 없습니다.")
 
 else:
     st.info("💡 사이드바에서 기간을 선택해주세요.")
+
+with st.sidebar:
+    with st.expander("🗄️ 결과 캐시"):
+        stats = result_cache.stats()
+        c1, c2 = st.columns(2)
+        c1.metric("적중", f"{stats['hits']:,}")
+        c2.metric("미스", f"{stats['misses']:,}")
+        st.caption(
+            f"적중률 {stats['hit_rate']:.1f}% · 항목 {stats['entries']}/{stats['max_entries']} · "
+            f"LRU 제거 {stats['evictions']} · 만료 {stats['expirations']}"
+        )
+        ts_stats = timeseries_store.stats()
+        st.caption(
+            f"일별 추이 저장소: {ts_stats['days']}일 보관 · 조회 {ts_stats['fetched_days']:,}일 / 제공 {ts_stats['served_days']:,}일"
+        )
+        flight = single_flight.stats()
+        st.caption(f"동일 쿼리 합치기: 실행 {flight['executed']:,} · 합침 {flight['coalesced']:,} · 실행 중 {flight['in_flight']}")
+        if result_store is not None:
+            disk = result_store.stats()
+            size = format_bytes(disk['bytes'])
+            if disk['max_bytes']:
+                size += f" / {format_bytes(disk['max_bytes'])}"
+            st.caption(
+                f"결과 저장소(Parquet): {disk['files']}개 · {size} · "
+                f"적중 {disk['hits']:,} / 미스 {disk['misses']:,} · LRU 제거 {disk['evictions']}"
+            )
+        if st.button("캐시 비우기"):
+            result_cache.clear()
+            timeseries_store.clear()
+            if result_store is not None:
+                result_store.clear()
+            st.rerun()
+
+    with st.expander("📈 쿼리 계측"):
+        query_history = st.session_state.setdefault('query_history', [])
+        if query_log:
+            ran_at = datetime.now().strftime('%H:%M:%S')
+            query_history.extend(dict(entry, ran_at=ran_at) for entry in query_log)
+            del query_history[:-config.QUERY_HISTORY_MAX]
+        
+        st.markdown("**이번 실행**")
+        if estimated_bytes:
+            st.caption(
+                f"dry run 예상 {format_bytes(sum(estimated_bytes.values()))} / 예산 {format_bytes(config.QUERY_BUDGET_BYTES)}"
+                + (f" · 생략: {', '.join(sorted(skipped))}" if skipped else "")
+            )
+        if query_log:
+            current = query_stats_frame(query_log)
+            q1, q2, q3 = st.columns(3)
+            q1.metric("쿼리", f"{len(current)}")
+            q2.metric("과금", f"{current['과금(MB)'].sum():,.1f} MB")
+            q3.metric("슬롯", f"{current['슬롯(ms)'].sum() / 1000:,.1f} s")
+            show_table(current, list(current.columns), height=250)
+        else:
+            st.caption("실행된 쿼리 없음 (결과 캐시에서 응답)")
+        
+        st.markdown(f"**세션 누적** (최근 {len(query_history)}건)")
+        if query_history:
+            show_table(query_stats_by_name(query_history), ['쿼리', '실행 수', '과금(MB)', '슬롯(ms)', '평균 실행(s)', 'BQ 캐시 적중'], height=250)
+            if st.button("기록 비우기"):
+                query_history.clear()
+                st.rerun()
@@ -0,0 +1,135 @@
+# SIDIZ Dashboard - 매장/온라인 세션 귀속 회귀 검증
+# 단일 스캔(QUALIFY) 쿼리와 기존 self-join 쿼리(filtered_sessions INNER JOIN events_*)를
+# 합성 GA4 데이터에서 실행해 요약/일별 추이 결과가 같은지 비교한다.
+#
+#   python bench/check_session_attribution.py [--days 31] [--events-per-day 1500] [--seed 7]
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import generate_events, to_arrow
+from local_engine import LocalEngine
+from queries import EVENTS_TABLE, SCAN_FILTER_SQL, STORE_SOURCES, build_dashboard_queries, build_timeseries_query
+
+# 기존 방식: 세션별 첫 소스를 먼저 구한 뒤 events_* 를 다시 읽어 세션 키로 조인
+LEGACY_BASE_SQL = """
+        WITH session_first_source_raw AS (
+            SELECT
+                user_pseudo_id,
+                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+                FIRST_VALUE(LOWER(COALESCE(
+                    (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
+                    traffic_source.source,
+                    '(direct)'
+                ))) OVER (
+                    PARTITION BY user_pseudo_id, (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1)
+                    ORDER BY event_timestamp
+                ) as first_source
+            FROM {events_table}
+            WHERE {scan_filter}
+        ),
+        session_first_source AS (
+            SELECT
+                user_pseudo_id,
+                sid,
+                ANY_VALUE(first_source) as first_source
+            FROM session_first_source_raw
+            GROUP BY user_pseudo_id, sid
+        ),
+        filtered_sessions AS (
+            SELECT user_pseudo_id, sid
+            FROM session_first_source sfs
+            WHERE sfs.first_source {source_in} {store_sources}
+        ),
+        base AS (
+            SELECT
+                PARSE_DATE('%Y%m%d', e.event_date) as date,
+                e.user_pseudo_id,
+                e.event_name,
+                e.ecommerce.purchase_revenue,
+                e.ecommerce.transaction_id,
+                (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+                (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
+                e.items
+            FROM {events_table} e
+            INNER JOIN filtered_sessions fs
+            ON e.user_pseudo_id = fs.user_pseudo_id
+            AND (SELECT value.int_value FROM UNNEST(e.event_params) WHERE key = 'ga_session_id' LIMIT 1) = fs.sid
+            WHERE {e_scan_filter}
+        )"""
+
+# 현재 쿼리의 base CTE 끝 (세션 귀속 QUALIFY 조건)
+BASE_END = "(@data_source = '매장 단독')\n        )"
+DAILY_FILTER_SQL = "_TABLE_SUFFIX BETWEEN @scan_start AND @end_c"
+
+
+def legacy_query(current, scan_filter, data_source):
+    # 현재 쿼리(queries.Query)의 base CTE만 기존 self-join 형태로 바꿔 끼움 (집계부와 파라미터는 동일)
+    legacy_base = LEGACY_BASE_SQL.format(
+        events_table=EVENTS_TABLE,
+        scan_filter=scan_filter,
+        e_scan_filter=scan_filter.replace('_TABLE_SUFFIX', 'e._TABLE_SUFFIX'),
+        source_in='IN' if data_source == "매장 단독" else 'NOT IN',
+        store_sources=STORE_SOURCES,
+    )
+    return legacy_base + current.sql[current.sql.index(BASE_END) + len(BASE_END):]
+
+
+def run_pair(engine, current, scan_filter, data_source):
+    return (engine.query(current.sql, params=current.params),
+            engine.query(legacy_query(current, scan_filter, data_source), params=current.params))
+
+
+def _frames_equal(a, b, key):
+    a = a.sort_values(key).reset_index(drop=True)
+    b = b.sort_values(key).reset_index(drop=True)
+    if a.shape != b.shape or list(a[key].astype(str)) != list(b[key].astype(str)):
+        return False
+    numeric = [c for c in a.columns if c != key]
+    return ((a[numeric].astype(float) - b[numeric].astype(float)).abs() < 1e-6).all().all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="매장/온라인 세션 귀속 단일 스캔 쿼리 회귀 검증")
+    parser.add_argument('--days', type=int, default=31)
+    parser.add_argument('--events-per-day', type=int, default=1500)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    first = date(2026, 1, 1)
+    last = first + timedelta(days=args.days - 1)
+    engine = LocalEngine()
+    engine.load_shards(generate_events(first, last, args.events_per_day, args.seed), to_arrow)
+
+    # (현재 기간, 비교 기간): 맞닿은 기간 / 사이에 공백이 있는 기간 / 겹치는 기간 / 데이터 경계와 일치
+    mid = first + timedelta(days=args.days // 2)
+    periods = [
+        ((mid, last), (first, mid - timedelta(days=1))),
+        ((last - timedelta(days=6), last), (first, first + timedelta(days=6))),
+        ((first + timedelta(days=3), last), (first, last - timedelta(days=3))),
+        ((first, last), (first, last)),
+    ]
+
+    failures = 0
+    for data_source in ("매장 단독", "온라인 단독"):
+        for (start_c, end_c), (start_p, end_p) in periods:
+            summary = build_dashboard_queries(start_c, end_c, start_p, end_p, data_source)['summary']
+            new_summary, old_summary = run_pair(engine, summary, SCAN_FILTER_SQL, data_source)
+            daily = build_timeseries_query(start_c, end_c, data_source)
+            new_ts, old_ts = run_pair(engine, daily, DAILY_FILTER_SQL, data_source)
+            ok = _frames_equal(new_summary, old_summary, 'type') and _frames_equal(new_ts, old_ts, 'date')
+            failures += not ok
+            print(f"{'OK  ' if ok else 'FAIL'} {data_source} {start_c}~{end_c} vs {start_p}~{end_p}")
+            if not ok:
+                print(new_summary.to_string(), old_summary.to_string(), sep='\n')
+                print(new_ts.to_string(), old_ts.to_string(), sep='\n')
+
+    print(f"\n{'모두 일치' if failures == 0 else f'{failures}건 불일치'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
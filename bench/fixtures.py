@@ -0,0 +1,172 @@
+# SIDIZ Dashboard - GA4 export 형태의 합성 events_YYYYMMDD 데이터 생성기
+import random
+from datetime import datetime, timedelta, timezone
+
+import pyarrow as pa
+
+STORE_SOURCES = ['qr_store_247486', 'qr_store_247482', 'store_register_qr', 'qr_store_']
+ONLINE_SOURCES = [('google', 'cpc'), ('naver', 'cpc'), ('naver', 'organic'), ('instagram', 'social'),
+                  ('(direct)', '(none)'), ('kakao', 'display'), ('newsletter', 'email')]
+PRODUCTS = [
+    ('T50', 'T50 AIR 의자', 'CHAIR', 459000),
+    ('T80', 'T80 메쉬 의자', 'CHAIR', 989000),
+    ('GX', 'GX 프리미엄', 'CHAIR', 1690000),
+    ('RING', 'RING 학생의자', 'KIDS', 329000),
+    ('DESK', 'SIDIZ 모션데스크', 'DESK', 1290000),
+    ('PAD01', 'seat pad', 'EASY REPAIR', 39000),
+    ('WHEEL', 'wheel set', 'PARTS', 25000),
+    ('HEAD', 'headrest', 'EASY_REPAIR', 59000),
+]
+COUNTRIES = [('South Korea', 'Seoul'), ('South Korea', 'Busan'), ('South Korea', 'Incheon'),
+             ('South Korea', ''), ('United States', 'Los Angeles')]
+DEVICES = ['mobile', 'desktop', 'tablet']
+GENDERS = ['male', 'female', 'm', 'f', '', None]
+AGES = ['18-24', '25-34', '35-44', '45-54', '', None]
+
+PARAM_TYPE = pa.struct([
+    ('key', pa.string()),
+    ('value', pa.struct([
+        ('string_value', pa.string()),
+        ('int_value', pa.int64()),
+        ('float_value', pa.float64()),
+        ('double_value', pa.float64()),
+    ])),
+])
+ITEM_TYPE = pa.struct([
+    ('item_id', pa.string()),
+    ('item_name', pa.string()),
+    ('item_category', pa.string()),
+    ('price', pa.float64()),
+    ('quantity', pa.int64()),
+])
+EVENTS_SCHEMA = pa.schema([
+    ('event_date', pa.string()),
+    ('event_timestamp', pa.int64()),
+    ('event_name', pa.string()),
+    ('event_params', pa.list_(PARAM_TYPE)),
+    ('user_pseudo_id', pa.string()),
+    ('user_properties', pa.list_(PARAM_TYPE)),
+    ('traffic_source', pa.struct([('name', pa.string()), ('medium', pa.string()), ('source', pa.string())])),
+    ('device', pa.struct([('category', pa.string())])),
+    ('geo', pa.struct([('country', pa.string()), ('city', pa.string())])),
+    ('ecommerce', pa.struct([('purchase_revenue', pa.float64()), ('transaction_id', pa.string())])),
+    ('items', pa.list_(ITEM_TYPE)),
+])
+
+KST = timezone(timedelta(hours=9))
+
+
+def _param(key, string_value=None, int_value=None):
+    return {'key': key, 'value': {'string_value': string_value, 'int_value': int_value,
+                                  'float_value': None, 'double_value': None}}
+
+
+def _item(product, quantity=1):
+    item_id, name, category, price = product
+    return {'item_id': item_id, 'item_name': name, 'item_category': category,
+            'price': float(price), 'quantity': quantity}
+
+
+class _User:
+    def __init__(self, rng, idx):
+        self.id = f"{rng.randrange(10**9)}.{idx}"
+        self.session_number = 0
+        self.device = rng.choice(DEVICES)
+        self.geo = rng.choice(COUNTRIES)
+        self.gender = rng.choice(GENDERS)
+        self.age = rng.choice(AGES)
+        self.first_touch = rng.choice(ONLINE_SOURCES)
+
+
+def _session_events(rng, user, start_ts, tx_counter):
+    user.session_number += 1
+    sid = start_ts // 1_000_000
+    is_store = rng.random() < 0.12
+    source, medium = (rng.choice(STORE_SOURCES), 'qr') if is_store else rng.choice(ONLINE_SOURCES)
+    user_props = []
+    if user.gender is not None:
+        user_props.append(_param('u_gender', user.gender))
+    if user.age is not None:
+        user_props.append(_param('u_age', user.age))
+
+    names = ['session_start', 'page_view'] + ['page_view'] * rng.randrange(0, 4)
+    browsed = rng.sample(PRODUCTS, rng.randrange(1, 3))
+    names += ['view_item'] * len(browsed)
+    if rng.random() < 0.04:
+        names.append('sign_up')
+    purchase = rng.random() < (0.25 if is_store else 0.06)
+    if purchase:
+        names += ['add_to_cart', 'purchase']
+        if rng.random() < 0.03:
+            names.append('purchase')  # GA4 중복 purchase
+
+    rows, ts = [], start_ts
+    purchase_items = None
+    transaction_id = None
+    for i, name in enumerate(names):
+        ts += rng.randrange(5, 240) * 1_000_000
+        params = [_param('ga_session_id', int_value=sid), _param('ga_session_number', int_value=user.session_number)]
+        if i == 0:
+            params.append(_param('source', source))
+        items = []
+        revenue = None
+        tx = None
+        if name == 'view_item':
+            items = [_item(browsed[names[:i].count('view_item') % len(browsed)])]
+        elif name == 'purchase':
+            if purchase_items is None:
+                tx_counter[0] += 1
+                transaction_id = f"T{tx_counter[0]:08d}"
+                if rng.random() < 0.1:
+                    purchase_items = [_item(p) for p in rng.sample(PRODUCTS[5:], rng.randrange(1, 3))]
+                elif rng.random() < 0.08:
+                    purchase_items = [_item(rng.choice(PRODUCTS[:5]), rng.randrange(3, 12))]
+                else:
+                    purchase_items = [_item(p, rng.randrange(1, 3)) for p in browsed]
+            items = purchase_items
+            revenue = sum(it['price'] * it['quantity'] for it in items)
+            tx = transaction_id
+        if name == 'page_view' and rng.random() < 0.01:
+            params = []  # 세션 정보 없이 들어오는 이벤트 (Measurement Protocol 등)
+        event_day = datetime.fromtimestamp(ts / 1_000_000, KST)
+        rows.append({
+            'event_date': event_day.strftime('%Y%m%d'),
+            'event_timestamp': ts,
+            'event_name': name,
+            'event_params': params,
+            'user_pseudo_id': user.id,
+            'user_properties': user_props,
+            'traffic_source': {'name': None, 'medium': user.first_touch[1] if rng.random() < 0.9 else None,
+                               'source': user.first_touch[0] if rng.random() < 0.9 else None},
+            'device': {'category': user.device},
+            'geo': {'country': user.geo[0], 'city': user.geo[1] or None},
+            'ecommerce': {'purchase_revenue': revenue, 'transaction_id': tx},
+            'items': items,
+        })
+    return rows
+
+
+def generate_events(start, end, events_per_day=2000, seed=7):
+    # start~end(포함) 기간의 일별 이벤트를 {YYYYMMDD: [row, ...]} 형태로 생성
+    # 자정을 넘기는 세션은 다음 날 shard에 이벤트가 나뉘어 들어감 (GA4와 동일)
+    rng = random.Random(seed)
+    users = [_User(rng, i) for i in range(max(events_per_day // 6, 10))]
+    tx_counter = [0]
+    shards = {}
+    day = start
+    while day <= end:
+        produced = 0
+        day_start = int(datetime(day.year, day.month, day.day, tzinfo=KST).timestamp()) * 1_000_000
+        while produced < events_per_day:
+            user = rng.choice(users)
+            offset = rng.randrange(0, 24 * 3600) if rng.random() > 0.02 else 24 * 3600 - rng.randrange(60, 300)
+            for row in _session_events(rng, user, day_start + offset * 1_000_000, tx_counter):
+                if row['event_date'] <= end.strftime('%Y%m%d'):
+                    shards.setdefault(row['event_date'], []).append(row)
+                produced += 1
+        day += timedelta(days=1)
+    return shards
+
+
+def to_arrow(rows):
+    return pa.Table.from_pylist(rows, schema=EVENTS_SCHEMA)
@@ -0,0 +1,207 @@
+# SIDIZ Dashboard - 오프라인 벤치마크 (DuckDB 로컬 엔진 + 합성 GA4 데이터)
+# 앱과 같은 경로(dashboard_data -> query_runner.run_queries)로 모든 생성 SQL을 실행하고
+# 쿼리별 지연/스캔 행 수, pandas 후처리 시간을 JSON으로 남긴다.
+#
+#   python bench/run_benchmarks.py --events 10000
+#   python bench/run_benchmarks.py --events 100000000 --database /tmp/bench.duckdb --output bench/results/100m.json
+#   python bench/run_benchmarks.py --events 1000000 --baseline bench/results/before.json
+#   python bench/run_benchmarks.py --events 1000000 --mirror --baseline bench/results/before.json   # 원본 사본(events_mirror) 경로
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duckdb
+
+from dashboard_data import (
+    bulk_detail_queries,
+    dashboard_queries,
+    insight_queries,
+    postprocess_insight,
+    timeseries_queries,
+)
+from fixtures import generate_events, to_arrow
+from local_engine import LocalClient, LocalEngine
+from query_runner import run_queries
+from rollups import EVENTS_MIRROR_DDL, ROLLUPS, events_mirror_insert_sql
+from timeseries_store import rebucket
+
+DATA_SOURCES = ["전체", "온라인 단독", "매장 단독"]
+# Python 생성기로 만드는 하루 최대 이벤트 수 - 그 이상은 LocalEngine.replicate()로 복제
+MAX_GENERATED_PER_DAY = 20000
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def rebucket_all(results):
+    # 일별 추이 -> 주별/월별 (앱에서 추이 분석 단위를 바꿀 때의 클라이언트 처리)
+    for group_by in ('weekly', 'monthly'):
+        rebucket(results['timeseries'], group_by)
+
+
+def build_mirror(engine, first, last):
+    # rollups.py refresh와 같은 DDL/일자별 INSERT로 events_mirror를 만든 뒤 클러스터링 순서로 정렬
+    engine.query(EVENTS_MIRROR_DDL)
+    day = first
+    while day <= last:
+        engine.query(events_mirror_insert_sql(day.strftime('%Y%m%d')))
+        day += timedelta(days=1)
+    engine.cluster('events_mirror', [ROLLUPS['events_mirror']['date_column'], 'event_name', 'user_pseudo_id'])
+
+
+def build_cases(start_c, end_c, start_p, end_p, mirrored=False):
+    # (이름, 쿼리 dict, 후처리 함수) - 앱의 요약, 일별 추이(저장소가 빈 상태), 인사이트, 대량 구매 상세 조회와 동일
+    cases = []
+    for data_source in DATA_SOURCES:
+        cases.append((
+            f"dashboard/{data_source}",
+            dashboard_queries(start_c, end_c, start_p, end_p, data_source, mirrored=mirrored),
+            None,
+        ))
+        cases.append((
+            f"timeseries/{data_source}",
+            timeseries_queries(start_c, end_c, data_source, mirrored=mirrored),
+            rebucket_all,
+        ))
+    cases.append(("insight", insight_queries(start_c, end_c, start_p, end_p, mirrored=mirrored), postprocess_insight))
+    cases.append(("bulk_detail", bulk_detail_queries(start_c, end_c, mirrored), None))
+    return cases
+
+
+def run_case(engine, queries, postprocess, repeat, workers):
+    runs = []
+    for _ in range(repeat):
+        client = LocalClient(engine, profile=True)
+        start = time.perf_counter()
+        results, errors = run_queries(client, queries, max_workers=workers)
+        wall_ms = (time.perf_counter() - start) * 1000
+        if errors:
+            raise RuntimeError(f"쿼리 실패: {', '.join(f'{k}: {v}' for k, v in errors.items())}")
+        start = time.perf_counter()
+        if postprocess is not None:
+            postprocess(results)
+        postprocess_ms = (time.perf_counter() - start) * 1000
+        runs.append((wall_ms, postprocess_ms, {name: client.jobs[query.sql].profile for name, query in queries.items()}))
+
+    # 반복 실행 중 중앙값
+    return {
+        'wall_ms': round(statistics.median(r[0] for r in runs), 2),
+        'postprocess_ms': round(statistics.median(r[1] for r in runs), 2),
+        'queries': {
+            name: {
+                'latency_ms': round(statistics.median(r[2][name]['latency_ms'] for r in runs), 2),
+                'rows_scanned': runs[0][2][name]['rows_scanned'],
+                'rows_returned': runs[0][2][name]['rows_returned'],
+            }
+            for name in queries
+        },
+    }
+
+
+def compare(report, baseline):
+    # 기준 JSON 대비 쿼리별 지연 변화 출력
+    base_cases = {case['name']: case for case in baseline['cases']}
+    print(f"\n기준 대비 ({baseline['meta'].get('git_revision')} -> {report['meta'].get('git_revision')})")
+    if baseline['meta'].get('events') != report['meta']['events']:
+        print(f"  ※ 데이터 규모가 다름: {baseline['meta'].get('events'):,} -> {report['meta']['events']:,} 이벤트")
+    for case in report['cases']:
+        base = base_cases.get(case['name'])
+        if base is None:
+            continue
+        for name, q in case['queries'].items():
+            b = base['queries'].get(name)
+            if not b or not b['latency_ms']:
+                continue
+            change = (q['latency_ms'] - b['latency_ms']) / b['latency_ms'] * 100
+            print(f"  {case['name']:<28} {name:<22} {b['latency_ms']:>10.1f} -> {q['latency_ms']:>10.1f} ms ({change:+.1f}%)"
+                  f"  scanned {b['rows_scanned']:,} -> {q['rows_scanned']:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIDIZ 대시보드 쿼리 오프라인 벤치마크")
+    parser.add_argument('--events', type=int, default=10000, help="총 이벤트 수 (현재+비교 기간 전체)")
+    parser.add_argument('--days', type=int, default=14, help="데이터 일수 (앞 절반이 비교 기간, 뒤 절반이 분석 기간)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--repeat', type=int, default=3, help="케이스별 반복 횟수 (중앙값 기록)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="동시 실행 스레드 수 (1이면 쿼리별 지연이 서로 간섭하지 않음)")
+    parser.add_argument('--database', help="DuckDB 파일 경로 (대용량에서 디스크 사용, 기본은 메모리)")
+    parser.add_argument('--output', help="결과 JSON 경로 (기본: bench/results/bench-<시각>.json)")
+    parser.add_argument('--baseline', help="비교할 이전 결과 JSON")
+    parser.add_argument('--mirror', action='store_true', help="원본 사본(events_mirror)을 만들고 사본을 읽는 쿼리로 실행")
+    args = parser.parse_args()
+
+    per_day = math.ceil(args.events / args.days)
+    copies = math.ceil(per_day / MAX_GENERATED_PER_DAY)
+    generated_per_day = math.ceil(per_day / copies)
+
+    first = date(2026, 1, 1)
+    last = first + timedelta(days=args.days - 1)
+    half = args.days // 2
+    start_p, end_p = first, first + timedelta(days=half - 1)
+    start_c, end_c = first + timedelta(days=half), last
+
+    engine = LocalEngine(duckdb.connect(args.database) if args.database else None)
+    start = time.perf_counter()
+    engine.load_shards(generate_events(first, last, generated_per_day, args.seed), to_arrow)
+    engine.replicate(copies)
+    if args.mirror:
+        build_mirror(engine, first, last)
+    load_s = time.perf_counter() - start
+    events = engine.event_count()
+    print(f"이벤트 {events:,}건 적재 ({generated_per_day:,}/일 x {args.days}일 x {copies}배, {load_s:.1f}s)")
+
+    report = {
+        'meta': {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'events': events,
+            'days': args.days,
+            'copies': copies,
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'workers': args.workers,
+            'mirror': args.mirror,
+            'current_period': [start_c.isoformat(), end_c.isoformat()],
+            'previous_period': [start_p.isoformat(), end_p.isoformat()],
+            'duckdb': duckdb.__version__,
+            'python': platform.python_version(),
+        },
+        'cases': [],
+    }
+
+    for name, queries, postprocess in build_cases(start_c, end_c, start_p, end_p, args.mirror):
+        result = run_case(engine, queries, postprocess, args.repeat, args.workers)
+        report['cases'].append({'name': name, **result})
+        print(f"{name:<28} wall {result['wall_ms']:>10.1f} ms  postprocess {result['postprocess_ms']:>7.2f} ms")
+        for qname, q in result['queries'].items():
+            print(f"    {qname:<24} {q['latency_ms']:>10.1f} ms  scanned {q['rows_scanned']:>13,}  rows {q['rows_returned']:>6,}")
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results',
+                                         f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
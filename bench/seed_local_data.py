@@ -0,0 +1,67 @@
+# SIDIZ Dashboard - 로컬 백엔드용 합성 데이터 (BigQuery 없이 앱 실행)
+# 합성 GA4 샤드(fixtures)를 DuckDB에 올리고 rollups.py와 같은 INSERT로 집계 테이블을 만든 뒤,
+# local_data.sync()로 로컬 Parquet 디렉터리에 받는다 (실제 sync와 같은 경로).
+#
+#   python bench/seed_local_data.py --days 90
+#   python bench/seed_local_data.py --days 30 --events-per-day 5000 --rollups --root /tmp/sidiz-local
+#   SIDIZ_BACKEND=local SIDIZ_LOCAL_DATA_DIR=/tmp/sidiz-local streamlit run app.py
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from fixtures import generate_events, to_arrow
+from local_data import EVENTS, SYNC_TABLES, sync
+from local_engine import LocalClient, LocalEngine
+from rollups import ROLLUPS, log_name
+
+
+def build_source(first, last, events_per_day, seed, rollup_names):
+    # BigQuery 대용 엔진 - events_* 샤드, __TABLES__(샤드 last_modified), 집계 테이블 + _refresh_log
+    engine = LocalEngine()
+    engine.load_shards(generate_events(first, last, events_per_day, seed), to_arrow)
+    engine.con.execute("""
+        CREATE TABLE __TABLES__ AS
+        SELECT DISTINCT 'events_' || _TABLE_SUFFIX as table_id, epoch_ms(now()) as last_modified_time FROM events
+    """)
+    engine.con.execute("""
+        CREATE TABLE _refresh_log (
+            table_name VARCHAR, suffix VARCHAR, source_modified TIMESTAMP, lookahead_complete BOOLEAN, refreshed_at TIMESTAMP
+        )
+    """)
+    for name in rollup_names:
+        engine.query(ROLLUPS[name]['ddl'])
+        day = first
+        while day <= last:
+            suffix = day.strftime('%Y%m%d')
+            engine.query(ROLLUPS[name]['insert_sql'](suffix))
+            lookahead_complete = not ROLLUPS[name].get('lookahead', True) or day < last
+            engine.con.execute(
+                "INSERT INTO _refresh_log VALUES (?, ?, now(), ?, now())", [log_name(name), suffix, lookahead_complete]
+            )
+            day += timedelta(days=1)
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 백엔드용 합성 데이터 생성")
+    parser.add_argument('--days', type=int, default=config.LOCAL_SYNC_DAYS, help="어제까지 생성할 일수")
+    parser.add_argument('--events-per-day', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--rollups', action='store_true', help="집계 테이블(세션 롤업/구매 품목/주문 분류)도 생성")
+    parser.add_argument('--root', default=config.LOCAL_DATA_DIR, help="로컬 데이터 디렉터리")
+    args = parser.parse_args()
+
+    last = datetime.now().date() - timedelta(days=1)
+    first = last - timedelta(days=args.days - 1)
+    rollup_names = [name for name in SYNC_TABLES if name in ROLLUPS] if args.rollups else []
+    engine = build_source(first, last, args.events_per_day, args.seed, rollup_names)
+    sync(LocalClient(engine), [EVENTS] + rollup_names, first.strftime('%Y%m%d'), last.strftime('%Y%m%d'),
+         force=True, root=args.root)
+
+
+if __name__ == '__main__':
+    main()
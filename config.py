@@ -0,0 +1,104 @@
+# SIDIZ Dashboard - 실행 설정
+# 모든 값은 환경 변수로 덮어쓸 수 있다 (Streamlit secrets 최상위 키도 환경 변수로 노출됨).
+import os
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# -------------------------------------------------
+# BigQuery 위치
+# -------------------------------------------------
+GCP_PROJECT = os.environ.get("SIDIZ_GCP_PROJECT", "sidiz-458301")
+BQ_LOCATION = os.environ.get("SIDIZ_BQ_LOCATION", "asia-northeast3")
+# GA4 export 데이터셋 (events_YYYYMMDD 샤드)
+ANALYTICS_DATASET = os.environ.get("SIDIZ_ANALYTICS_DATASET", "analytics_487246344")
+# CLI/cron 실행 시 사용할 서비스 계정 키 파일 (없으면 Application Default Credentials)
+GCP_KEY_FILE = os.environ.get("SIDIZ_GCP_KEY_FILE")
+# 대시보드 전용 집계 테이블 데이터셋 (롤업 등)
+DASHBOARD_DATASET = os.environ.get("SIDIZ_DASHBOARD_DATASET", "sidiz_dashboard")
+
+# -------------------------------------------------
+# 결과 캐시
+# -------------------------------------------------
+# 마감된 과거 일자만 포함한 조회 결과 TTL (초)
+CACHE_TTL_CLOSED = _env_int("SIDIZ_CACHE_TTL_CLOSED", 12 * 60 * 60)
+# 오늘/어제처럼 아직 GA4 export가 확정되지 않은 일자를 포함한 조회 결과 TTL (초)
+CACHE_TTL_OPEN = _env_int("SIDIZ_CACHE_TTL_OPEN", 5 * 60)
+# 최근 N일은 '열린' 일자로 취급 (GA4 일별 export는 다음 날 적재됨)
+CACHE_OPEN_DAYS = _env_int("SIDIZ_CACHE_OPEN_DAYS", 1)
+# 캐시 최대 항목 수 (초과 시 LRU 제거)
+CACHE_MAX_ENTRIES = _env_int("SIDIZ_CACHE_MAX_ENTRIES", 128)
+# 쿼리 결과 Parquet 저장소 디렉터리 (result_store.py) - 설정해야 사용 (기본: 사용하지 않음)
+# 재배포/재시작 후에도 남고 replica끼리 공유되려면 모든 replica가 마운트한 영구 볼륨 경로 (예: /mnt/sidiz-results)
+# 컨테이너 임시 디렉터리는 재배포 때마다 비워지므로 기본값으로 쓰지 않음
+RESULT_STORE_DIR = os.environ.get("SIDIZ_RESULT_STORE_DIR", "")
+# 저장소 전체 크기 상한 (바이트, 초과 시 오래 사용하지 않은 파일부터 제거, 0이면 제한 없음)
+RESULT_STORE_MAX_BYTES = _env_int("SIDIZ_RESULT_STORE_MAX_BYTES", 1024 ** 3)
+
+# -------------------------------------------------
+# 쿼리 실행
+# -------------------------------------------------
+# 결과 다운로드 동시 스레드 수 상한
+QUERY_MAX_WORKERS = _env_int("SIDIZ_QUERY_MAX_WORKERS", 8)
+# 결과를 Arrow로 받아 pyarrow dtype DataFrame으로 사용 (끄면 to_dataframe 기본 경로)
+ARROW_DOWNLOAD = _env_bool("SIDIZ_ARROW_DOWNLOAD", True)
+# Arrow 다운로드에 BigQuery Storage Read API 사용 (google-cloud-bigquery-storage 미설치 시 REST로 자동 대체)
+USE_BQSTORAGE = _env_bool("SIDIZ_USE_BQSTORAGE", True)
+# job당 최대 과금 바이트 (maximum_bytes_billed, 0이면 제한 없음)
+MAX_BYTES_BILLED = _env_int("SIDIZ_MAX_BYTES_BILLED", 200 * 1024 ** 3)
+# 한 번의 조회(화면 갱신)에서 dry run 예상 처리량 합계 예산 (0이면 검사하지 않음)
+QUERY_BUDGET_BYTES = _env_int("SIDIZ_QUERY_BUDGET_BYTES", 50 * 1024 ** 3)
+# 예산 초과 시 동작 - 'downgrade': 인사이트/대량 구매 상세 쿼리를 생략, 'confirm': 실행 전 확인
+BUDGET_POLICY = os.environ.get("SIDIZ_BUDGET_POLICY", "downgrade")
+# 사이드바 계측 패널에 세션별로 보관할 최근 쿼리 실행 기록 수
+QUERY_HISTORY_MAX = _env_int("SIDIZ_QUERY_HISTORY_MAX", 200)
+# 스크립트 모드 - 세션 귀속 TEMP 테이블을 한 번 만들고 요약/추이/인사이트/대량 구매 상세를 한 스크립트로 조회
+# (인사이트/대량 구매 상세도 데이터 소스 필터 적용, 세션 롤업이 적재된 기간은 기존 롤업 쿼리 사용)
+SCRIPT_MODE = _env_bool("SIDIZ_SCRIPT_MODE", False)
+
+# -------------------------------------------------
+# 실행 백엔드
+# -------------------------------------------------
+# 'bigquery': BigQuery에서 실행 / 'local': local_data.py sync로 받아 둔 GA4 샤드/집계 테이블 Parquet을 DuckDB로 실행
+BACKEND = os.environ.get("SIDIZ_BACKEND", "bigquery")
+# 로컬 백엔드 데이터 디렉터리 (local_data.py)
+LOCAL_DATA_DIR = os.environ.get("SIDIZ_LOCAL_DATA_DIR", os.path.join(os.path.expanduser("~"), ".sidiz-dashboard", "local"))
+# sync 기본 기간 (일) - 대부분의 조회가 들어오는 최근 90일
+LOCAL_SYNC_DAYS = _env_int("SIDIZ_LOCAL_SYNC_DAYS", 90)
+
+# -------------------------------------------------
+# 캐시 워머 (warmer.py) - GA4 일별 export가 들어오면 기본 기간 조회를 미리 실행
+# -------------------------------------------------
+# 앱 프로세스 안의 백그라운드 스레드로 결과 캐시/추이 저장소를 채움
+WARMER_ENABLED = _env_bool("SIDIZ_WARMER_ENABLED", True)
+# export 적재 여부 확인 주기 (초)
+WARMER_INTERVAL = _env_int("SIDIZ_WARMER_INTERVAL", 15 * 60)
+
+# -------------------------------------------------
+# 세션 일별 롤업 (rollups.py)
+# -------------------------------------------------
+# 켜면 요약/추이/채널/지역/디바이스/인구통계 쿼리가 롤업 테이블을 읽음 (제품별은 원본 유지)
+USE_SESSION_ROLLUP = _env_bool("SIDIZ_USE_SESSION_ROLLUP", False)
+# 켜면 원본 요약 쿼리가 이지리페어 단독 주문 판정을 transaction_class 테이블에서 읽음 (현재 규칙 버전으로 분류된 기간만)
+USE_TRANSACTION_CLASS = _env_bool("SIDIZ_USE_TRANSACTION_CLASS", False)
+# 켜면 원본 쿼리가 events_* 대신 events_mirror(일자 파티션 + event_name/user_pseudo_id 클러스터링 사본)를 읽음 (적재된 기간만)
+USE_EVENTS_MIRROR = _env_bool("SIDIZ_USE_EVENTS_MIRROR", False)
+# 켜면 대량 구매 요약/품목별 상세를 purchase_items(중복 제거된 구매 품목 테이블)에서 읽음 (적재된 기간만)
+USE_PURCHASE_ITEMS = _env_bool("SIDIZ_USE_PURCHASE_ITEMS", False)
+# 최초 refresh 시 적재할 과거 일수 (전년 동기 비교를 위해 1년 이상)
+ROLLUP_BACKFILL_DAYS = _env_int("SIDIZ_ROLLUP_BACKFILL_DAYS", 400)
+# 근사 고유 수 모드 - distinct_sketch_daily의 HLL_COUNT.INIT 정밀도 (10~24, 높을수록 정확하고 스케치가 큼)
+# 상대 표준 오차 ≈ 1.04 / √(2^정밀도) - 15면 약 0.57%. 바꾸면 rollups.py refresh --table distinct_sketch_daily --force 필요
+HLL_PRECISION = _env_int("SIDIZ_HLL_PRECISION", 15)
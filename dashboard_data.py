@@ -0,0 +1,263 @@
+# SIDIZ Dashboard - 조회 쿼리 선택 + 결과 후처리
+# Streamlit에 의존하지 않음 - app.py, 캐시 워머(warmer.py), 오프라인 벤치마크(bench/run_benchmarks.py)가 같은 경로를 사용한다.
+from datetime import datetime, timedelta
+
+import config
+from queries import (
+    BULK_REVENUE_THRESHOLD,
+    build_bulk_detail_query,
+    build_bulk_summary_queries,
+    build_dashboard_queries,
+    build_insight_queries,
+    build_purchase_bulk_detail_query,
+    build_purchase_bulk_summary_queries,
+    build_rollup_dashboard_queries,
+    build_rollup_insight_queries,
+    build_rollup_timeseries_query,
+    build_script_query,
+    build_sketch_dashboard_queries,
+    build_sketch_insight_queries,
+    build_timeseries_query,
+    mirror_queries,
+    plan_suffix_ranges,
+)
+
+DATA_SOURCES = ["온라인 단독", "전체", "매장 단독"]
+
+
+def default_periods(today):
+    # 사이드바 기본 기간: (분석 기간, 비교 기간) = (최근 7일, 그 전 7일)
+    return (today - timedelta(days=7), today - timedelta(days=1)), (today - timedelta(days=14), today - timedelta(days=8))
+
+
+# -------------------------------------------------
+# 집계 테이블 선택 (롤업 적재 범위)
+# coverage(name) -> 적재된 일자(YYYYMMDD) 목록 (rollups.rollup_coverage - 사용하지 않는 테이블이면 빈 목록)
+# -------------------------------------------------
+def rollup_enabled(name):
+    if name == 'transaction_class':
+        return config.USE_TRANSACTION_CLASS
+    if name == 'events_mirror':
+        return config.USE_EVENTS_MIRROR
+    if name == 'purchase_items':
+        return config.USE_PURCHASE_ITEMS
+    return config.USE_SESSION_ROLLUP
+
+
+def covers(loaded, start_c, end_c, start_p, end_p):
+    # 실제로 읽을 두 기간의 모든 일자가 적재되어 있을 때만 True
+    loaded = set(loaded)
+    if not loaded:
+        return False
+    for start, end in plan_suffix_ranges((start_c, end_c), (start_p, end_p)):
+        day = datetime.strptime(start, '%Y%m%d').date()
+        while day.strftime('%Y%m%d') <= end:
+            if day.strftime('%Y%m%d') not in loaded:
+                return False
+            day += timedelta(days=1)
+    return True
+
+
+def mirror_covers(coverage, start_c, end_c, start_p=None, end_p=None):
+    # 원본 사본은 일별 추이/스크립트가 읽는 분석 기간 전날(@scan_start)까지 적재되어 있어야 함
+    start_p, end_p = (start_p, end_p) if start_p is not None else (start_c, end_c)
+    return covers(coverage('events_mirror'), start_c - timedelta(days=1), end_c, start_p, end_p)
+
+
+def choose_sources(coverage, start_c, end_c, start_p, end_p, approximate=False):
+    # 조회에 쓸 집계 테이블 {use_rollup, use_sketches, classified, mirrored}
+    # 근사 모드는 세션/스케치 롤업이 모두 적재된 기간에서만 (아니면 정확한 집계)
+    # mirrored: 원본 쿼리가 events_* 대신 events_mirror를 읽음 (결과는 같고 스캔량만 다름)
+    use_rollup = covers(coverage('session_daily'), start_c, end_c, start_p, end_p)
+    return {
+        'use_rollup': use_rollup,
+        'use_sketches': approximate and use_rollup and covers(coverage('distinct_sketch_daily'), start_c, end_c, start_p, end_p),
+        'classified': covers(coverage('transaction_class'), start_c, end_c, start_p, end_p),
+        'mirrored': mirror_covers(coverage, start_c, end_c, start_p, end_p),
+    }
+
+
+def purchase_items_cover(coverage, start_c, end_c, start_p=None, end_p=None):
+    start_p, end_p = (start_p, end_p) if start_p is not None else (start_c, end_c)
+    return covers(coverage('purchase_items'), start_c, end_c, start_p, end_p)
+
+
+def on_mirror(queries, mirrored):
+    return mirror_queries(queries) if mirrored else queries
+
+
+# -------------------------------------------------
+# 요약
+# use_sketches: 근사 고유 수 모드 (HLL++ 스케치 롤업 - 세션 롤업도 적재된 기간에서만)
+# classified: 원본 쿼리에서 주문 분류를 transaction_class 테이블로 대체 (롤업은 세션 롤업에 분류가 들어 있음)
+# -------------------------------------------------
+def dashboard_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독", use_rollup=False, use_sketches=False,
+                      classified=False, mirrored=False):
+    if use_sketches:
+        return build_sketch_dashboard_queries(start_c, end_c, start_p, end_p, data_source)
+    if use_rollup:
+        return build_rollup_dashboard_queries(start_c, end_c, start_p, end_p, data_source)
+    return on_mirror(build_dashboard_queries(start_c, end_c, start_p, end_p, data_source, classified), mirrored)
+
+
+# -------------------------------------------------
+# 일별 추이 (timeseries_store가 비어 있는 구간만)
+# -------------------------------------------------
+def timeseries_queries(start, end, data_source="온라인 단독", use_rollup=False, mirrored=False):
+    if use_rollup:
+        return {'timeseries': build_rollup_timeseries_query(start, end, data_source)}
+    return on_mirror({'timeseries': build_timeseries_query(start, end, data_source)}, mirrored)
+
+
+# -------------------------------------------------
+# 인사이트 (제품/채널/지역/디바이스/인구통계)
+# -------------------------------------------------
+def insight_queries(start_c, end_c, start_p, end_p, use_rollup=False, use_sketches=False, mirrored=False):
+    # 롤업/스케치 경로의 제품별 쿼리도 원본을 읽으므로 사본으로 바꿈
+    if use_sketches:
+        return on_mirror(build_sketch_insight_queries(start_c, end_c, start_p, end_p), mirrored)
+    if use_rollup:
+        return on_mirror(build_rollup_insight_queries(start_c, end_c, start_p, end_p), mirrored)
+    return on_mirror(build_insight_queries(start_c, end_c, start_p, end_p), mirrored)
+
+
+# 원본 breakdown 쿼리(GROUPING SETS)의 차원 -> (결과 키, 값 컬럼명, 세션 컬럼 포함 여부) - 롤업 쿼리와 같은 형태로 나눔
+BREAKDOWN_TABLES = {
+    'channel': ('channel_combined', 'channel', True),
+    'demo': ('demo', 'location', False),
+    'device': ('device', 'device', False),
+    'demographics': ('demographics_combined', 'demographic', True),
+}
+REVENUE_COLUMNS = ['current_revenue', 'previous_revenue', 'revenue_change', 'revenue_change_pct']
+
+
+def split_breakdown(breakdown):
+    # breakdown 결과 (dimension, dimension_value, ...) -> {결과 키: DataFrame} (차원별 매출 변화 순서 유지)
+    tables = {}
+    for dimension, (key, label, with_sessions) in BREAKDOWN_TABLES.items():
+        part = breakdown[breakdown['dimension'] == dimension].rename(columns={'dimension_value': label})
+        part = part.drop(columns='dimension') if with_sessions else part[[label] + REVENUE_COLUMNS]
+        tables[key] = part.reset_index(drop=True)
+    return tables
+
+
+def postprocess_insight(results):
+    # 컬럼명 한글화 + 파생 컬럼 + 현재매출 순 정렬 (실패 시 예외를 그대로 올림)
+    if 'breakdown' in results:
+        results.update(split_breakdown(results.pop('breakdown')))
+    for key in results:
+        if results[key] is not None and not results[key].empty:
+            # NumPy/pyarrow dtype 모두 포함 (query_runner.download는 pyarrow dtype을 유지)
+            numeric_cols = results[key].select_dtypes(include='number').columns
+            results[key][numeric_cols] = results[key][numeric_cols].fillna(0)
+
+    if 'product' in results and not results['product'].empty:
+        results['product'].rename(columns={
+            'product_name': '제품명',
+            'current_revenue': '현재매출',
+            'previous_revenue': '이전매출',
+            'revenue_change': '매출변화',
+            'revenue_change_pct': '증감율',
+            'current_sessions': '현재세션',
+            'previous_sessions': '이전세션',
+            'current_quantity': '현재수량',
+            'previous_quantity': '이전수량'
+        }, inplace=True)
+
+    if 'product' in results and not results['product'].empty:
+        pdf = results['product']
+        pdf['세션변화'] = pdf['현재세션'] - pdf['이전세션']
+        pdf['수량변화'] = pdf['현재수량'] - pdf['이전수량']
+        total_revenue = pdf['현재매출'].sum()
+        pdf['매출비중'] = (pdf['현재매출'] / total_revenue * 100 if total_revenue > 0 else 0).round(1)
+        pdf = pdf.sort_values(by='현재매출', ascending=False).reset_index(drop=True)
+        results['product'] = pdf
+
+    if 'channel_combined' in results:
+        results['channel_combined'].columns = ['채널', '현재매출', '이전매출', '매출변화', '매출증감율', '현재세션', '이전세션', '세션변화', '세션증감율']
+        if not results['channel_combined'].empty:
+            results['channel_combined'] = results['channel_combined'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
+
+    if 'demo' in results:
+        results['demo'].columns = ['지역', '현재매출', '이전매출', '매출변화', '증감율']
+        if not results['demo'].empty:
+            results['demo'] = results['demo'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
+
+    if 'device' in results:
+        results['device'].columns = ['디바이스', '현재매출', '이전매출', '매출변화', '증감율']
+        if not results['device'].empty:
+            results['device'] = results['device'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
+
+    if 'demographics_combined' in results:
+        results['demographics_combined'].columns = ['인구통계', '현재매출', '이전매출', '매출변화', '매출증감율', '현재세션', '이전세션', '세션변화', '세션증감율']
+        if not results['demographics_combined'].empty:
+            results['demographics_combined'] = results['demographics_combined'].sort_values(by='현재매출', ascending=False).reset_index(drop=True)
+
+    return results
+
+
+# -------------------------------------------------
+# 대량 구매 품목 상세
+# -------------------------------------------------
+def bulk_detail_queries(start_c, end_c, mirrored=False, bulk_threshold=BULK_REVENUE_THRESHOLD, purchase_items=False):
+    # purchase_items: 구매 품목 테이블이 분석 기간을 덮으면 그 테이블에서 (원본 사본 여부와 무관)
+    if purchase_items:
+        return {'bulk_detail': build_purchase_bulk_detail_query(start_c, end_c, bulk_threshold)}
+    return on_mirror({'bulk_detail': build_bulk_detail_query(start_c, end_c, bulk_threshold)}, mirrored)
+
+
+# -------------------------------------------------
+# 대량 구매 요약 (type, bulk_orders, bulk_revenue, bulk_total_revenue)
+# 요약 쿼리는 기본 기준(BULK_REVENUE_THRESHOLD)으로 계산 - 사이드바 기준이 다르거나 구매 품목 테이블이 있을 때만 따로 조회해서
+# 요약의 bulk_orders/bulk_revenue를 바꿈 (기준을 바꿔도 요약 전체를 다시 조회하지 않음)
+# bulk_total_revenue: 대량 구매 매출과 같은 기준의 전체 구매 매출 (구매 품목 테이블이면 중복 제거) - 대량 매출 비중의 분모
+# -------------------------------------------------
+def bulk_summary_needed(bulk_threshold, purchase_items=False):
+    return purchase_items or bulk_threshold != BULK_REVENUE_THRESHOLD
+
+
+def bulk_summary_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독", bulk_threshold=BULK_REVENUE_THRESHOLD,
+                         mirrored=False, purchase_items=False):
+    if purchase_items:
+        return build_purchase_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source, bulk_threshold)
+    return on_mirror(build_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source, bulk_threshold), mirrored)
+
+
+def with_bulk_summary(summary, bulk):
+    # 요약(type별 1행)의 bulk_orders/bulk_revenue를 대량 구매 요약 값으로 바꾸고 bulk_total_revenue를 더한 새 DataFrame
+    # (구매가 없는 기간은 0)
+    bulk = bulk.set_index('type')
+    summary = summary.copy()
+    for col in ('bulk_orders', 'bulk_revenue'):
+        summary[col] = summary['type'].map(bulk[col]).fillna(0).astype(summary[col].dtype)
+    summary['bulk_total_revenue'] = summary['type'].map(bulk['bulk_total_revenue']).fillna(0).astype(summary['revenue'].dtype)
+    return summary
+
+
+def bulk_share(row):
+    # 대량 매출 비중 (%) - 대량 구매 요약을 따로 조회했으면 같은 기준의 전체 구매 매출, 아니면 요약 매출로 나눔
+    total = row['bulk_total_revenue'] if 'bulk_total_revenue' in row.index else row['revenue']
+    return row['bulk_revenue'] / total * 100 if total > 0 else 0
+
+
+# -------------------------------------------------
+# 스크립트 모드 (config.SCRIPT_MODE - 한 번의 BigQuery 스크립트, queries.build_script_query)
+# 세션 롤업이 적재된 기간은 롤업 쿼리가 더 싸므로 기존 경로 사용 (None)
+# -------------------------------------------------
+def script_query(start_c, end_c, start_p, end_p, data_source="온라인 단독", use_rollup=False, use_sketches=False,
+                 classified=False, mirrored=False):
+    # choose_sources() 결과를 그대로 받음 (근사 모드는 롤업 기간에만 적용되므로 use_sketches는 쓰지 않음)
+    if not config.SCRIPT_MODE or use_rollup:
+        return None
+    script = build_script_query(start_c, end_c, start_p, end_p, data_source, classified)
+    return on_mirror({'script': script}, mirrored)['script']
+
+
+def split_script_results(results):
+    # run_script 결과 -> {summary, timeseries(일별 - rebucket 전), insight(postprocess_insight), bulk_detail}
+    return {
+        'summary': results['summary'],
+        'timeseries': results['timeseries'],
+        'insight': postprocess_insight({'product': results['product'], 'breakdown': results['breakdown']}),
+        'bulk_detail': results['bulk_detail'],
+    }
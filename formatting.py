@@ -0,0 +1,133 @@
+# SIDIZ Dashboard - 표/텍스트 표시 형식
+# 표: 숫자 컬럼은 숫자 그대로 두고 st.column_config로 표시 형식만 지정 -> 정렬 가능, 행 단위 Python 포맷팅 없음
+# 텍스트(인사이트 문구): Series 단위로 한 번에 문자열 변환
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# printf 형식 (Streamlit NumberColumn, ',' 천 단위 구분은 streamlit>=1.55)
+CURRENCY = "₩%,d"
+CURRENCY_DELTA = "₩%+,d"
+NUMBER = "%,d"
+NUMBER_DELTA = "%+,d"
+PERCENT = "%.1f%%"
+PERCENT_DELTA = "%+.1f%%"
+QUANTITY = "%,d개"
+QUANTITY_DELTA = "%+,d개"
+ORDERS = "%,d건"
+
+# 상세 분석 탭/대량 구매 표 공통 컬럼 형식
+COLUMN_FORMATS = {
+    '현재매출': CURRENCY,
+    '이전매출': CURRENCY,
+    '매출액': CURRENCY,
+    '매출변화': CURRENCY_DELTA,
+    '증감율': PERCENT_DELTA,
+    '매출증감율': PERCENT_DELTA,
+    '세션증감율': PERCENT_DELTA,
+    '매출비중': PERCENT,
+    '현재세션': NUMBER,
+    '이전세션': NUMBER,
+    '세션변화': NUMBER_DELTA,
+    '현재수량': QUANTITY,
+    '이전수량': QUANTITY,
+    '수량': QUANTITY,
+    '수량변화': QUANTITY_DELTA,
+    '주문수': ORDERS,
+    # 쿼리 계측 패널
+    '처리(MB)': "%,.1f",
+    '과금(MB)': "%,.1f",
+    '슬롯(ms)': NUMBER,
+    '대기(s)': "%.2f",
+    '실행(s)': "%.2f",
+    '다운로드(s)': "%.2f",
+    '평균 실행(s)': "%.2f",
+    '실행 수': NUMBER,
+    'BQ 캐시 적중': NUMBER,
+}
+
+
+def column_config(columns):
+    return {
+        col: st.column_config.NumberColumn(col, format=COLUMN_FORMATS[col])
+        for col in columns if col in COLUMN_FORMATS
+    }
+
+
+def show_table(df, columns, height=600):
+    st.dataframe(df[columns], column_config=column_config(columns), use_container_width=True, height=height)
+
+
+# -------------------------------------------------
+# 쿼리 계측 (query_runner.job_stats 목록 -> 표)
+# -------------------------------------------------
+def _mb(values):
+    return pd.to_numeric(values, errors='coerce') / (1024 * 1024)
+
+
+def query_stats_frame(entries):
+    df = pd.DataFrame(entries)
+    return pd.DataFrame({
+        '쿼리': df['name'],
+        '처리(MB)': _mb(df['bytes_processed']),
+        '과금(MB)': _mb(df['bytes_billed']),
+        '슬롯(ms)': pd.to_numeric(df['slot_millis'], errors='coerce'),
+        'BQ 캐시': df['cache_hit'],
+        '대기(s)': pd.to_numeric(df['queue_s'], errors='coerce'),
+        '실행(s)': pd.to_numeric(df['exec_s'], errors='coerce'),
+        '다운로드(s)': pd.to_numeric(df['download_s'], errors='coerce'),
+        'job id': df['job_id'],
+        '오류': df['error'],
+    })
+
+
+def query_stats_by_name(entries):
+    # 쿼리 이름별 누적 - 과금 바이트가 큰 순
+    frame = query_stats_frame(entries)
+    grouped = frame.groupby('쿼리').agg(**{
+        '실행 수': ('쿼리', 'size'),
+        '과금(MB)': ('과금(MB)', 'sum'),
+        '슬롯(ms)': ('슬롯(ms)', 'sum'),
+        '평균 실행(s)': ('실행(s)', 'mean'),
+        'BQ 캐시 적중': ('BQ 캐시', lambda s: int(s.eq(True).sum())),
+    })
+    return grouped.sort_values('과금(MB)', ascending=False).reset_index()
+
+
+# -------------------------------------------------
+# Series -> 문자열 (인사이트 문구용)
+# -------------------------------------------------
+def arrow(values):
+    return pd.Series(np.where(values > 0, "↑", "↓"), index=values.index)
+
+
+def won(values):
+    # 절댓값 원화 ('₩1,234,567')
+    return "₩" + count(values)
+
+
+def count(values):
+    return values.abs().round().astype('int64').map('{:,}'.format)
+
+
+def signed_percent(values):
+    return values.fillna(0).map('{:+.1f}%'.format)
+
+
+def format_bytes(value):
+    # 1234567890 -> '1.1 GB'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(value) < 1024:
+            return f"{value:,.1f} {unit}" if unit != 'B' else f"{int(value)} B"
+        value /= 1024
+    return f"{value:,.1f} TB"
+
+
+def change_lines(df, name_col, change_col, pct_col, threshold, value=won, unit=""):
+    # df 순서대로 1부터 번호를 매기고, |변화| > threshold 인 행만 '**1. 이름** ↑ ₩1,234 (+5.0%)' 형태로 반환
+    ranks = pd.Series(range(1, len(df) + 1), index=df.index).astype(str)
+    lines = (
+        "**" + ranks + ". " + df[name_col].astype(str) + "** " + arrow(df[change_col]) + " "
+        + value(df[change_col]) + unit + " (" + signed_percent(df[pct_col]) + ")"
+    )
+    return lines[df[change_col].abs() > threshold].tolist()
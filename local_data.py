@@ -0,0 +1,285 @@
+# SIDIZ Dashboard - 로컬 Parquet 실행 백엔드 (SIDIZ_BACKEND=local)
+# GA4 일별 샤드와 집계 테이블을 일자 단위 Parquet으로 받아 두고, 대시보드 SQL을 BigQuery 대신 DuckDB로 실행한다
+# (local_engine - 같은 SQL을 sqlglot으로 변환). 받아 둔 기간은 BigQuery 왕복 없이 조회되고 오프라인에서도 동작한다.
+#
+#   python local_data.py sync                      # 최근 LOCAL_SYNC_DAYS일 중 없거나 다시 export/refresh된 일자만 받음
+#   python local_data.py sync --table session_daily --from 20250101 --to 20250131
+#   python local_data.py sync --prune              # 받은 뒤 기간 이전의 일자 파일 삭제
+#   python local_data.py status
+#
+# 디렉터리 구조: LOCAL_DATA_DIR/<테이블>/suffix=YYYYMMDD/data.parquet (GA4 샤드는 events)
+# - 파일마다 Parquet 메타데이터에 원본 샤드 last_modified(events) 또는 _refresh_log 적재 기록(집계 테이블)을 남김
+#   -> 다시 sync하면 BigQuery 쪽 기록과 비교해서 바뀐 일자만 다시 받음 (rollups.pending_days와 같은 기준)
+#   -> 로컬 _refresh_log / __TABLES__ 뷰도 이 메타데이터로 만들어서 rollup_coverage / list_source_shards가 그대로 동작
+# - 쓰기는 임시 파일 + os.replace - 앱이 실행 중이어도 완성된 파일만 읽고, 새로 받은 일자는 다음 조회부터 보임
+# distinct_sketch_daily(HLL++ 스케치)는 DuckDB에서 병합할 수 없고 events_mirror는 events와 같은 데이터라 받지 않음
+# (로컬 적재 기록이 없으므로 앱은 정확한 고유 수/원본 쿼리 경로를 씀)
+import argparse
+import glob
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import config
+from local_engine import LOCAL_EVENTS_VIEW, LocalClient, LocalEngine
+from queries import EVENTS_TABLE
+from query_runner import cli_client, submit
+from rollups import EVENTS_MIRROR_COLUMNS, ROLLUPS, list_source_shards, log_name, refreshed_days
+
+EVENTS = 'events'
+SYNC_TABLES = [EVENTS] + [name for name in ROLLUPS if name not in ('events_mirror', 'distinct_sketch_daily')]
+
+TABLE_NAME_KEY = b'sidiz.table_name'
+MODIFIED_KEY = b'sidiz.source_modified'
+LOOKAHEAD_KEY = b'sidiz.lookahead_complete'
+SYNCED_KEY = b'sidiz.synced_at'
+
+
+def _millis(value):
+    return None if value is None else int(value.timestamp() * 1000)
+
+
+def _path(root, table, suffix):
+    return os.path.join(root, table, f"suffix={suffix}", "data.parquet")
+
+
+def _files(root, table='*'):
+    return glob.glob(os.path.join(root, table, 'suffix=*', 'data.parquet'))
+
+
+def _suffix(path):
+    return os.path.basename(os.path.dirname(path))[len('suffix='):]
+
+
+def local_days(root, table):
+    # {YYYYMMDD: 파일 메타데이터 {키: 값(bytes)}} - 읽을 수 없는 파일은 없는 일자로 보고 다시 받음
+    days = {}
+    for path in _files(root, table):
+        try:
+            days[_suffix(path)] = pq.read_metadata(path).metadata or {}
+        except (OSError, pa.ArrowException):
+            continue
+    return days
+
+
+def write_day(root, table, suffix, data, metadata):
+    # data: pyarrow.Table, metadata: {키: 값(bytes)} - 같은 디렉터리의 임시 파일에 쓴 뒤 os.replace
+    path = _path(root, table, suffix)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = data.replace_schema_metadata({
+        **(data.schema.metadata or {}),
+        **metadata,
+        SYNCED_KEY: str(_millis(datetime.now())).encode(),
+    })
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(data, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _download(client, sql):
+    job = submit(client, sql)
+    job.result()
+    return job.to_arrow(create_bqstorage_client=config.USE_BQSTORAGE)
+
+
+# -------------------------------------------------
+# sync: BigQuery -> 로컬 Parquet (없거나 바뀐 일자만)
+# -------------------------------------------------
+def pending_events(client, root, start_suffix, end_suffix, force=False):
+    # [(suffix, 원본 last_modified)] - 로컬에 없거나 GA4가 다시 export한 샤드
+    shards = list_source_shards(client, start_suffix, end_suffix)
+    local = local_days(root, EVENTS)
+    return [
+        (suffix, shards[suffix]) for suffix in sorted(shards)
+        if force or local.get(suffix, {}).get(MODIFIED_KEY) != str(_millis(shards[suffix])).encode()
+    ]
+
+
+def sync_events(client, root, start_suffix, end_suffix, force=False, log=print):
+    days = pending_events(client, root, start_suffix, end_suffix, force)
+    log(f"[{EVENTS}] sync 대상 {len(days)}일")
+    for suffix, modified in days:
+        data = _download(client, f"SELECT {EVENTS_MIRROR_COLUMNS} FROM {EVENTS_TABLE} WHERE _TABLE_SUFFIX = '{suffix}'")
+        write_day(root, EVENTS, suffix, data, {MODIFIED_KEY: str(_millis(modified)).encode()})
+        log(f"[{EVENTS}] {suffix} 완료 ({data.num_rows:,}행)")
+    return [suffix for suffix, _ in days]
+
+
+def _log_metadata(name, modified, lookahead_complete):
+    metadata = {TABLE_NAME_KEY: log_name(name).encode(), LOOKAHEAD_KEY: b'1' if lookahead_complete else b'0'}
+    if modified is not None:
+        metadata[MODIFIED_KEY] = str(_millis(modified)).encode()
+    return metadata
+
+
+def pending_table(client, root, name, start_suffix, end_suffix, force=False):
+    # [(suffix, 적재 기록 메타데이터)] - BigQuery에 적재됐는데 로컬에 없거나 적재 기록(원본 시각/lookahead/규칙 버전)이 다른 일자
+    done = refreshed_days(client, name)
+    local = local_days(root, name)
+    pending = []
+    for suffix in sorted(done):
+        if not start_suffix <= suffix <= end_suffix:
+            continue
+        metadata = _log_metadata(name, *done[suffix])
+        stored = local.get(suffix, {})
+        if force or any(stored.get(key) != value for key, value in metadata.items()):
+            pending.append((suffix, metadata))
+    return pending
+
+
+def sync_table(client, root, name, start_suffix, end_suffix, force=False, log=print):
+    spec = ROLLUPS[name]
+    days = pending_table(client, root, name, start_suffix, end_suffix, force)
+    log(f"[{name}] sync 대상 {len(days)}일")
+    for suffix, metadata in days:
+        data = _download(client, f"""
+        SELECT * FROM {spec['table']}
+        WHERE {spec['date_column']} = PARSE_DATE('%Y%m%d', '{suffix}')
+        """)
+        write_day(root, name, suffix, data, metadata)
+        log(f"[{name}] {suffix} 완료 ({data.num_rows:,}행)")
+    return [suffix for suffix, _ in days]
+
+
+def prune(root, names, start_suffix, log=print):
+    # start_suffix 이전 일자 파일 삭제 (sync 기간 밖으로 밀려난 일자)
+    for name in names:
+        old = [path for path in _files(root, name) if _suffix(path) < start_suffix]
+        for path in old:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        if old:
+            log(f"[{name}] {len(old)}일 삭제")
+
+
+def sync(client, names=None, start_suffix=None, end_suffix=None, force=False, prune_old=False, root=None, log=print):
+    # 기본 범위: 최근 LOCAL_SYNC_DAYS일 ~ 어제 (오늘 샤드는 아직 없음)
+    today = datetime.now().date()
+    start_suffix = start_suffix or (today - timedelta(days=config.LOCAL_SYNC_DAYS)).strftime('%Y%m%d')
+    end_suffix = end_suffix or (today - timedelta(days=1)).strftime('%Y%m%d')
+    root = root or config.LOCAL_DATA_DIR
+    names = names or SYNC_TABLES
+
+    synced = {}
+    for name in names:
+        if name == EVENTS:
+            synced[name] = sync_events(client, root, start_suffix, end_suffix, force, log)
+        else:
+            synced[name] = sync_table(client, root, name, start_suffix, end_suffix, force, log)
+    if prune_old:
+        prune(root, names, start_suffix, log)
+    return synced
+
+
+# -------------------------------------------------
+# 로컬 실행: Parquet -> BigQuery와 같은 이름의 DuckDB 뷰
+# -------------------------------------------------
+def _parquet_source(root, table):
+    pattern = os.path.join(root, table, 'suffix=*', 'data.parquet').replace("'", "''")
+    return f"read_parquet('{pattern}', hive_partitioning = true, hive_types = {{'suffix': VARCHAR}})"
+
+
+def _metadata_sql(root):
+    # 파일별 메타데이터 1행 (suffix, 테이블 폴더, 키별 값)
+    pattern = os.path.join(root, '*', 'suffix=*', 'data.parquet').replace("'", "''")
+    return f"""
+    SELECT
+        regexp_extract(file_name, 'suffix=([0-9]{{8}})', 1) as suffix,
+        regexp_extract(file_name, '([^/\\\\]+)[/\\\\]suffix=', 1) as folder,
+        MAX(CASE WHEN decode(key) = '{TABLE_NAME_KEY.decode()}' THEN decode(value) END) as table_name,
+        MAX(CASE WHEN decode(key) = '{MODIFIED_KEY.decode()}' THEN CAST(decode(value) AS BIGINT) END) as source_modified,
+        MAX(CASE WHEN decode(key) = '{LOOKAHEAD_KEY.decode()}' THEN decode(value) = '1' END) as lookahead_complete,
+        MAX(CASE WHEN decode(key) = '{SYNCED_KEY.decode()}' THEN CAST(decode(value) AS BIGINT) END) as synced_at
+    FROM parquet_kv_metadata('{pattern}')
+    GROUP BY file_name
+    """
+
+
+def open_engine(root=None):
+    # 받아 둔 테이블마다 뷰 하나 - 일자 파일은 조회할 때마다 다시 찾으므로 sync한 일자는 재시작 없이 보임
+    # (처음 받은 테이블은 앱 재시작 후부터 사용)
+    # events는 suffix 파티션이 _TABLE_SUFFIX -> 조회 기간 밖의 일자 파일은 읽지 않음
+    root = root or config.LOCAL_DATA_DIR
+    engine = LocalEngine()
+    con = engine.con
+    for name in SYNC_TABLES:
+        if not _files(root, name):
+            continue
+        if name == EVENTS:
+            con.execute(f"""
+            CREATE OR REPLACE VIEW {LOCAL_EVENTS_VIEW} AS
+            SELECT * EXCLUDE (suffix), suffix as _TABLE_SUFFIX FROM {_parquet_source(root, name)}
+            """)
+        else:
+            # `project.dataset.table` -> table (local_engine이 SQL의 테이블 이름을 같은 규칙으로 바꿈)
+            table = ROLLUPS[name]['table'].strip('`').split('.')[-1]
+            con.execute(f"""
+            CREATE OR REPLACE VIEW {table} AS
+            SELECT * EXCLUDE (suffix) FROM {_parquet_source(root, name)}
+            """)
+
+    if _files(root):
+        metadata = _metadata_sql(root)
+        con.execute(f"""
+        CREATE OR REPLACE VIEW _refresh_log AS
+        SELECT table_name, suffix, epoch_ms(source_modified) as source_modified, lookahead_complete,
+            epoch_ms(synced_at) as refreshed_at
+        FROM ({metadata})
+        WHERE table_name IS NOT NULL
+        """)
+        con.execute(f"""
+        CREATE OR REPLACE VIEW __TABLES__ AS
+        SELECT 'events_' || suffix as table_id, source_modified as last_modified_time
+        FROM ({metadata})
+        WHERE folder = '{EVENTS}'
+        """)
+    else:
+        con.execute("""
+        CREATE TABLE _refresh_log (
+            table_name VARCHAR, suffix VARCHAR, source_modified TIMESTAMP, lookahead_complete BOOLEAN, refreshed_at TIMESTAMP
+        )
+        """)
+        con.execute("CREATE TABLE __TABLES__ (table_id VARCHAR, last_modified_time BIGINT)")
+    return engine
+
+
+def open_client(root=None):
+    # bigquery.Client 대신 쓰는 로컬 클라이언트 (app.get_bq_client - SIDIZ_BACKEND=local)
+    return LocalClient(open_engine(root), keep_jobs=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIDIZ 대시보드 로컬 Parquet 데이터 sync")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sync_parser = sub.add_parser('sync', help="BigQuery에서 없거나 바뀐 일자만 받음")
+    sync_parser.add_argument('--table', action='append', choices=SYNC_TABLES, help="대상 테이블 (기본: 전체)")
+    sync_parser.add_argument('--from', dest='start', help="시작 일자 YYYYMMDD")
+    sync_parser.add_argument('--to', dest='end', help="종료 일자 YYYYMMDD")
+    sync_parser.add_argument('--force', action='store_true', help="이미 받은 일자도 다시 받음")
+    sync_parser.add_argument('--prune', action='store_true', help="시작 일자 이전의 로컬 파일 삭제")
+    sub.add_parser('status', help="테이블별 로컬 일자 현황")
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        sync(cli_client(), args.table, args.start, args.end, args.force, args.prune)
+    else:
+        print(f"[local] {config.LOCAL_DATA_DIR}")
+        for name in SYNC_TABLES:
+            days = sorted(local_days(config.LOCAL_DATA_DIR, name))
+            if days:
+                print(f"[{name}] {len(days)}일 ({days[0]} ~ {days[-1]})")
+            else:
+                print(f"[{name}] 받은 일자 없음")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+# SIDIZ Dashboard - BigQuery SQL을 DuckDB로 실행하는 로컬 엔진
+# 오프라인 검증/벤치마크(bench/)와 로컬 실행 백엔드(local_data.py, SIDIZ_BACKEND=local)에서 사용
+import json
+import logging
+import re
+import time
+from datetime import datetime
+
+import duckdb
+import pyarrow as pa
+import sqlglot
+from sqlglot import exp
+
+from queries import EVENTS_TABLE
+
+# PARTITION BY / CLUSTER BY / OPTIONS 등 DuckDB에 없는 속성 경고는 무시
+logging.getLogger('sqlglot').setLevel(logging.ERROR)
+
+EVENTS_WILDCARD = EVENTS_TABLE
+LOCAL_EVENTS_VIEW = 'ga4_events'
+
+
+def _rewrite_array_agg_limit(node):
+    # ARRAY_AGG(x [IGNORE NULLS] ORDER BY y [DESC] LIMIT 1)[OFFSET(0)] -> ARG_MIN/ARG_MAX(x, y)
+    # (DuckDB는 ARRAY_AGG 내 LIMIT 미지원)
+    if not isinstance(node, exp.Bracket):
+        return node
+    agg = node.this
+    ignore_nulls = isinstance(agg, exp.IgnoreNulls)
+    if ignore_nulls:
+        agg = agg.this
+    if not isinstance(agg, exp.ArrayAgg) or not isinstance(agg.this, exp.Limit):
+        return node
+    order = agg.this.this
+    if not isinstance(order, exp.Order):
+        return node
+    value = order.this.sql(dialect='duckdb')
+    key = order.expressions[0]
+    func = 'ARG_MAX' if key.args.get('desc') else 'ARG_MIN'
+    sql = f"{func}({value}, {key.this.sql(dialect='duckdb')})"
+    if ignore_nulls:
+        sql += f" FILTER (WHERE {value} IS NOT NULL)"
+    return sqlglot.parse_one(sql, read='duckdb')
+
+
+def _rewrite_struct_unnest(node):
+    # BigQuery: FROM UNNEST(array<struct>) 는 struct 필드를 바로 노출 (key, value ...)
+    # DuckDB: 단일 'unnest' 컬럼 -> (SELECT __u.* FROM (SELECT UNNEST(x) AS __u)) 로 펼침
+    if isinstance(node, exp.Unnest) and not node.args.get('alias') and isinstance(node.parent, (exp.From, exp.Join)):
+        inner = exp.select(exp.alias_(exp.Unnest(expressions=node.expressions), '__u')).subquery()
+        return exp.select(exp.column(exp.Star(), table='__u')).from_(inner).subquery()
+    return node
+
+
+def _rewrite_date_trunc(node):
+    # BigQuery DATE_TRUNC(date, MONTH)는 DATE, DuckDB date_trunc('MONTH', date)는 TIMESTAMP
+    # -> CASE 분기(주/월/일)나 CAST(... AS STRING) 결과가 BigQuery와 같도록 DATE로 고정
+    if isinstance(node, exp.DateTrunc) and not isinstance(node.parent, exp.Cast):
+        return exp.cast(node, 'DATE')
+    return node
+
+
+def _rewrite_hll_count(node):
+    # HLL_COUNT.INIT/MERGE (BigQuery HLL++ 스케치) -> 고유값 LIST / 병합 후 고유값 개수
+    # 로컬 엔진에서는 스케치 대신 고유값 목록을 저장하므로 근사 오차 없이 정확한 값
+    if not isinstance(node, exp.Dot) or not isinstance(node.expression, exp.Anonymous):
+        return node
+    if node.this.name.upper() != 'HLL_COUNT':
+        return node
+    func = node.expression.name.upper()
+    value = node.expression.expressions[0].sql(dialect='duckdb')
+    if func == 'INIT':
+        sql = f"LIST(DISTINCT {value}) FILTER (WHERE {value} IS NOT NULL)"
+    elif func == 'MERGE':
+        sql = f"COALESCE(LENGTH(LIST_DISTINCT(FLATTEN(LIST({value}) FILTER (WHERE {value} IS NOT NULL)))), 0)"
+    else:
+        return node
+    return sqlglot.parse_one(sql, read='duckdb')
+
+
+def _rewrite_sketch_columns(node):
+    # 스케치 컬럼(BYTES) -> 고유값 목록 VARCHAR[] (_rewrite_hll_count)
+    if isinstance(node, exp.ColumnDef) and node.args.get('kind') is not None and node.args['kind'].this == exp.DataType.Type.BINARY:
+        node.set('kind', exp.DataType.build('VARCHAR[]', dialect='duckdb'))
+    return node
+
+
+def _rewrite_unnest_offset(tree):
+    # BigQuery UNNEST ... WITH OFFSET은 0부터, DuckDB WITH ORDINALITY는 1부터 -> offset 컬럼 참조를 (offset - 1)로
+    names = {
+        unnest.args['offset'].name for unnest in tree.find_all(exp.Unnest)
+        if isinstance(unnest.args.get('offset'), exp.Identifier)
+    }
+    if not names:
+        return tree
+
+    def shift(node):
+        if not isinstance(node, exp.Column) or node.name not in names:
+            return node
+        shifted = exp.paren(exp.Sub(this=node.copy(), expression=exp.Literal.number(1)))
+        return exp.alias_(shifted, node.name) if isinstance(node.parent, exp.Select) else shifted
+    return tree.transform(shift)
+
+
+def _local_table_names(sql):
+    # `project.dataset.events_*` -> ga4_events, `project.dataset.table` -> table
+    sql = sql.replace(EVENTS_WILDCARD, LOCAL_EVENTS_VIEW)
+    return re.sub(r'`[\w-]+\.[\w-]+\.(\w+)`', r'\1', sql)
+
+
+def _sql_literal(value):
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_sql_literal(v) for v in value) + ']'
+    return "'" + str(value).replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def inline_parameters(sql, params):
+    # BigQuery 쿼리 파라미터(@name)를 리터럴로 치환 (DuckDB로 옮기기 전에 적용)
+    # params: queries.Query.params 형식 (이름, 타입, 값) 또는 bigquery.ScalarQueryParameter / ArrayQueryParameter
+    values = {}
+    for param in params or ():
+        if isinstance(param, tuple):
+            values[param[0]] = param[2]
+        else:
+            values[param.name] = param.values if hasattr(param, 'array_type') else param.value
+    return re.sub(r'@(\w+)', lambda m: _sql_literal(values[m.group(1)]), sql)
+
+
+def to_duckdb(sql):
+    sql = _local_table_names(sql)
+    statements = []
+    for tree in sqlglot.parse(sql, read='bigquery'):
+        if tree is None:
+            continue
+        tree = tree.transform(_rewrite_array_agg_limit).transform(_rewrite_struct_unnest).transform(_rewrite_date_trunc)
+        tree = tree.transform(_rewrite_hll_count).transform(_rewrite_sketch_columns)
+        tree = _rewrite_unnest_offset(tree)
+        statements.append(tree.sql(dialect='duckdb'))
+    return statements
+
+
+class LocalEngine:
+    def __init__(self, con=None):
+        self.con = con or duckdb.connect()
+
+    def load_shards(self, shards, to_arrow):
+        # shards: {YYYYMMDD: [row, ...]} -> events 테이블 + _TABLE_SUFFIX 컬럼을 가진 와일드카드 대용 뷰
+        first = True
+        for suffix in sorted(shards):
+            table = to_arrow(shards[suffix])
+            self.con.register('_shard', table)
+            if first:
+                self.con.execute("CREATE OR REPLACE TABLE events AS SELECT *, ? AS _TABLE_SUFFIX FROM _shard", [suffix])
+                first = False
+            else:
+                self.con.execute("INSERT INTO events SELECT *, ? AS _TABLE_SUFFIX FROM _shard", [suffix])
+            self.con.unregister('_shard')
+        self.con.execute(f"CREATE OR REPLACE VIEW {LOCAL_EVENTS_VIEW} AS SELECT * FROM events")
+
+    def cluster(self, table, columns):
+        # BigQuery 파티션/클러스터링 대용 - 컬럼 순으로 정렬해서 다시 저장 (row group min/max로 블록 단위 필터링)
+        self.con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {table} ORDER BY {', '.join(columns)}")
+
+    def replicate(self, copies):
+        # 적재된 이벤트를 copies배로 복제 (사용자/주문 ID만 바꿔서 같은 분포 유지) - 대용량 벤치마크용
+        # _TABLE_SUFFIX 순으로 다시 저장해야 row group 단위 필터링(샤드 pruning 대용)이 유지됨
+        if copies <= 1:
+            return
+        self.con.execute("ALTER TABLE events RENAME TO events_base")
+        self.con.execute(f"""
+            CREATE TABLE events AS
+            SELECT e.* REPLACE (
+                CASE WHEN r.k = 0 THEN e.user_pseudo_id ELSE e.user_pseudo_id || '.r' || r.k END AS user_pseudo_id,
+                struct_pack(
+                    purchase_revenue := e.ecommerce.purchase_revenue,
+                    transaction_id := CASE WHEN r.k = 0 THEN e.ecommerce.transaction_id ELSE e.ecommerce.transaction_id || '.r' || r.k END
+                ) AS ecommerce
+            )
+            FROM events_base e, range({int(copies)}) r(k)
+            ORDER BY e._TABLE_SUFFIX
+        """)
+        self.con.execute("DROP TABLE events_base")
+        self.con.execute(f"CREATE OR REPLACE VIEW {LOCAL_EVENTS_VIEW} AS SELECT * FROM events")
+
+    def event_count(self):
+        return self.con.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def query(self, sql, profile=None, params=None, statements_out=None):
+        # 스레드마다 별도 cursor 사용 (DuckDB connection 객체는 동시 실행에 안전하지 않음)
+        # profile: dict를 넘기면 rows_scanned / rows_returned / latency_ms 를 statement 합계로 채움
+        # params: 쿼리 파라미터 (inline_parameters)
+        # statements_out: list를 넘기면 statement마다 (statement_type, DataFrame 또는 None) 추가 (스크립트의 child job 대용)
+        if params:
+            sql = inline_parameters(sql, params)
+        cursor = self.con.cursor()
+        try:
+            if profile is not None:
+                cursor.execute("PRAGMA enable_profiling='no_output'")
+                cursor.execute("PRAGMA profiling_mode='detailed'")
+                profile.update(rows_scanned=0, rows_returned=0, latency_ms=0.0)
+            statements = to_duckdb(sql)
+            df = None
+            for i, statement in enumerate(statements):
+                start = time.perf_counter()
+                cursor.execute(statement)
+                statement_type = _statement_type(statement)
+                if i == len(statements) - 1 or (statements_out is not None and statement_type == 'SELECT'):
+                    df = cursor.df()
+                if statements_out is not None:
+                    statements_out.append((statement_type, df if statement_type == 'SELECT' else None))
+                if profile is not None:
+                    info = json.loads(cursor.get_profiling_information(format='json'))
+                    profile['rows_scanned'] += info.get('cumulative_rows_scanned', 0)
+                    profile['latency_ms'] += (time.perf_counter() - start) * 1000
+            if profile is not None and df is not None:
+                profile['rows_returned'] = len(df)
+            return df
+        finally:
+            cursor.close()
+
+
+def _statement_type(statement):
+    # BigQuery child job의 statement_type 대용 (SELECT / CREATE_TABLE_AS_SELECT / 그 외 첫 키워드)
+    words = statement.split(None, 1)
+    keyword = words[0].upper() if words else ''
+    if keyword in ('SELECT', 'WITH', '('):
+        return 'SELECT'
+    if keyword == 'CREATE':
+        return 'CREATE_TABLE_AS_SELECT'
+    return keyword
+
+
+class LocalJob:
+    # bigquery.QueryJob 대용 - result() 시점에 DuckDB에서 실행하고 프로파일을 남김
+    # 여러 statement(스크립트)면 statement마다 child job (LocalClient.list_jobs(parent_job=...))
+    def __init__(self, engine, sql, profile=False, params=None):
+        self.engine = engine
+        self.sql = sql
+        self.params = params
+        self.profile = {} if profile else None
+        self.job_id = f"local_{id(self):x}"
+        self.statement_type = _statement_type(sql)
+        self.created = datetime.now()
+        self.children = []
+        self._df = None
+
+    def __iter__(self):
+        # RowIterator 대용 - 행마다 컬럼 이름 속성 (rollups.list_source_shards/refreshed_days 등)
+        return self.result()._df.itertuples(index=False, name='Row')
+
+    def result(self, **kwargs):
+        if self._df is None:
+            statements = []
+            self._df = self.engine.query(self.sql, self.profile, self.params, statements)
+            if len(statements) > 1:
+                self.children = [_child_job(self, statement_type, df) for statement_type, df in statements]
+        return self
+
+    def to_dataframe(self, **kwargs):
+        return self.result()._df
+
+    def to_arrow(self, **kwargs):
+        return pa.Table.from_pandas(self.result()._df, preserve_index=False)
+
+
+def _child_job(parent, statement_type, df):
+    job = LocalJob(parent.engine, '', params=parent.params)
+    job.statement_type = statement_type
+    job._df = df
+    return job
+
+
+class LocalClient:
+    # bigquery.Client 대용 - query_runner.run_queries()가 쓰는 client.query(sql, job_config) -> result()/to_dataframe() 경로만 지원
+    # keep_jobs: SQL별 마지막 job 보관 (벤치마크 프로파일 조회용 - 오래 실행되는 앱에서는 끔)
+    def __init__(self, engine, profile=False, keep_jobs=True):
+        self.engine = engine
+        self.profile = profile
+        self.keep_jobs = keep_jobs
+        self.jobs = {}
+
+    def query(self, sql, job_config=None, **kwargs):
+        job = LocalJob(self.engine, sql, self.profile, getattr(job_config, 'query_parameters', None))
+        if getattr(job_config, 'dry_run', False):
+            # 로컬 실행은 과금되지 않음 - 실행 없이 처리량 0 (조회 비용 가드 통과)
+            job.total_bytes_processed = 0
+            return job
+        if self.keep_jobs:
+            self.jobs[sql] = job
+        return job
+
+    def list_jobs(self, parent_job=None, **kwargs):
+        # 스크립트의 child job - BigQuery처럼 최근 생성 순
+        parent = parent_job if isinstance(parent_job, LocalJob) else next(
+            job for job in self.jobs.values() if job.job_id == parent_job
+        )
+        return list(reversed(parent.children))
@@ -0,0 +1,1311 @@
+# SIDIZ Dashboard - 대시보드 SQL 템플릿
+# GA4 원본(events_*)과 세션 일별 롤업(rollups.py) 두 가지 소스에 대한 쿼리를 만든다.
+# SQL 본문은 모듈 로드 시 한 번만 만들고, 기간/소스처럼 조회마다 바뀌는 값은 BigQuery 쿼리 파라미터(@start_c 등)로 넘긴다.
+# -> 같은 템플릿은 조회 조건과 무관하게 항상 같은 SQL 텍스트 (BigQuery 결과 캐시는 SQL + 파라미터가 같으면 적중)
+import hashlib
+import json
+import re
+from collections import namedtuple
+from datetime import timedelta
+
+import config
+
+EVENTS_TABLE = f"`{config.GCP_PROJECT}.{config.ANALYTICS_DATASET}.events_*`"
+SESSION_ROLLUP_TABLE = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}.session_daily`"
+SKETCH_ROLLUP_TABLE = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}.distinct_sketch_daily`"
+TRANSACTION_CLASS_TABLE = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}.transaction_class`"
+EVENTS_MIRROR_TABLE = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}.events_mirror`"
+PURCHASE_ITEMS_TABLE = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}.purchase_items`"
+
+# 매장 소스 리스트 (@store_sources 파라미터로 전달)
+STORE_SOURCES = ('qr_store_247486', 'qr_store_247482', 'qr_store_252941', 'qr_store_247476',
+                 'store_register_qr', 'qr_store_247483', 'qr_store_247488', 'qr_store_247474',
+                 'qr_store_247489', 'qr_store_247475', 'qr_store_247485', 'qr_store_')
+
+# -------------------------------------------------
+# 조회 기간 플래너 (롤업 적재 범위 확인용)
+# 현재/비교 기간을 겹치거나 맞닿은 구간끼리만 합친 [(YYYYMMDD, YYYYMMDD), ...]
+# -------------------------------------------------
+def plan_suffix_ranges(*periods):
+    # periods: (start, end) date 쌍 -> 서로 겹치지 않는 정렬된 [(YYYYMMDD, YYYYMMDD), ...]
+    merged = []
+    for start, end in sorted(periods):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start.strftime('%Y%m%d'), end.strftime('%Y%m%d')) for start, end in merged]
+
+
+# -------------------------------------------------
+# 쿼리 파라미터 + fingerprint
+# -------------------------------------------------
+# template: TEMPLATES 키, sql: 고정 SQL 텍스트, params: ((이름, 타입, 값), ...) 이름순 - 해시 가능 (st.cache_data 인자로 사용)
+Query = namedtuple('Query', ['template', 'sql', 'params'])
+
+
+def _param(name, value):
+    if isinstance(value, bool):
+        return (name, 'BOOL', value)
+    if isinstance(value, int):
+        return (name, 'INT64', value)
+    if isinstance(value, (list, tuple)):
+        return (name, 'ARRAY<STRING>', tuple(value))
+    return (name, 'STRING', value)
+
+
+def bind(template, **params):
+    # 템플릿에서 쓰는 @파라미터와 넘긴 값이 정확히 같아야 함 (빠진 값/남는 값 모두 오류)
+    sql = TEMPLATES[template]
+    mismatch = set(re.findall(r'@(\w+)', sql)) ^ set(params)
+    if mismatch:
+        raise ValueError(f"{template} 쿼리 파라미터 불일치: {', '.join(sorted(mismatch))}")
+    return Query(template, sql, tuple(_param(name, params[name]) for name in sorted(params)))
+
+
+def period_params(start_c, end_c, start_p=None, end_p=None):
+    # 기간 파라미터는 샤드 접미사와 같은 YYYYMMDD 문자열 (날짜 비교는 SQL에서 PARSE_DATE)
+    params = {'start_c': start_c.strftime('%Y%m%d'), 'end_c': end_c.strftime('%Y%m%d')}
+    if start_p is not None:
+        params.update(start_p=start_p.strftime('%Y%m%d'), end_p=end_p.strftime('%Y%m%d'))
+    return params
+
+
+def fingerprint(query):
+    # 템플릿 SQL + 파라미터 -> 프로세스/재시작과 무관한 고정 해시 (템플릿이 바뀌면 fingerprint도 바뀜)
+    payload = json.dumps([query.template, query.sql, query.params], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def queries_fingerprint(queries):
+    # 한 번의 조회({이름: Query}) 단위 fingerprint - 결과 캐시 키
+    payload = json.dumps(sorted((name, fingerprint(query)) for name, query in queries.items()))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+# 현재 또는 비교 기간 - 두 기간이 겹쳐도 OR 조건이라 같은 샤드를 두 번 읽지 않고,
+# 사이 공백(예: 전년 동기 비교 시 1년치 샤드)은 읽지 않는다.
+SCAN_FILTER_SQL = "(_TABLE_SUFFIX BETWEEN @start_c AND @end_c OR _TABLE_SUFFIX BETWEEN @start_p AND @end_p)"
+IN_CURRENT_SQL = "date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c)"
+IN_PREVIOUS_SQL = "date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p)"
+ROLLUP_SCAN_FILTER_SQL = f"({IN_CURRENT_SQL} OR {IN_PREVIOUS_SQL})"
+
+
+# 주문의 모든 품목이 EASY REPAIR/부품이면 '이지리페어 단독 주문' (UNNEST(items) as item 기준, LOGICAL_AND로 집계)
+EASY_REPAIR_ITEM_SQL = """(
+    REGEXP_CONTAINS(UPPER(IFNULL(item.item_category, '')), r'EASY.REPAIR') OR 
+    REGEXP_CONTAINS(UPPER(IFNULL(item.item_name, '')), r'EASY.REPAIR') OR
+    REGEXP_CONTAINS(item.item_name, r'pad|headrest|cover|leg|wheel|glide|block|seat|easy.repair')
+)"""
+# 대량 구매 기준 (주문 매출, 원)
+BULK_REVENUE_THRESHOLD = 1500000
+# 주문 분류 규칙 버전 (transaction_class 테이블) - EASY_REPAIR_ITEM_SQL을 바꾸면 올리고
+# python rollups.py backfill --table transaction_class 로 다시 분류 (backfill 전까지 대시보드는 원본에서 직접 분류)
+TRANSACTION_RULES_VERSION = 1
+
+# 이벤트 단위 인구통계 라벨 ('Male / 25-34' 형식, 인구통계 쿼리와 동일한 정규화)
+DEMOGRAPHIC_SQL = """CONCAT(
+    CASE COALESCE(
+            LOWER((SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
+            LOWER((SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
+            ''
+        )
+        WHEN 'male' THEN 'Male' WHEN 'm' THEN 'Male' WHEN 'male_ko' THEN 'Male' WHEN '1' THEN 'Male'
+        WHEN 'female' THEN 'Female' WHEN 'f' THEN 'Female' WHEN 'female_ko' THEN 'Female' WHEN '2' THEN 'Female'
+        ELSE 'Unknown'
+    END,
+    ' / ',
+    COALESCE(NULLIF(COALESCE(
+        (SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
+        (SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
+        'Unknown'
+    ), ''), 'Unknown')
+)"""
+
+
+# -------------------------------------------------
+# GA4 원본 (events_*) 쿼리
+# -------------------------------------------------
+# 요약 집계부 (base CTE 뒤에 붙임)
+# 이지리페어 단독 주문 분류: 원본 품목에서 직접 분류(INLINE) 또는 transaction_class 테이블(규칙 버전별로 미리 분류, 일자 단위)
+# 분류 결과는 LEFT JOIN으로 붙임 (NOT IN 서브쿼리 대신) - 분류가 없는 주문은 필터링 대상 주문
+INLINE_TRANSACTION_CLASS_SQL = f"""
+        transaction_class AS (
+            SELECT 
+                transaction_id,
+                LOGICAL_AND({EASY_REPAIR_ITEM_SQL}) as is_easy_repair_only
+            FROM base, UNNEST(items) as item
+            WHERE event_name = 'purchase'
+            GROUP BY transaction_id
+        )"""
+
+TABLE_TRANSACTION_CLASS_SQL = f"""
+        transaction_class AS (
+            SELECT 
+                date,
+                transaction_id,
+                is_easy_repair_only
+            FROM {TRANSACTION_CLASS_TABLE}
+            WHERE {ROLLUP_SCAN_FILTER_SQL}
+        )"""
+
+
+def _summary_metrics_sql(class_sql, join_on_date):
+    return class_sql + f"""
+        SELECT 
+            CASE 
+                WHEN b.date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c) THEN 'Current' 
+                WHEN b.date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p) THEN 'Previous' 
+            END as type,
+            COUNT(DISTINCT user_pseudo_id) as users,
+            COUNT(DISTINCT CASE WHEN s_num = 1 THEN user_pseudo_id END) as new_users,
+            COUNT(DISTINCT CONCAT(user_pseudo_id, CAST(sid AS STRING))) as sessions,
+            COUNTIF(event_name = 'sign_up') as signups,
+            COUNT(DISTINCT CASE WHEN event_name = 'purchase' THEN b.transaction_id END) as orders,
+            SUM(IFNULL(purchase_revenue, 0)) as revenue,
+            COUNT(DISTINCT CASE WHEN event_name = 'purchase' AND purchase_revenue >= {BULK_REVENUE_THRESHOLD} THEN b.transaction_id END) as bulk_orders,
+            SUM(CASE WHEN event_name = 'purchase' AND purchase_revenue >= {BULK_REVENUE_THRESHOLD} THEN purchase_revenue ELSE 0 END) as bulk_revenue,
+            COUNT(DISTINCT CASE WHEN event_name = 'purchase' AND NOT IFNULL(c.is_easy_repair_only, FALSE) THEN b.transaction_id END) as filtered_orders,
+            SUM(CASE WHEN event_name = 'purchase' AND b.transaction_id IS NOT NULL AND NOT IFNULL(c.is_easy_repair_only, FALSE) THEN purchase_revenue ELSE 0 END) as filtered_revenue
+        FROM base b
+        LEFT JOIN transaction_class c
+        ON b.event_name = 'purchase' AND b.transaction_id = c.transaction_id{" AND b.date = c.date" if join_on_date else ""}
+        GROUP BY 1 
+        HAVING type IS NOT NULL
+        """
+
+
+# 전체 모드: 요약 (Current/Previous)
+DASHBOARD_SUMMARY_BASE_SQL = f"""
+        WITH base AS (
+            SELECT 
+                PARSE_DATE('%Y%m%d', event_date) as date,
+                user_pseudo_id,
+                event_name,
+                ecommerce.purchase_revenue,
+                ecommerce.transaction_id,
+                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
+                items
+            FROM {EVENTS_TABLE}
+            WHERE {SCAN_FILTER_SQL}
+        ),"""
+
+DASHBOARD_SUMMARY_SQL = DASHBOARD_SUMMARY_BASE_SQL + _summary_metrics_sql(INLINE_TRANSACTION_CLASS_SQL, False)
+DASHBOARD_SUMMARY_CLASSIFIED_SQL = DASHBOARD_SUMMARY_BASE_SQL + _summary_metrics_sql(TABLE_TRANSACTION_CLASS_SQL, True)
+
+# 매장/온라인 모드 (세션 기준 필터링)
+# 세션 귀속(첫 유입 소스)을 QUALIFY 윈도 함수로 같은 스캔 안에서 판정 -> events_* 를 한 번만 읽고 self-join 없음
+# 첫 유입 소스가 @store_sources에 있으면 매장 세션 - @data_source가 '매장 단독'이면 매장 세션만, 그 외(온라인 단독)는 나머지 세션만
+# (ga_session_id가 없는 이벤트는 세션에 귀속되지 않으므로 제외)
+def _by_source_base_sql(scan_filter):
+    return f"""
+        WITH base AS (
+            SELECT 
+                PARSE_DATE('%Y%m%d', event_date) as date,
+                user_pseudo_id,
+                event_name,
+                ecommerce.purchase_revenue,
+                ecommerce.transaction_id,
+                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+                (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
+                items
+            FROM {EVENTS_TABLE}
+            WHERE {scan_filter}
+            AND (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) IS NOT NULL
+            QUALIFY (FIRST_VALUE(LOWER(COALESCE(
+                (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
+                traffic_source.source,
+                '(direct)'
+            ))) OVER (
+                PARTITION BY user_pseudo_id, (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1)
+                ORDER BY event_timestamp
+            ) IN UNNEST(@store_sources)) = (@data_source = '매장 단독')
+        )"""
+
+
+DASHBOARD_BY_SOURCE_SUMMARY_SQL = (
+    _by_source_base_sql(SCAN_FILTER_SQL) + "," + _summary_metrics_sql(INLINE_TRANSACTION_CLASS_SQL, False)
+)
+DASHBOARD_BY_SOURCE_SUMMARY_CLASSIFIED_SQL = (
+    _by_source_base_sql(SCAN_FILTER_SQL) + "," + _summary_metrics_sql(TABLE_TRANSACTION_CLASS_SQL, True)
+)
+
+
+def build_dashboard_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독", classified=False):
+    # 요약 (Current/Previous) - 추이는 일별 추이(build_timeseries_query) + timeseries_store에서 따로 관리
+    # classified: 두 기간이 모두 transaction_class에 현재 규칙 버전으로 분류되어 있으면 분류 테이블 사용
+    params = period_params(start_c, end_c, start_p, end_p)
+    suffix = '_classified' if classified else ''
+    if data_source == "전체":
+        return {'summary': bind('dashboard_summary' + suffix, **params)}
+    return {'summary': bind('dashboard_summary_by_source' + suffix, **params, data_source=data_source, store_sources=STORE_SOURCES)}
+
+
+# -------------------------------------------------
+# 일별 추이 (timeseries_store가 없는 일자/확정되지 않은 일자만 조회)
+# 결과: date, sessions, continued_sessions, revenue, orders - 주별/월별은 timeseries_store.rebucket()
+# continued_sessions: 그날 세션 중 전날에도 이벤트가 있는 세션 수 (자정을 넘긴 세션)
+# -> 여러 날을 묶을 때 Σsessions - Σcontinued_sessions(전날이 같은 구간인 일자) = 구간 내 고유 세션 수
+# 전날 이벤트까지 봐야 하므로 스캔은 @scan_start(시작일 전날)부터, 결과는 @start_c부터
+# -------------------------------------------------
+DAILY_METRICS_SQL = """
+    session_days AS (
+        SELECT 
+            date,
+            session_key,
+            LAG(date) OVER (PARTITION BY session_key ORDER BY date) as prev_date
+        FROM (SELECT DISTINCT date, session_key FROM events WHERE session_key IS NOT NULL)
+    ),
+    session_metrics AS (
+        SELECT 
+            date,
+            COUNT(*) as sessions,
+            COUNTIF(prev_date = DATE_SUB(date, INTERVAL 1 DAY)) as continued_sessions
+        FROM session_days
+        GROUP BY date
+    ),
+    event_metrics AS (
+        SELECT 
+            date,
+            SUM(IFNULL(purchase_revenue, 0)) as revenue,
+            COUNT(DISTINCT CASE WHEN event_name = 'purchase' THEN transaction_id END) as orders
+        FROM events
+        WHERE date >= PARSE_DATE('%Y%m%d', @start_c)
+        GROUP BY date
+    )
+    SELECT 
+        e.date,
+        IFNULL(s.sessions, 0) as sessions,
+        IFNULL(s.continued_sessions, 0) as continued_sessions,
+        e.revenue,
+        e.orders
+    FROM event_metrics e
+    LEFT JOIN session_metrics s ON e.date = s.date
+    """
+
+TIMESERIES_DAILY_SQL = f"""
+    WITH events AS (
+        SELECT 
+            PARSE_DATE('%Y%m%d', event_date) as date,
+            CONCAT(user_pseudo_id, CAST((SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) AS STRING)) as session_key,
+            event_name,
+            ecommerce.purchase_revenue,
+            ecommerce.transaction_id
+        FROM {EVENTS_TABLE}
+        WHERE _TABLE_SUFFIX BETWEEN @scan_start AND @end_c
+    ),""" + DAILY_METRICS_SQL
+
+TIMESERIES_DAILY_BY_SOURCE_SQL = _by_source_base_sql("_TABLE_SUFFIX BETWEEN @scan_start AND @end_c") + """,
+        events AS (
+            SELECT 
+                date,
+                CONCAT(user_pseudo_id, CAST(sid AS STRING)) as session_key,
+                event_name,
+                purchase_revenue,
+                transaction_id
+            FROM base
+        ),""" + DAILY_METRICS_SQL
+
+
+def timeseries_params(start, end):
+    return {**period_params(start, end), 'scan_start': (start - timedelta(days=1)).strftime('%Y%m%d')}
+
+
+def build_timeseries_query(start, end, data_source="온라인 단독"):
+    params = timeseries_params(start, end)
+    if data_source == "전체":
+        return bind('timeseries_daily', **params)
+    return bind('timeseries_daily_by_source', **params, data_source=data_source, store_sources=STORE_SOURCES)
+
+
+# -------------------------------------------------
+# 인사이트 (제품/채널/지역/디바이스/인구통계) + 대량 구매 상세
+# -------------------------------------------------
+# 제품별 집계부 (base CTE 뒤에 붙임 - base: date, user_pseudo_id, event_name, purchase_revenue, sid, items)
+PRODUCT_METRICS_SQL = """
+    product_items AS (
+        SELECT 
+            b.date,
+            b.user_pseudo_id,
+            b.sid,
+            b.event_name,
+            item.item_id,
+            item.item_name,
+            item.price,
+            item.quantity
+        FROM base b, UNNEST(items) as item
+    ),
+    latest_product_names AS (
+        SELECT 
+            item_id as match_key,
+            ARRAY_AGG(item_name ORDER BY date DESC LIMIT 1)[OFFSET(0)] as product_name
+        FROM product_items
+        GROUP BY match_key
+    ),
+    product_metrics AS (
+        SELECT 
+            item_id as match_key,
+            SUM(CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c)
+                AND event_name = 'purchase'
+                THEN COALESCE(price, 0) * COALESCE(quantity, 0)
+                ELSE 0
+            END) as curr_rev,
+            SUM(CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p)
+                AND event_name = 'purchase'
+                THEN COALESCE(price, 0) * COALESCE(quantity, 0)
+                ELSE 0
+            END) as prev_rev,
+            COUNT(DISTINCT CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c)
+                THEN CONCAT(user_pseudo_id, CAST(sid AS STRING))
+            END) as curr_sess,
+            COUNT(DISTINCT CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p)
+                THEN CONCAT(user_pseudo_id, CAST(sid AS STRING))
+            END) as prev_sess,
+            SUM(CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c)
+                AND event_name = 'purchase'
+                THEN COALESCE(quantity, 0)
+                ELSE 0
+            END) as curr_qty,
+            SUM(CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p)
+                AND event_name = 'purchase'
+                THEN COALESCE(quantity, 0)
+                ELSE 0
+            END) as prev_qty
+        FROM product_items
+        GROUP BY match_key
+    )
+    SELECT 
+        n.product_name as product_name,
+        m.curr_rev as current_revenue,
+        m.prev_rev as previous_revenue,
+        m.curr_rev - m.prev_rev as revenue_change,
+        ROUND(SAFE_DIVIDE((m.curr_rev - m.prev_rev) * 100, NULLIF(m.prev_rev, 0)), 1) as revenue_change_pct,
+        m.curr_sess as current_sessions,
+        m.prev_sess as previous_sessions,
+        m.curr_qty as current_quantity,
+        m.prev_qty as previous_quantity
+    FROM product_metrics m
+    JOIN latest_product_names n ON m.match_key = n.match_key
+    WHERE m.curr_rev > 0 OR m.prev_rev > 0
+    ORDER BY m.curr_rev DESC
+    LIMIT 20
+    """
+
+PRODUCT_SQL = f"""
+    WITH base AS (
+        SELECT 
+            PARSE_DATE('%Y%m%d', event_date) as date,
+            user_pseudo_id,
+            event_name,
+            ecommerce.purchase_revenue,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+            items
+        FROM {EVENTS_TABLE}
+        WHERE {SCAN_FILTER_SQL}
+    ),
+""" + PRODUCT_METRICS_SQL
+
+# 채널/지역/디바이스/인구통계 비교를 한 번의 스캔으로 (GROUPING SETS)
+# 이벤트마다 분석/비교 기간 여부와 네 가지 차원 값을 붙인 뒤 차원별로 집계 -> (dimension, dimension_value, ...) 행
+# dashboard_data.split_breakdown이 차원별 DataFrame(channel_combined/demo/device/demographics_combined)으로 나눔
+# - 채널: 세션의 첫 source/medium, 매출/세션이 있는 채널만, 매출 변화 상위 10개
+# - 지역/디바이스: 구매 이벤트가 있는 값만 (지역은 상위 10개, 디바이스는 전체)
+# - 인구통계: 이벤트 단위 라벨, 상위 10개
+# 차원별 집계부 (base_events CTE 뒤에 붙임 - base_events: in_current, in_previous, user_pseudo_id, session_id, event_name,
+# purchase_revenue, event_timestamp, raw_source, raw_medium, location, device, gender_raw, age_raw)
+BREAKDOWN_METRICS_SQL = """
+    tagged AS (
+        SELECT 
+            in_current,
+            in_previous,
+            event_name,
+            purchase_revenue,
+            CONCAT(user_pseudo_id, '-', CAST(session_id AS STRING)) as unique_session,
+            CONCAT(
+                COALESCE(
+                    FIRST_VALUE(raw_source IGNORE NULLS) OVER (
+                        PARTITION BY user_pseudo_id, session_id 
+                        ORDER BY event_timestamp 
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    ),
+                    '(direct)'
+                ),
+                ' / ',
+                COALESCE(
+                    FIRST_VALUE(raw_medium IGNORE NULLS) OVER (
+                        PARTITION BY user_pseudo_id, session_id 
+                        ORDER BY event_timestamp 
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+                    ),
+                    '(none)'
+                )
+            ) as channel,
+            location,
+            device,
+            CONCAT(
+                CASE 
+                    WHEN gender_raw IN ('male', 'm', 'male_ko', '1') THEN 'Male'
+                    WHEN gender_raw IN ('female', 'f', 'female_ko', '2') THEN 'Female'
+                    ELSE 'Unknown'
+                END,
+                ' / ',
+                COALESCE(NULLIF(age_raw, ''), 'Unknown')
+            ) as demographic
+        FROM base_events
+    ),
+    grouped AS (
+        SELECT 
+            CASE 
+                WHEN GROUPING(channel) = 0 THEN 'channel'
+                WHEN GROUPING(location) = 0 THEN 'demo'
+                WHEN GROUPING(device) = 0 THEN 'device'
+                ELSE 'demographics'
+            END as dimension,
+            CASE 
+                WHEN GROUPING(channel) = 0 THEN channel
+                WHEN GROUPING(location) = 0 THEN location
+                WHEN GROUPING(device) = 0 THEN device
+                ELSE demographic
+            END as dimension_value,
+            SUM(CASE WHEN in_current AND event_name = 'purchase' THEN IFNULL(purchase_revenue, 0) ELSE 0 END) as current_revenue,
+            SUM(CASE WHEN in_previous AND event_name = 'purchase' THEN IFNULL(purchase_revenue, 0) ELSE 0 END) as previous_revenue,
+            COUNT(DISTINCT CASE WHEN in_current THEN unique_session END) as current_sessions,
+            COUNT(DISTINCT CASE WHEN in_previous THEN unique_session END) as previous_sessions,
+            COUNTIF(event_name = 'purchase') as purchase_events
+        FROM tagged
+        GROUP BY GROUPING SETS ((channel), (location), (device), (demographic))
+    ),
+    ranked AS (
+        SELECT 
+            *,
+            ROW_NUMBER() OVER (PARTITION BY dimension ORDER BY ABS(current_revenue - previous_revenue) DESC) as dimension_rank
+        FROM grouped
+        WHERE CASE dimension
+            WHEN 'channel' THEN current_revenue > 0 OR previous_revenue > 0 OR current_sessions > 0 OR previous_sessions > 0
+            WHEN 'demographics' THEN TRUE
+            ELSE purchase_events > 0
+        END
+    )
+    SELECT 
+        dimension,
+        dimension_value,
+        current_revenue,
+        previous_revenue,
+        current_revenue - previous_revenue as revenue_change,
+        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
+        current_sessions,
+        previous_sessions,
+        current_sessions - previous_sessions as sessions_change,
+        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
+    FROM ranked
+    WHERE dimension = 'device' OR dimension_rank <= 10
+    ORDER BY dimension, dimension_rank
+    """
+
+BREAKDOWN_SQL = f"""
+    WITH base_events AS (
+        SELECT 
+            _TABLE_SUFFIX BETWEEN @start_c AND @end_c as in_current,
+            _TABLE_SUFFIX BETWEEN @start_p AND @end_p as in_previous,
+            user_pseudo_id,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as session_id,
+            event_name,
+            ecommerce.purchase_revenue,
+            event_timestamp,
+            LOWER(NULLIF(TRIM(COALESCE(traffic_source.source, '')), '')) as raw_source,
+            LOWER(NULLIF(TRIM(COALESCE(traffic_source.medium, '')), '')) as raw_medium,
+            CONCAT(IFNULL(geo.country, 'Unknown'), ' / ', IFNULL(geo.city, 'Unknown')) as location,
+            device.category as device,
+            COALESCE(
+                LOWER((SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
+                LOWER((SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
+                ''
+            ) as gender_raw,
+            COALESCE(
+                (SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
+                (SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
+                'Unknown'
+            ) as age_raw
+        FROM {EVENTS_TABLE}
+        WHERE {SCAN_FILTER_SQL}
+    ),
+""" + BREAKDOWN_METRICS_SQL
+
+# 대량 구매 기준(@bulk_threshold)은 사이드바에서 바꿀 수 있음 - 요약 쿼리의 bulk_orders/bulk_revenue는 기본 기준
+# (BULK_REVENUE_THRESHOLD)으로 계산하고, 다른 기준이면 대량 구매 요약(build_bulk_summary_queries)만 따로 조회
+BULK_DETAIL_SQL = f"""
+    SELECT 
+        item.item_name as product_name,
+        COUNT(DISTINCT ecommerce.transaction_id) as order_count,
+        SUM(item.quantity) as total_quantity,
+        SUM(item.price * item.quantity) as item_revenue
+    FROM {EVENTS_TABLE},
+    UNNEST(items) as item
+    WHERE _TABLE_SUFFIX BETWEEN @start_c AND @end_c
+    AND event_name = 'purchase'
+    AND ecommerce.purchase_revenue >= @bulk_threshold
+    GROUP BY item.item_name
+    ORDER BY item_revenue DESC
+    LIMIT 20
+    """
+
+# 대량 구매 요약 (Current/Previous) - 요약 쿼리의 bulk_orders/bulk_revenue와 같은 정의
+BULK_SUMMARY_METRICS_SQL = """
+    SELECT 
+        CASE 
+            WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c) THEN 'Current' 
+            WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p) THEN 'Previous' 
+        END as type,
+        COUNT(DISTINCT CASE WHEN purchase_revenue >= @bulk_threshold THEN transaction_id END) as bulk_orders,
+        SUM(CASE WHEN purchase_revenue >= @bulk_threshold THEN purchase_revenue ELSE 0 END) as bulk_revenue,
+        SUM(purchase_revenue) as bulk_total_revenue
+    FROM base
+    WHERE event_name = 'purchase'
+    GROUP BY 1
+    HAVING type IS NOT NULL
+    """
+
+# 전체 모드는 구매 이벤트만 읽음 (원본 사본에서는 event_name 클러스터링으로 구매 블록만)
+BULK_SUMMARY_SQL = f"""
+    WITH base AS (
+        SELECT 
+            PARSE_DATE('%Y%m%d', event_date) as date,
+            event_name,
+            ecommerce.purchase_revenue,
+            ecommerce.transaction_id
+        FROM {EVENTS_TABLE}
+        WHERE {SCAN_FILTER_SQL}
+        AND event_name = 'purchase'
+    )""" + BULK_SUMMARY_METRICS_SQL
+
+# 매장/온라인 모드는 세션 귀속 때문에 요약 쿼리와 같은 스캔
+BULK_SUMMARY_BY_SOURCE_SQL = _by_source_base_sql(SCAN_FILTER_SQL) + BULK_SUMMARY_METRICS_SQL
+
+
+def build_insight_queries(start_c, end_c, start_p, end_p):
+    params = period_params(start_c, end_c, start_p, end_p)
+    return {
+        'product': bind('product', **params),
+        'breakdown': bind('breakdown', **params),
+    }
+
+
+def build_bulk_detail_query(start_c, end_c, bulk_threshold=BULK_REVENUE_THRESHOLD):
+    return bind('bulk_detail', **period_params(start_c, end_c), bulk_threshold=bulk_threshold)
+
+
+def build_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독", bulk_threshold=BULK_REVENUE_THRESHOLD):
+    params = {**period_params(start_c, end_c, start_p, end_p), 'bulk_threshold': bulk_threshold}
+    if data_source == "전체":
+        return {'bulk_summary': bind('bulk_summary', **params)}
+    return {'bulk_summary': bind('bulk_summary_by_source', **params, data_source=data_source, store_sources=STORE_SOURCES)}
+
+
+# -------------------------------------------------
+# 스크립트 모드 (SIDIZ_SCRIPT_MODE) - 한 번의 BigQuery 스크립트로 한 화면 전체를 조회
+# 세션 귀속(세션 ID, 첫 유입 소스, 매장/온라인)을 TEMP 테이블(session_events)로 한 번만 만들고
+# 요약/일별 추이/제품/채널·지역·디바이스·인구통계/대량 구매 상세를 모두 그 테이블에서 조회
+# -> 인사이트/대량 구매 상세도 데이터 소스 필터를 따름 (원본 스캔 + 세션 귀속은 한 번)
+# 결과는 SELECT 문 순서대로 SCRIPT_SECTIONS (query_runner.run_script)
+# session_events는 일별 추이의 전날(@scan_start)부터 읽음 -> 분석 기간 첫날 자정을 넘긴 세션도 실제 첫 이벤트 기준으로 귀속
+# -------------------------------------------------
+SCRIPT_SECTIONS = ['summary', 'timeseries', 'product', 'breakdown', 'bulk_detail']
+
+SCRIPT_SESSION_EVENTS_SQL = f"""
+    CREATE TEMP TABLE session_events AS
+    SELECT * EXCEPT (event_source)
+    FROM (
+        SELECT 
+            _TABLE_SUFFIX as suffix,
+            PARSE_DATE('%Y%m%d', event_date) as date,
+            user_pseudo_id,
+            event_name,
+            event_timestamp,
+            ecommerce.purchase_revenue,
+            ecommerce.transaction_id,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
+            items,
+            LOWER(COALESCE(
+                (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
+                traffic_source.source,
+                '(direct)'
+            )) as event_source,
+            LOWER(NULLIF(TRIM(COALESCE(traffic_source.source, '')), '')) as raw_source,
+            LOWER(NULLIF(TRIM(COALESCE(traffic_source.medium, '')), '')) as raw_medium,
+            CONCAT(IFNULL(geo.country, 'Unknown'), ' / ', IFNULL(geo.city, 'Unknown')) as location,
+            device.category as device,
+            COALESCE(
+                LOWER((SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
+                LOWER((SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_gender', 'gender', 'sex', 'user_gender') LIMIT 1)),
+                ''
+            ) as gender_raw,
+            COALESCE(
+                (SELECT value.string_value FROM UNNEST(event_params) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
+                (SELECT value.string_value FROM UNNEST(user_properties) WHERE key IN ('u_age', 'age', 'age_group', 'user_age') LIMIT 1),
+                'Unknown'
+            ) as age_raw
+        FROM {EVENTS_TABLE}
+        WHERE _TABLE_SUFFIX BETWEEN @scan_start AND @end_c OR _TABLE_SUFFIX BETWEEN @start_p AND @end_p
+    )
+    WHERE @data_source = '전체' OR sid IS NOT NULL
+    QUALIFY @data_source = '전체' OR (FIRST_VALUE(event_source) OVER (
+        PARTITION BY user_pseudo_id, sid
+        ORDER BY event_timestamp
+    ) IN UNNEST(@store_sources)) = (@data_source = '매장 단독')"""
+
+SCRIPT_PERIOD_FILTER_SQL = "(suffix BETWEEN @start_c AND @end_c OR suffix BETWEEN @start_p AND @end_p)"
+
+SCRIPT_SUMMARY_BASE_SQL = f"""
+    WITH base AS (
+        SELECT date, user_pseudo_id, event_name, purchase_revenue, transaction_id, sid, s_num, items
+        FROM session_events
+        WHERE {SCRIPT_PERIOD_FILTER_SQL}
+    ),"""
+
+SCRIPT_TIMESERIES_SQL = """
+    WITH events AS (
+        SELECT 
+            date,
+            CONCAT(user_pseudo_id, CAST(sid AS STRING)) as session_key,
+            event_name,
+            purchase_revenue,
+            transaction_id
+        FROM session_events
+        WHERE suffix BETWEEN @scan_start AND @end_c
+    ),""" + DAILY_METRICS_SQL
+
+SCRIPT_PRODUCT_SQL = f"""
+    WITH base AS (
+        SELECT date, user_pseudo_id, event_name, purchase_revenue, sid, items
+        FROM session_events
+        WHERE {SCRIPT_PERIOD_FILTER_SQL}
+    ),
+""" + PRODUCT_METRICS_SQL
+
+SCRIPT_BREAKDOWN_SQL = f"""
+    WITH base_events AS (
+        SELECT 
+            suffix BETWEEN @start_c AND @end_c as in_current,
+            suffix BETWEEN @start_p AND @end_p as in_previous,
+            user_pseudo_id,
+            sid as session_id,
+            event_name,
+            purchase_revenue,
+            event_timestamp,
+            raw_source,
+            raw_medium,
+            location,
+            device,
+            gender_raw,
+            age_raw
+        FROM session_events
+        WHERE {SCRIPT_PERIOD_FILTER_SQL}
+    ),
+""" + BREAKDOWN_METRICS_SQL
+
+SCRIPT_BULK_DETAIL_SQL = f"""
+    SELECT 
+        item.item_name as product_name,
+        COUNT(DISTINCT transaction_id) as order_count,
+        SUM(item.quantity) as total_quantity,
+        SUM(item.price * item.quantity) as item_revenue
+    FROM session_events,
+    UNNEST(items) as item
+    WHERE suffix BETWEEN @start_c AND @end_c
+    AND event_name = 'purchase'
+    AND purchase_revenue >= {BULK_REVENUE_THRESHOLD}
+    GROUP BY item.item_name
+    ORDER BY item_revenue DESC
+    LIMIT 20
+    """
+
+
+def _script_sql(class_sql, join_on_date):
+    statements = [
+        SCRIPT_SESSION_EVENTS_SQL,
+        SCRIPT_SUMMARY_BASE_SQL + _summary_metrics_sql(class_sql, join_on_date),
+        SCRIPT_TIMESERIES_SQL,
+        SCRIPT_PRODUCT_SQL,
+        SCRIPT_BREAKDOWN_SQL,
+        SCRIPT_BULK_DETAIL_SQL,
+    ]
+    return ";\n".join(statement.rstrip() for statement in statements) + ";\n"
+
+
+DASHBOARD_SCRIPT_SQL = _script_sql(INLINE_TRANSACTION_CLASS_SQL, False)
+DASHBOARD_SCRIPT_CLASSIFIED_SQL = _script_sql(TABLE_TRANSACTION_CLASS_SQL, True)
+
+
+def build_script_query(start_c, end_c, start_p, end_p, data_source="온라인 단독", classified=False):
+    # 일별 추이는 분석 기간 전체 (timeseries_store에 그대로 저장)
+    params = {**timeseries_params(start_c, end_c), **period_params(start_c, end_c, start_p, end_p)}
+    suffix = '_classified' if classified else ''
+    return bind('dashboard_script' + suffix, **params, data_source=data_source, store_sources=STORE_SOURCES)
+
+
+# -------------------------------------------------
+# 세션 일별 롤업 (session_daily) 쿼리
+# 원본 쿼리와 같은 컬럼/의미를 유지 - 제품별 분석은 품목 데이터가 없어 원본 쿼리 사용
+# -------------------------------------------------
+# 원본 쿼리와 동일하게 매장/온라인 모드에서는 ga_session_id가 없는 이벤트 제외 (@data_source가 '전체'면 필터 없음)
+ROLLUP_SESSION_FILTER_SQL = "AND (@data_source = '전체' OR (sid IS NOT NULL AND is_store = (@data_source = '매장 단독')))"
+
+ROLLUP_DASHBOARD_SUMMARY_SQL = f"""
+    WITH sessions AS (
+        SELECT 
+            CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c) THEN 'Current' 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p) THEN 'Previous' 
+            END as type,
+            user_pseudo_id,
+            sid,
+            is_new_session,
+            signups,
+            revenue,
+            purchases
+        FROM {SESSION_ROLLUP_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        {ROLLUP_SESSION_FILTER_SQL}
+    ),
+    session_metrics AS (
+        SELECT 
+            type,
+            COUNT(DISTINCT user_pseudo_id) as users,
+            COUNT(DISTINCT CASE WHEN is_new_session THEN user_pseudo_id END) as new_users,
+            COUNT(DISTINCT CONCAT(user_pseudo_id, CAST(sid AS STRING))) as sessions,
+            SUM(signups) as signups,
+            SUM(revenue) as revenue
+        FROM sessions
+        GROUP BY type
+    ),
+    order_metrics AS (
+        SELECT 
+            type,
+            COUNT(DISTINCT p.transaction_id) as orders,
+            COUNT(DISTINCT CASE WHEN p.revenue >= {BULK_REVENUE_THRESHOLD} THEN p.transaction_id END) as bulk_orders,
+            SUM(CASE WHEN p.revenue >= {BULK_REVENUE_THRESHOLD} THEN p.revenue ELSE 0 END) as bulk_revenue,
+            COUNT(DISTINCT CASE WHEN NOT p.easy_repair_only THEN p.transaction_id END) as filtered_orders,
+            SUM(CASE WHEN NOT p.easy_repair_only AND p.transaction_id IS NOT NULL THEN p.revenue ELSE 0 END) as filtered_revenue
+        FROM sessions, UNNEST(purchases) as p
+        GROUP BY type
+    )
+    SELECT 
+        s.type,
+        s.users,
+        s.new_users,
+        s.sessions,
+        s.signups,
+        IFNULL(o.orders, 0) as orders,
+        s.revenue,
+        IFNULL(o.bulk_orders, 0) as bulk_orders,
+        IFNULL(o.bulk_revenue, 0) as bulk_revenue,
+        IFNULL(o.filtered_orders, 0) as filtered_orders,
+        IFNULL(o.filtered_revenue, 0) as filtered_revenue
+    FROM session_metrics s
+    LEFT JOIN order_metrics o ON s.type = o.type
+    """
+
+ROLLUP_TIMESERIES_DAILY_SQL = f"""
+    WITH sessions AS (
+        SELECT 
+            date,
+            CONCAT(user_pseudo_id, CAST(sid AS STRING)) as session_key,
+            revenue,
+            purchases
+        FROM {SESSION_ROLLUP_TABLE}
+        WHERE date BETWEEN PARSE_DATE('%Y%m%d', @scan_start) AND PARSE_DATE('%Y%m%d', @end_c)
+        {ROLLUP_SESSION_FILTER_SQL}
+    ),
+    session_days AS (
+        SELECT 
+            date,
+            session_key,
+            LAG(date) OVER (PARTITION BY session_key ORDER BY date) as prev_date
+        FROM (SELECT DISTINCT date, session_key FROM sessions WHERE session_key IS NOT NULL)
+    ),
+    session_metrics AS (
+        SELECT 
+            date,
+            COUNT(*) as sessions,
+            COUNTIF(prev_date = DATE_SUB(date, INTERVAL 1 DAY)) as continued_sessions
+        FROM session_days
+        WHERE date >= PARSE_DATE('%Y%m%d', @start_c)
+        GROUP BY date
+    ),
+    revenue_metrics AS (
+        SELECT 
+            date,
+            SUM(revenue) as revenue
+        FROM sessions
+        WHERE date >= PARSE_DATE('%Y%m%d', @start_c)
+        GROUP BY date
+    ),
+    order_metrics AS (
+        SELECT 
+            date,
+            COUNT(DISTINCT p.transaction_id) as orders
+        FROM sessions, UNNEST(purchases) as p
+        WHERE date >= PARSE_DATE('%Y%m%d', @start_c)
+        GROUP BY date
+    )
+    SELECT 
+        r.date,
+        IFNULL(s.sessions, 0) as sessions,
+        IFNULL(s.continued_sessions, 0) as continued_sessions,
+        r.revenue,
+        IFNULL(o.orders, 0) as orders
+    FROM revenue_metrics r
+    LEFT JOIN session_metrics s ON r.date = s.date
+    LEFT JOIN order_metrics o ON r.date = o.date
+    """
+
+ROLLUP_CHANNEL_COMBINED_SQL = f"""
+    WITH sessions AS (
+        SELECT 
+            date,
+            channel,
+            CONCAT(user_pseudo_id, '-', CAST(sid AS STRING)) as unique_session,
+            purchases
+        FROM {SESSION_ROLLUP_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+    ),
+    session_counts AS (
+        SELECT 
+            channel,
+            COUNT(DISTINCT CASE WHEN {IN_CURRENT_SQL} THEN unique_session END) as current_sessions,
+            COUNT(DISTINCT CASE WHEN {IN_PREVIOUS_SQL} THEN unique_session END) as previous_sessions
+        FROM sessions
+        GROUP BY 1
+    ),
+    channel_revenue AS (
+        SELECT 
+            channel,
+            SUM(CASE WHEN {IN_CURRENT_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as current_revenue,
+            SUM(CASE WHEN {IN_PREVIOUS_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as previous_revenue
+        FROM sessions, UNNEST(purchases) as p
+        GROUP BY 1
+    ),
+    aggregated AS (
+        SELECT 
+            s.channel,
+            IFNULL(r.current_revenue, 0) as current_revenue,
+            IFNULL(r.previous_revenue, 0) as previous_revenue,
+            s.current_sessions,
+            s.previous_sessions
+        FROM session_counts s
+        LEFT JOIN channel_revenue r ON s.channel = r.channel
+    )
+    SELECT 
+        channel,
+        IFNULL(current_revenue, 0) as current_revenue,
+        IFNULL(previous_revenue, 0) as previous_revenue,
+        IFNULL(current_revenue - previous_revenue, 0) as revenue_change,
+        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
+        IFNULL(current_sessions, 0) as current_sessions,
+        IFNULL(previous_sessions, 0) as previous_sessions,
+        IFNULL(current_sessions - previous_sessions, 0) as sessions_change,
+        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
+    FROM aggregated
+    WHERE current_revenue > 0 OR previous_revenue > 0 OR current_sessions > 0 OR previous_sessions > 0
+    ORDER BY ABS(IFNULL(current_revenue - previous_revenue, 0)) DESC
+    LIMIT 10
+    """
+
+ROLLUP_DEMO_SQL = f"""
+    WITH purchases AS (
+        SELECT 
+            date,
+            CONCAT(IFNULL(p.country, 'Unknown'), ' / ', IFNULL(p.city, 'Unknown')) as location,
+            p.revenue
+        FROM {SESSION_ROLLUP_TABLE}, UNNEST(purchases) as p
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+    ),
+    current_demo AS (
+        SELECT location, SUM(revenue) as revenue FROM purchases WHERE {IN_CURRENT_SQL} GROUP BY 1
+    ),
+    previous_demo AS (
+        SELECT location, SUM(revenue) as revenue FROM purchases WHERE {IN_PREVIOUS_SQL} GROUP BY 1
+    )
+    SELECT 
+        COALESCE(c.location, p.location), 
+        IFNULL(c.revenue, 0), 
+        IFNULL(p.revenue, 0), 
+        IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0), 
+        ROUND(SAFE_DIVIDE((IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) * 100, IFNULL(p.revenue, 0)), 1)
+    FROM current_demo c 
+    FULL OUTER JOIN previous_demo p ON c.location = p.location 
+    ORDER BY ABS(IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) DESC 
+    LIMIT 10
+    """
+
+ROLLUP_DEVICE_SQL = f"""
+    WITH purchases AS (
+        SELECT 
+            date,
+            p.device_category as device,
+            p.revenue
+        FROM {SESSION_ROLLUP_TABLE}, UNNEST(purchases) as p
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+    ),
+    current_device AS (
+        SELECT device, SUM(revenue) as revenue FROM purchases WHERE {IN_CURRENT_SQL} GROUP BY 1
+    ),
+    previous_device AS (
+        SELECT device, SUM(revenue) as revenue FROM purchases WHERE {IN_PREVIOUS_SQL} GROUP BY 1
+    )
+    SELECT 
+        COALESCE(c.device, p.device), 
+        IFNULL(c.revenue, 0), 
+        IFNULL(p.revenue, 0), 
+        IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0), 
+        ROUND(SAFE_DIVIDE((IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) * 100, IFNULL(p.revenue, 0)), 1)
+    FROM current_device c 
+    FULL OUTER JOIN previous_device p ON c.device = p.device 
+    ORDER BY ABS(IFNULL(c.revenue, 0) - IFNULL(p.revenue, 0)) DESC
+    """
+
+ROLLUP_DEMOGRAPHICS_COMBINED_SQL = f"""
+    WITH sessions AS (
+        SELECT 
+            date,
+            CONCAT(user_pseudo_id, '-', CAST(sid AS STRING)) as unique_session,
+            demographics,
+            purchases
+        FROM {SESSION_ROLLUP_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+    ),
+    session_counts AS (
+        SELECT 
+            demographic,
+            COUNT(DISTINCT CASE WHEN {IN_CURRENT_SQL} THEN unique_session END) as current_sessions,
+            COUNT(DISTINCT CASE WHEN {IN_PREVIOUS_SQL} THEN unique_session END) as previous_sessions
+        FROM sessions, UNNEST(demographics) as demographic
+        GROUP BY 1
+    ),
+    demographic_revenue AS (
+        SELECT 
+            p.demographic,
+            SUM(CASE WHEN {IN_CURRENT_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as current_revenue,
+            SUM(CASE WHEN {IN_PREVIOUS_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as previous_revenue
+        FROM sessions, UNNEST(purchases) as p
+        GROUP BY 1
+    ),
+    aggregated AS (
+        SELECT 
+            s.demographic,
+            IFNULL(r.current_revenue, 0) as current_revenue,
+            IFNULL(r.previous_revenue, 0) as previous_revenue,
+            s.current_sessions,
+            s.previous_sessions
+        FROM session_counts s
+        LEFT JOIN demographic_revenue r ON s.demographic = r.demographic
+    )
+    SELECT 
+        COALESCE(demographic, 'Unknown / Unknown') as demographic,
+        IFNULL(current_revenue, 0) as current_revenue,
+        IFNULL(previous_revenue, 0) as previous_revenue,
+        IFNULL(current_revenue - previous_revenue, 0) as revenue_change,
+        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
+        IFNULL(current_sessions, 0) as current_sessions,
+        IFNULL(previous_sessions, 0) as previous_sessions,
+        IFNULL(current_sessions - previous_sessions, 0) as sessions_change,
+        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
+    FROM aggregated
+    ORDER BY ABS(IFNULL(current_revenue - previous_revenue, 0)) DESC
+    LIMIT 10
+    """
+
+
+def build_rollup_dashboard_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독"):
+    return {'summary': bind('rollup_dashboard_summary', **period_params(start_c, end_c, start_p, end_p), data_source=data_source)}
+
+
+def build_rollup_timeseries_query(start, end, data_source="온라인 단독"):
+    return bind('rollup_timeseries_daily', **timeseries_params(start, end), data_source=data_source)
+
+
+def build_rollup_insight_queries(start_c, end_c, start_p, end_p):
+    params = period_params(start_c, end_c, start_p, end_p)
+    return {
+        'product': bind('product', **params),
+        'channel_combined': bind('rollup_channel_combined', **params),
+        'demo': bind('rollup_demo', **params),
+        'device': bind('rollup_device', **params),
+        'demographics_combined': bind('rollup_demographics_combined', **params)
+    }
+
+
+# -------------------------------------------------
+# 근사 고유 수 모드 (distinct_sketch_daily HLL++ 스케치 롤업)
+# 사용자/신규 사용자/세션 수는 일별 스케치를 HLL_COUNT.MERGE로 합쳐서 계산 -> COUNT(DISTINCT) 셔플 없이 임의 기간 비교
+# 매출/주문 등 합계 지표는 session_daily 롤업 쿼리와 동일 (정확한 값)
+# 스케치 행: (date, data_source, dimension, dimension_value) - dimension 'total'은 소스별, 'channel'/'demographic'은 '전체'만
+# -------------------------------------------------
+PERIOD_TYPE_SQL = """CASE 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_c) AND PARSE_DATE('%Y%m%d', @end_c) THEN 'Current' 
+                WHEN date BETWEEN PARSE_DATE('%Y%m%d', @start_p) AND PARSE_DATE('%Y%m%d', @end_p) THEN 'Previous' 
+            END"""
+
+SKETCH_DASHBOARD_SUMMARY_SQL = f"""
+    WITH sessions AS (
+        SELECT 
+            {PERIOD_TYPE_SQL} as type,
+            signups,
+            revenue,
+            purchases
+        FROM {SESSION_ROLLUP_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        {ROLLUP_SESSION_FILTER_SQL}
+    ),
+    distinct_metrics AS (
+        SELECT 
+            {PERIOD_TYPE_SQL} as type,
+            HLL_COUNT.MERGE(user_sketch) as users,
+            HLL_COUNT.MERGE(new_user_sketch) as new_users,
+            HLL_COUNT.MERGE(session_sketch) as sessions
+        FROM {SKETCH_ROLLUP_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        AND data_source = @data_source
+        AND dimension = 'total'
+        GROUP BY type
+    ),
+    session_metrics AS (
+        SELECT 
+            type,
+            SUM(signups) as signups,
+            SUM(revenue) as revenue
+        FROM sessions
+        GROUP BY type
+    ),
+    order_metrics AS (
+        SELECT 
+            type,
+            COUNT(DISTINCT p.transaction_id) as orders,
+            COUNT(DISTINCT CASE WHEN p.revenue >= {BULK_REVENUE_THRESHOLD} THEN p.transaction_id END) as bulk_orders,
+            SUM(CASE WHEN p.revenue >= {BULK_REVENUE_THRESHOLD} THEN p.revenue ELSE 0 END) as bulk_revenue,
+            COUNT(DISTINCT CASE WHEN NOT p.easy_repair_only THEN p.transaction_id END) as filtered_orders,
+            SUM(CASE WHEN NOT p.easy_repair_only AND p.transaction_id IS NOT NULL THEN p.revenue ELSE 0 END) as filtered_revenue
+        FROM sessions, UNNEST(purchases) as p
+        GROUP BY type
+    )
+    SELECT 
+        s.type,
+        IFNULL(d.users, 0) as users,
+        IFNULL(d.new_users, 0) as new_users,
+        IFNULL(d.sessions, 0) as sessions,
+        s.signups,
+        IFNULL(o.orders, 0) as orders,
+        s.revenue,
+        IFNULL(o.bulk_orders, 0) as bulk_orders,
+        IFNULL(o.bulk_revenue, 0) as bulk_revenue,
+        IFNULL(o.filtered_orders, 0) as filtered_orders,
+        IFNULL(o.filtered_revenue, 0) as filtered_revenue
+    FROM session_metrics s
+    LEFT JOIN distinct_metrics d ON s.type = d.type
+    LEFT JOIN order_metrics o ON s.type = o.type
+    """
+
+
+def _sketch_breakdown_sql(dimension, revenue_sql):
+    # 채널/인구통계별 세션 수(스케치 병합) + 매출(session_daily 구매 합계) - 결과 컬럼은 롤업 쿼리와 동일
+    return f"""
+    WITH session_counts AS (
+        SELECT 
+            dimension_value as {dimension},
+            HLL_COUNT.MERGE(CASE WHEN {IN_CURRENT_SQL} THEN session_sketch END) as current_sessions,
+            HLL_COUNT.MERGE(CASE WHEN {IN_PREVIOUS_SQL} THEN session_sketch END) as previous_sessions
+        FROM {SKETCH_ROLLUP_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        AND data_source = '전체'
+        AND dimension = '{dimension}'
+        GROUP BY 1
+    ),
+    {dimension}_revenue AS ({revenue_sql}
+    ),
+    aggregated AS (
+        SELECT 
+            s.{dimension},
+            IFNULL(r.current_revenue, 0) as current_revenue,
+            IFNULL(r.previous_revenue, 0) as previous_revenue,
+            s.current_sessions,
+            s.previous_sessions
+        FROM session_counts s
+        LEFT JOIN {dimension}_revenue r ON s.{dimension} = r.{dimension}
+    )"""
+
+
+SKETCH_CHANNEL_COMBINED_SQL = _sketch_breakdown_sql('channel', f"""
+        SELECT 
+            channel,
+            SUM(CASE WHEN {IN_CURRENT_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as current_revenue,
+            SUM(CASE WHEN {IN_PREVIOUS_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as previous_revenue
+        FROM {SESSION_ROLLUP_TABLE}, UNNEST(purchases) as p
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        GROUP BY 1""") + """
+    SELECT 
+        channel,
+        IFNULL(current_revenue, 0) as current_revenue,
+        IFNULL(previous_revenue, 0) as previous_revenue,
+        IFNULL(current_revenue - previous_revenue, 0) as revenue_change,
+        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
+        IFNULL(current_sessions, 0) as current_sessions,
+        IFNULL(previous_sessions, 0) as previous_sessions,
+        IFNULL(current_sessions - previous_sessions, 0) as sessions_change,
+        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
+    FROM aggregated
+    WHERE current_revenue > 0 OR previous_revenue > 0 OR current_sessions > 0 OR previous_sessions > 0
+    ORDER BY ABS(IFNULL(current_revenue - previous_revenue, 0)) DESC
+    LIMIT 10
+    """
+
+SKETCH_DEMOGRAPHICS_COMBINED_SQL = _sketch_breakdown_sql('demographic', f"""
+        SELECT 
+            p.demographic,
+            SUM(CASE WHEN {IN_CURRENT_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as current_revenue,
+            SUM(CASE WHEN {IN_PREVIOUS_SQL} THEN IFNULL(p.revenue, 0) ELSE 0 END) as previous_revenue
+        FROM {SESSION_ROLLUP_TABLE}, UNNEST(purchases) as p
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        GROUP BY 1""") + """
+    SELECT 
+        COALESCE(demographic, 'Unknown / Unknown') as demographic,
+        IFNULL(current_revenue, 0) as current_revenue,
+        IFNULL(previous_revenue, 0) as previous_revenue,
+        IFNULL(current_revenue - previous_revenue, 0) as revenue_change,
+        ROUND(SAFE_DIVIDE((current_revenue - previous_revenue) * 100, NULLIF(previous_revenue, 0)), 1) as revenue_change_pct,
+        IFNULL(current_sessions, 0) as current_sessions,
+        IFNULL(previous_sessions, 0) as previous_sessions,
+        IFNULL(current_sessions - previous_sessions, 0) as sessions_change,
+        ROUND(SAFE_DIVIDE((current_sessions - previous_sessions) * 100, NULLIF(previous_sessions, 0)), 1) as sessions_change_pct
+    FROM aggregated
+    ORDER BY ABS(IFNULL(current_revenue - previous_revenue, 0)) DESC
+    LIMIT 10
+    """
+
+
+def build_sketch_dashboard_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독"):
+    return {'summary': bind('sketch_dashboard_summary', **period_params(start_c, end_c, start_p, end_p), data_source=data_source)}
+
+
+def build_sketch_insight_queries(start_c, end_c, start_p, end_p):
+    # 세션 수를 쓰는 채널/인구통계만 스케치 - 나머지는 롤업 쿼리와 같음
+    params = period_params(start_c, end_c, start_p, end_p)
+    return {
+        **build_rollup_insight_queries(start_c, end_c, start_p, end_p),
+        'channel_combined': bind('sketch_channel_combined', **params),
+        'demographics_combined': bind('sketch_demographics_combined', **params),
+    }
+
+
+# -------------------------------------------------
+# 구매 품목 테이블 (purchase_items - rollups.py) 쿼리
+# (transaction_id, 품목) 당 1행, 중복 전송된 구매 이벤트는 transaction_id 기준으로 한 번만 적재
+# 주문 단위 값(purchase_revenue)은 주문의 첫 행(item_index 0, 품목이 없는 주문은 NULL)에서만 집계
+# 중복을 뺀 값이므로 원본 쿼리(중복 구매 이벤트의 매출도 합산)보다 매출이 작을 수 있음
+# -> 대량 구매 요약은 같은 기준의 전체 구매 매출(bulk_total_revenue)을 함께 돌려주고, 대량 매출 비중은 그 값으로 나눔
+# -------------------------------------------------
+PURCHASE_BULK_SUMMARY_SQL = f"""
+    WITH base AS (
+        SELECT 
+            date,
+            'purchase' as event_name,
+            purchase_revenue,
+            transaction_id
+        FROM {PURCHASE_ITEMS_TABLE}
+        WHERE {ROLLUP_SCAN_FILTER_SQL}
+        AND IFNULL(item_index, 0) = 0
+        {ROLLUP_SESSION_FILTER_SQL}
+    )""" + BULK_SUMMARY_METRICS_SQL
+
+PURCHASE_BULK_DETAIL_SQL = f"""
+    SELECT 
+        item_name as product_name,
+        COUNT(DISTINCT transaction_id) as order_count,
+        SUM(quantity) as total_quantity,
+        SUM(price * quantity) as item_revenue
+    FROM {PURCHASE_ITEMS_TABLE}
+    WHERE {IN_CURRENT_SQL}
+    AND item_index IS NOT NULL
+    AND purchase_revenue >= @bulk_threshold
+    GROUP BY item_name
+    ORDER BY item_revenue DESC
+    LIMIT 20
+    """
+
+
+def build_purchase_bulk_detail_query(start_c, end_c, bulk_threshold=BULK_REVENUE_THRESHOLD):
+    return bind('purchase_bulk_detail', **period_params(start_c, end_c), bulk_threshold=bulk_threshold)
+
+
+def build_purchase_bulk_summary_queries(start_c, end_c, start_p, end_p, data_source="온라인 단독",
+                                        bulk_threshold=BULK_REVENUE_THRESHOLD):
+    params = period_params(start_c, end_c, start_p, end_p)
+    return {'bulk_summary': bind('purchase_bulk_summary', **params, data_source=data_source, bulk_threshold=bulk_threshold)}
+
+
+# -------------------------------------------------
+# 템플릿 목록 (bind()의 template 이름)
+# -------------------------------------------------
+TEMPLATES = {
+    'dashboard_summary': DASHBOARD_SUMMARY_SQL,
+    'dashboard_summary_by_source': DASHBOARD_BY_SOURCE_SUMMARY_SQL,
+    'dashboard_summary_classified': DASHBOARD_SUMMARY_CLASSIFIED_SQL,
+    'dashboard_summary_by_source_classified': DASHBOARD_BY_SOURCE_SUMMARY_CLASSIFIED_SQL,
+    'timeseries_daily': TIMESERIES_DAILY_SQL,
+    'timeseries_daily_by_source': TIMESERIES_DAILY_BY_SOURCE_SQL,
+    'product': PRODUCT_SQL,
+    'breakdown': BREAKDOWN_SQL,
+    'bulk_detail': BULK_DETAIL_SQL,
+    'bulk_summary': BULK_SUMMARY_SQL,
+    'bulk_summary_by_source': BULK_SUMMARY_BY_SOURCE_SQL,
+    'rollup_dashboard_summary': ROLLUP_DASHBOARD_SUMMARY_SQL,
+    'rollup_timeseries_daily': ROLLUP_TIMESERIES_DAILY_SQL,
+    'rollup_channel_combined': ROLLUP_CHANNEL_COMBINED_SQL,
+    'rollup_demo': ROLLUP_DEMO_SQL,
+    'rollup_device': ROLLUP_DEVICE_SQL,
+    'rollup_demographics_combined': ROLLUP_DEMOGRAPHICS_COMBINED_SQL,
+    'sketch_dashboard_summary': SKETCH_DASHBOARD_SUMMARY_SQL,
+    'sketch_channel_combined': SKETCH_CHANNEL_COMBINED_SQL,
+    'sketch_demographics_combined': SKETCH_DEMOGRAPHICS_COMBINED_SQL,
+    'purchase_bulk_summary': PURCHASE_BULK_SUMMARY_SQL,
+    'purchase_bulk_detail': PURCHASE_BULK_DETAIL_SQL,
+    'dashboard_script': DASHBOARD_SCRIPT_SQL,
+    'dashboard_script_classified': DASHBOARD_SCRIPT_CLASSIFIED_SQL,
+}
+
+
+# -------------------------------------------------
+# 원본 사본 (events_mirror - rollups.py) 템플릿
+# events_* 를 읽는 템플릿마다 'mirror_' 템플릿을 만듦: 테이블만 바꾸고 샤드 필터는 파티션 필터로
+#   _TABLE_SUFFIX BETWEEN @a AND @b -> event_day BETWEEN PARSE_DATE('%Y%m%d', @a) AND PARSE_DATE('%Y%m%d', @b)
+#   그 외 _TABLE_SUFFIX (값으로 쓰는 곳) -> FORMAT_DATE('%Y%m%d', event_day)
+# event_name 클러스터링으로 구매 이벤트만 읽는 쿼리(대량 구매 상세)는 파티션 안에서도 구매 블록만 읽음
+# -------------------------------------------------
+def _mirror_sql(sql):
+    sql = sql.replace(EVENTS_TABLE, EVENTS_MIRROR_TABLE)
+    sql = re.sub(
+        r"_TABLE_SUFFIX BETWEEN (@\w+) AND (@\w+)",
+        lambda m: f"event_day BETWEEN PARSE_DATE('%Y%m%d', {m.group(1)}) AND PARSE_DATE('%Y%m%d', {m.group(2)})",
+        sql,
+    )
+    return sql.replace('_TABLE_SUFFIX', "FORMAT_DATE('%Y%m%d', event_day)")
+
+
+MIRROR_TEMPLATES = {name: f"mirror_{name}" for name, sql in TEMPLATES.items() if EVENTS_TABLE in sql}
+TEMPLATES.update({mirror: _mirror_sql(TEMPLATES[name]) for name, mirror in MIRROR_TEMPLATES.items()})
+
+
+def mirror_queries(queries):
+    # {이름: Query} 중 events_* 를 읽는 쿼리를 같은 파라미터의 events_mirror 쿼리로 (롤업/스케치 쿼리는 그대로)
+    return {
+        name: Query(MIRROR_TEMPLATES[query.template], TEMPLATES[MIRROR_TEMPLATES[query.template]], query.params)
+        if query.template in MIRROR_TEMPLATES else query
+        for name, query in queries.items()
+    }
@@ -0,0 +1,247 @@
+# SIDIZ Dashboard - BigQuery 쿼리 실행기 (동시 실행 + job 단위 계측)
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pandas as pd
+
+import config
+from queries import fingerprint
+from single_flight import shared
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return None
+    return (end - start).total_seconds()
+
+
+def job_stats(name, job, download_s=None, error=None):
+    # QueryJob 통계 (BigQuery가 채우는 값이 없으면 None - 로컬 엔진/실패한 job 등)
+    created = getattr(job, 'created', None)
+    started = getattr(job, 'started', None)
+    ended = getattr(job, 'ended', None)
+    return {
+        'name': name,
+        'job_id': getattr(job, 'job_id', None),
+        'bytes_processed': getattr(job, 'total_bytes_processed', None),
+        'bytes_billed': getattr(job, 'total_bytes_billed', None),
+        'slot_millis': getattr(job, 'slot_millis', None),
+        'cache_hit': getattr(job, 'cache_hit', None),
+        'queue_s': _seconds(created, started),
+        'exec_s': _seconds(started, ended),
+        'download_s': download_s,
+        'error': str(error) if error is not None else None,
+    }
+
+
+def _query_parameter(bigquery, name, type_, value):
+    if type_.startswith('ARRAY<'):
+        return bigquery.ArrayQueryParameter(name, type_[len('ARRAY<'):-1], list(value))
+    return bigquery.ScalarQueryParameter(name, type_, value)
+
+
+def job_config(params=(), **kwargs):
+    # 모든 job에 maximum_bytes_billed 상한 적용 - 초과 시 BigQuery가 과금 없이 job을 실패시킴
+    # params: queries.Query.params ((이름, 타입, 값), ...) -> QueryJobConfig.query_parameters
+    # (google-cloud-bigquery가 없는 로컬 엔진/벤치마크 환경에서는 같은 속성의 SimpleNamespace - 파라미터는 튜플 그대로)
+    if config.MAX_BYTES_BILLED > 0:
+        kwargs.setdefault('maximum_bytes_billed', config.MAX_BYTES_BILLED)
+    try:
+        from google.cloud import bigquery
+    except ImportError:
+        return SimpleNamespace(query_parameters=list(params), **kwargs)
+    if params:
+        kwargs['query_parameters'] = [_query_parameter(bigquery, *param) for param in params]
+    return bigquery.QueryJobConfig(**kwargs)
+
+
+def submit(client, query, **kwargs):
+    # query: queries.Query (고정 SQL + 파라미터) 또는 파라미터 없는 SQL 문자열
+    if isinstance(query, str):
+        return client.query(query, job_config=job_config(**kwargs))
+    return client.query(query.sql, job_config=job_config(query.params, **kwargs))
+
+
+def _dry_run_one(client, query):
+    try:
+        return submit(client, query, dry_run=True, use_query_cache=False).total_bytes_processed
+    except Exception:
+        return None
+
+
+def dry_run(client, queries, max_workers=None):
+    # 쿼리별 예상 처리 바이트 {이름: bytes} - dry run은 과금되지 않음, 실패한 쿼리는 None
+    if not queries:
+        return {}
+    workers = max_workers or min(len(queries), config.QUERY_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(_dry_run_one, client, query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def download(job):
+    # Arrow 경로: BigQuery Storage Read API (google-cloud-bigquery-storage 설치 시), 없으면 REST 결과를 Arrow로 변환
+    # pyarrow dtype(int64[pyarrow] 등)을 그대로 유지해서 NumPy 변환/복사를 생략
+    if not config.ARROW_DOWNLOAD or not hasattr(job, 'to_arrow'):
+        return job.to_dataframe()
+    table = job.to_arrow(create_bqstorage_client=config.USE_BQSTORAGE)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+
+def _fetch(job):
+    # job 완료 대기와 결과 다운로드를 나눠서 다운로드 시간만 따로 잰다
+    job.result()
+    start = time.perf_counter()
+    df = download(job)
+    return df, time.perf_counter() - start
+
+
+def run_queries(client, queries, max_workers=None, record=None, store=None, ttl=None, flight=None):
+    # queries: {이름: queries.Query 또는 SQL}
+    # 1) 모든 job을 먼저 제출 - client.query()는 job 생성 직후 반환되므로 BigQuery에서 동시에 실행됨
+    # 2) 완료 대기 + 결과 다운로드(download)는 스레드 풀에서 병렬로 수집
+    # record: list를 넘기면 쿼리마다 job_stats() 결과를 추가 (계측 패널용)
+    # store: result_store.LocalResultStore - 저장된 결과가 있는 쿼리는 실행하지 않고, 새로 받은 결과는 ttl(초)로 저장
+    # flight: single_flight.SingleFlight - 다른 호출에서 같은 쿼리가 실행 중이면 job을 만들지 않고 그 결과를 기다림
+    #         (합쳐진 결과는 호출자마다 copy-on-write 복사본)
+    # 반환: (results {이름: DataFrame}, errors {이름: Exception}) - 실패한 쿼리는 results에 없음
+    jobs, errors, results = {}, {}, {}
+    # 직접 실행하는 쿼리 {이름: (fingerprint, call)}, 다른 호출의 결과를 기다리는 쿼리 {이름: call}
+    leading, waiting = {}, {}
+    # 직접 실행하는 쿼리 중 flight.finish()까지 끝낸 이름 - 중간에 예외가 나면 나머지도 끝내서 기다리는 호출이 멈추지 않게 함
+    finished = set()
+    try:
+        for name, query in queries.items():
+            if store is not None and not isinstance(query, str):
+                hit, df = store.get(query)
+                if hit:
+                    results[name] = df
+                    continue
+            if flight is not None and not isinstance(query, str):
+                key = fingerprint(query)
+                leader, call = flight.join(key)
+                if not leader:
+                    waiting[name] = call
+                    continue
+                leading[name] = (key, call)
+            try:
+                jobs[name] = submit(client, query)
+            except Exception as e:
+                errors[name] = e
+                if name in leading:
+                    finished.add(name)
+                    flight.finish(*leading[name], error=e)
+                if record is not None:
+                    record.append(job_stats(name, None, error=e))
+
+        if jobs:
+            workers = max_workers or min(len(jobs), config.QUERY_MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {name: pool.submit(_fetch, job) for name, job in jobs.items()}
+                for name, future in futures.items():
+                    download_s, error, df = None, None, None
+                    try:
+                        df, download_s = future.result()
+                    except Exception as e:
+                        errors[name] = error = e
+                    else:
+                        results[name] = shared(df) if name in leading else df
+                        if store is not None and not isinstance(queries[name], str):
+                            try:
+                                store.put(queries[name], df, ttl)
+                            except Exception:
+                                # 저장 실패(디스크 부족 등)는 조회 결과에 영향 없음 - 다음 조회에서 다시 저장
+                                pass
+                    finally:
+                        if name in leading:
+                            finished.add(name)
+                            flight.finish(*leading[name], result=df, error=error)
+                    if record is not None:
+                        record.append(job_stats(name, jobs[name], download_s, error))
+    except BaseException as e:
+        # 결과 저장소 조회 오류/중단(KeyboardInterrupt) 등 - 기다리던 호출자는 같은 오류(또는 실행 중단 오류)를 받음
+        for name in leading.keys() - finished:
+            flight.finish(*leading[name], error=e if isinstance(e, Exception) else None)
+        raise
+
+    for name, call in waiting.items():
+        try:
+            results[name] = flight.wait(call)
+        except Exception as e:
+            errors[name] = e
+    return results, errors
+
+
+def _section_query(script, name):
+    # 스크립트 결과 하나를 result_store에 저장할 때의 키 (스크립트 fingerprint + 결과 이름)
+    return script._replace(template=f"{script.template}#{name}")
+
+
+def script_stored(store, script, names):
+    # 스크립트의 모든 결과가 결과 저장소에 있는지 (데이터는 읽지 않음)
+    return all(store.contains(_section_query(script, name)) for name in names)
+
+
+def _fetch_script(client, job, names):
+    # 스크립트 완료 대기 -> SELECT child job 결과를 스크립트 순서대로 names에 대응
+    job.result()
+    start = time.perf_counter()
+    children = sorted(reversed(list(client.list_jobs(parent_job=job))), key=lambda child: child.created)
+    selects = [child for child in children if child.statement_type == 'SELECT']
+    if len(selects) != len(names):
+        raise RuntimeError(f"스크립트 결과 수 불일치: {len(selects)}개 (예상 {len(names)}개)")
+    results = {name: download(child) for name, child in zip(names, selects)}
+    return results, time.perf_counter() - start
+
+
+def run_script(client, script, names, record=None, store=None, ttl=None, flight=None):
+    # 여러 SELECT 문을 가진 BigQuery 스크립트(queries.Query) 하나를 job 하나로 실행
+    # names: SELECT 문 순서대로의 결과 이름 (queries.SCRIPT_SECTIONS)
+    # store/flight: run_queries와 같음 - 결과 저장소에는 결과마다 따로 저장, 동일 스크립트 합치기는 스크립트 단위
+    # 반환: (results {이름: DataFrame}, errors {이름: Exception}) - 스크립트가 실패하면 모든 이름이 errors
+    if store is not None:
+        stored = {name: store.get(_section_query(script, name)) for name in names}
+        if all(hit for hit, _ in stored.values()):
+            return {name: df for name, (_, df) in stored.items()}, {}
+
+    call = None
+    if flight is not None:
+        key = fingerprint(script)
+        leader, call = flight.join(key)
+        if not leader:
+            try:
+                return flight.wait(call), {}
+            except Exception as e:
+                return {}, {name: e for name in names}
+
+    job, results, error, download_s = None, None, None, None
+    try:
+        job = submit(client, script)
+        results, download_s = _fetch_script(client, job, names)
+    except Exception as e:
+        error = e
+    finally:
+        if call is not None:
+            flight.finish(key, call, result=results, error=error)
+    if record is not None:
+        record.append(job_stats('script', job, download_s, error))
+    if error is not None:
+        return {}, {name: error for name in names}
+
+    if store is not None:
+        for name, df in results.items():
+            try:
+                store.put(_section_query(script, name), df, ttl)
+            except Exception:
+                pass
+    return (shared(results) if call is not None else results), {}
+
+
+def cli_client():
+    # Streamlit 밖(cron/CLI)에서 쓰는 클라이언트 - 서비스 계정 키 파일 또는 Application Default Credentials
+    from google.cloud import bigquery
+
+    if config.GCP_KEY_FILE:
+        return bigquery.Client.from_service_account_json(config.GCP_KEY_FILE, location=config.BQ_LOCATION)
+    return bigquery.Client(project=config.GCP_PROJECT, location=config.BQ_LOCATION)
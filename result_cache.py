@@ -0,0 +1,106 @@
+# SIDIZ Dashboard - 조회 결과 캐시 (TTL + LRU)
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import config
+from queries import queries_fingerprint
+
+
+def _normalize(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    return value
+
+
+def make_key(kind, data_source, ranges, group_by=None):
+    # ranges: [(start, end), ...] - date/datetime/문자열 모두 같은 키로 정규화
+    return (kind, data_source, _normalize(ranges), group_by)
+
+
+def query_key(kind, queries):
+    # {이름: queries.Query} -> (구분, 템플릿 + 파라미터 fingerprint) - 같은 쿼리 묶음이면 세션/화면 구분 없이 같은 키
+    return (kind, queries_fingerprint(queries))
+
+
+def ttl_for(ranges, today=None):
+    # 기간 중 하나라도 아직 확정되지 않은 일자(오늘~최근 N일)를 포함하면 짧은 TTL
+    today = today or datetime.now().date()
+    open_from = today - timedelta(days=config.CACHE_OPEN_DAYS)
+    last_day = max(_normalize(end) for _, end in ranges)
+    if last_day >= open_from.isoformat():
+        return config.CACHE_TTL_OPEN
+    return config.CACHE_TTL_CLOSED
+
+
+class ResultCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or config.CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def contains(self, key):
+        # 유효한 항목 존재 여부만 확인 (적중/미스 통계와 LRU 순서에 영향 없음)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, ttl, compute, should_cache=None):
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = compute()
+        # 실패(None)/부분 실패 결과는 캐시하지 않음 - 다음 rerun에서 다시 시도
+        if value is not None and (should_cache is None or should_cache(value)):
+            self.put(key, value, ttl)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total * 100) if total > 0 else 0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
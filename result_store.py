@@ -0,0 +1,209 @@
+# SIDIZ Dashboard - 쿼리 결과 디스크 저장소 (Parquet)
+# 프로세스 캐시(ResultCache/TimeseriesStore)는 재배포/재시작 시 사라지고 replica끼리 공유되지 않는다.
+# -> 쿼리 하나의 결과를 fingerprint(템플릿 SQL + 파라미터) 주소의 Parquet 파일로 저장해서 프로세스/재시작 간에 공유
+# (같은 디렉터리를 마운트한 모든 프로세스가 같은 파일을 읽음 - query_runner.run_queries의 store 인자)
+# - 쓰기: 같은 디렉터리의 임시 파일에 쓴 뒤 os.replace -> 읽는 쪽은 항상 완성된 파일만 봄
+# - 읽기: pyarrow memory map + pyarrow dtype DataFrame (query_runner.download와 같은 dtype)
+# - 만료 시각은 Parquet 메타데이터에 기록, 전체 크기가 상한을 넘으면 마지막 사용 시각(mtime)이 오래된 파일부터 제거 (LRU)
+# - 전체 크기/파일 수는 이 프로세스의 쓰기/삭제로 갱신하는 카운터 - 디렉터리는 상한을 넘었을 때와 RESCAN_SECONDS마다만 훑음
+#   (다른 프로세스의 쓰기는 다음 훑기에서 반영)
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import config
+from queries import fingerprint
+
+EXPIRES_KEY = b'sidiz.expires_at'
+# 쓰다가 중단된 임시 파일 정리 기준 (초)
+STALE_TMP_SECONDS = 60 * 60
+# 크기 카운터를 디렉터리 전체 훑기로 다시 맞추는 주기 (초)
+RESCAN_SECONDS = 60
+
+
+class LocalResultStore:
+    # 로컬(또는 마운트된) 파일시스템 백엔드
+    def __init__(self, root, max_bytes=None):
+        self.root = root
+        self.max_bytes = max_bytes if max_bytes is not None else config.RESULT_STORE_MAX_BYTES
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        # 크기 카운터 (None이면 아직 훑지 않음)
+        self._file_count = None
+        self._bytes = None
+        self._scanned_at = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, query):
+        key = fingerprint(query)
+        return os.path.join(self.root, key[:2], f"{key}.parquet")
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, query):
+        # 반환: (적중 여부, DataFrame) - 없거나 만료/손상된 파일은 미스 (만료/손상 파일은 삭제)
+        # (다른 프로세스가 쓴 파일이나 만료 시각 메타데이터가 깨진 파일도 손상으로 취급)
+        path = self.path(query)
+        try:
+            table = pq.read_table(path, memory_map=True)
+            expires_at = float((table.schema.metadata or {}).get(EXPIRES_KEY, 0))
+            df = None
+            if expires_at > time.time():
+                df = table.replace_schema_metadata(None).to_pandas(
+                    types_mapper=pd.ArrowDtype if config.ARROW_DOWNLOAD else None
+                )
+        except FileNotFoundError:
+            self._count('misses')
+            return False, None
+        except (OSError, ValueError, pa.ArrowException):
+            df = None
+        if df is None:
+            self._discard(path)
+            self._count('misses')
+            return False, None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return True, df
+
+    def contains(self, query):
+        # 데이터는 읽지 않고 Parquet 메타데이터의 만료 시각만 확인
+        try:
+            metadata = pq.read_metadata(self.path(query), memory_map=True).metadata or {}
+            return float(metadata.get(EXPIRES_KEY, 0)) > time.time()
+        except (OSError, ValueError, pa.ArrowException):
+            return False
+
+    def put(self, query, df, ttl):
+        path = self.path(query)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            EXPIRES_KEY: str(time.time() + ttl).encode(),
+        })
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp)
+            size = os.path.getsize(tmp)
+            replaced = _size(path)
+            os.replace(tmp, path)
+        except BaseException:
+            _remove(tmp)
+            raise
+        self._count('writes')
+        self._adjust(0 if replaced is not None else 1, size - (replaced or 0))
+        self.evict()
+
+    def _adjust(self, files, size):
+        with self._lock:
+            if self._bytes is not None:
+                self._file_count += files
+                self._bytes += size
+
+    def _discard(self, path):
+        size = _size(path)
+        if size is not None and _remove(path):
+            self._adjust(-1, -size)
+
+    def _files(self):
+        # [(mtime, size, path), ...] - 오래된 임시 파일은 여기서 정리
+        files = []
+        now = time.time()
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    if now - stat.st_mtime > STALE_TMP_SECONDS:
+                        _remove(path)
+                    continue
+                if name.endswith('.parquet'):
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _scan(self):
+        # 디렉터리 전체를 훑어서 크기 카운터를 실제 값으로 맞춤
+        files = self._files()
+        with self._lock:
+            self._file_count = len(files)
+            self._bytes = sum(size for _, size, _ in files)
+            self._scanned_at = time.monotonic()
+        return files
+
+    def _usage(self):
+        # (파일 수, 바이트) - 카운터가 없거나 오래됐으면 다시 훑음
+        if self._bytes is None or time.monotonic() - self._scanned_at > RESCAN_SECONDS:
+            self._scan()
+        with self._lock:
+            return self._file_count, self._bytes
+
+    def evict(self):
+        # 크기 상한 초과분을 마지막 사용 시각이 오래된 순으로 제거 (카운터가 상한 이하면 디렉터리를 훑지 않음)
+        if self.max_bytes <= 0 or self._usage()[1] <= self.max_bytes:
+            return
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if _remove(path):
+                self._adjust(-1, -size)
+                self._count('evictions')
+            total -= size
+
+    def clear(self):
+        for _, _, path in self._files():
+            _remove(path)
+        self._scan()
+
+    def stats(self):
+        file_count, total = self._usage()
+        with self._lock:
+            return {
+                'files': file_count,
+                'bytes': total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'evictions': self.evictions,
+            }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        return False
+    return True
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def open_store():
+    # config.RESULT_STORE_DIR가 비어 있으면 사용하지 않음 (None)
+    if not config.RESULT_STORE_DIR:
+        return None
+    return LocalResultStore(config.RESULT_STORE_DIR)
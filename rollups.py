@@ -0,0 +1,660 @@
+# SIDIZ Dashboard - GA4 원본에서 파생한 집계 테이블의 일 단위 증분 refresh
+#
+#   python rollups.py refresh                     # 새로 적재되었거나 재export된 일자만 refresh
+#   python rollups.py refresh --from 20250101 --to 20250131 --force
+#   python rollups.py status
+#   python rollups.py backfill --table transaction_class   # 분류 규칙 버전을 올린 뒤 이전 버전으로 분류된 일자 재분류
+#
+# 각 일자는 하나의 트랜잭션(DELETE 파티션 + INSERT + 로그 기록)으로 처리되므로 몇 번을 다시 실행해도 결과가 같다.
+# _refresh_log 에 원본 샤드의 last_modified 를 기록해 두고, GA4가 샤드를 다시 export하면 해당 일자를 다시 적재한다.
+# 다른 집계 테이블에서 만드는 테이블(depends_on - 스케치)은 원본 샤드 대신 그 테이블의 refreshed_at을 기록해서,
+# 기준 테이블이 아직 없는 일자는 건너뛰고 기준 테이블이 다시 적재된 일자는 다시 만든다.
+# 세션 속성(시작 소스/채널)은 자정을 넘긴 세션 때문에 전날/다음 날 샤드도 읽는다. 다음 날 샤드가 없던 상태로
+# 적재된 일자는 다음 날 샤드가 들어온 뒤 한 번 더 적재된다 (lookahead_complete).
+# 규칙 버전이 있는 테이블(transaction_class)은 버전별로 적재 기록을 남긴다 ('transaction_class@v1').
+# 규칙 버전을 올려도 refresh는 새 일자만 새 규칙으로 분류하고, 이전 버전으로 분류된 일자는 backfill로만 다시 분류한다.
+import argparse
+from datetime import datetime, timedelta
+
+import config
+from queries import (
+    DEMOGRAPHIC_SQL,
+    EASY_REPAIR_ITEM_SQL,
+    EVENTS_MIRROR_TABLE,
+    EVENTS_TABLE,
+    PURCHASE_ITEMS_TABLE,
+    SESSION_ROLLUP_TABLE,
+    SKETCH_ROLLUP_TABLE,
+    STORE_SOURCES,
+    TRANSACTION_CLASS_TABLE,
+    TRANSACTION_RULES_VERSION,
+)
+from query_runner import cli_client, job_config
+
+DATASET = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}`"
+REFRESH_LOG_TABLE = f"`{config.GCP_PROJECT}.{config.DASHBOARD_DATASET}._refresh_log`"
+SOURCE_TABLES = f"`{config.GCP_PROJECT}.{config.ANALYTICS_DATASET}.__TABLES__`"
+
+
+# -------------------------------------------------
+# 원본 사본: GA4 일별 샤드를 그대로 옮긴 event_day 파티션 테이블 (대시보드 쿼리가 쓰는 컬럼만)
+# 와일드카드 샤드는 클러스터링이 없어서 구매 이벤트만 필요한 쿼리도 샤드 전체를 읽는다.
+# -> event_name, user_pseudo_id로 클러스터링해서 구매 쿼리는 구매 블록만, 세션 쿼리는 사용자 단위로 모인 블록을 읽음
+# 일자 하나가 샤드 하나에만 의존하므로 다음 날 샤드를 기다리지 않음 (lookahead 없음)
+# -------------------------------------------------
+EVENTS_MIRROR_COLUMNS = """event_date, event_timestamp, event_name, event_params, user_pseudo_id, user_properties,
+        traffic_source, device, geo, ecommerce, items"""
+
+EVENTS_MIRROR_DDL = f"""
+CREATE TABLE IF NOT EXISTS {EVENTS_MIRROR_TABLE}
+PARTITION BY event_day
+CLUSTER BY event_name, user_pseudo_id
+OPTIONS (
+    description = 'SIDIZ 대시보드 GA4 원본 사본 (rollups.py refresh로 관리)',
+    require_partition_filter = TRUE
+)
+AS
+SELECT
+    PARSE_DATE('%Y%m%d', _TABLE_SUFFIX) as event_day,
+    {EVENTS_MIRROR_COLUMNS}
+FROM {EVENTS_TABLE}
+WHERE FALSE
+"""
+
+
+def events_mirror_insert_sql(suffix):
+    return f"""
+    INSERT INTO {EVENTS_MIRROR_TABLE} (
+        event_day, {EVENTS_MIRROR_COLUMNS}
+    )
+    SELECT
+        PARSE_DATE('%Y%m%d', '{suffix}') as event_day,
+        {EVENTS_MIRROR_COLUMNS}
+    FROM {EVENTS_TABLE}
+    WHERE _TABLE_SUFFIX = '{suffix}'
+    """
+
+
+# -------------------------------------------------
+# 세션 일별 롤업: (date, user_pseudo_id, sid) 당 1행
+# -------------------------------------------------
+SESSION_DAILY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {SESSION_ROLLUP_TABLE} (
+    date DATE NOT NULL,
+    user_pseudo_id STRING,
+    sid INT64,
+    is_new_session BOOL,
+    first_source STRING,
+    is_store BOOL,
+    channel STRING,
+    device_category STRING,
+    country STRING,
+    city STRING,
+    demographics ARRAY<STRING>,
+    event_count INT64,
+    signups INT64,
+    revenue FLOAT64,
+    purchases ARRAY<STRUCT<
+        transaction_id STRING,
+        revenue FLOAT64,
+        easy_repair_only BOOL,
+        country STRING,
+        city STRING,
+        device_category STRING,
+        demographic STRING
+    >>
+)
+PARTITION BY date
+CLUSTER BY is_store, user_pseudo_id
+OPTIONS (description = 'SIDIZ 대시보드 세션 일별 롤업 (rollups.py refresh로 관리)')
+"""
+
+
+def _shift(suffix, days):
+    return (datetime.strptime(suffix, '%Y%m%d') + timedelta(days=days)).strftime('%Y%m%d')
+
+
+def session_daily_insert_sql(suffix):
+    # 자정을 넘긴 세션도 원본 쿼리와 같은 시작 소스/채널을 갖도록 전날/다음 날 샤드까지 읽어서 세션 속성을 계산하고,
+    # 해당 일자 이벤트만 집계
+    prev_suffix = _shift(suffix, -1)
+    next_suffix = _shift(suffix, 1)
+    return f"""
+    INSERT INTO {SESSION_ROLLUP_TABLE} (
+        date, user_pseudo_id, sid, is_new_session, first_source, is_store, channel,
+        device_category, country, city, demographics, event_count, signups, revenue, purchases
+    )
+    WITH events AS (
+        SELECT
+            _TABLE_SUFFIX as suffix,
+            user_pseudo_id,
+            event_timestamp,
+            event_name,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_number' LIMIT 1) as s_num,
+            LOWER(COALESCE(
+                (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
+                traffic_source.source,
+                '(direct)'
+            )) as param_source,
+            LOWER(NULLIF(TRIM(COALESCE(traffic_source.source, '')), '')) as raw_source,
+            LOWER(NULLIF(TRIM(COALESCE(traffic_source.medium, '')), '')) as raw_medium,
+            device.category as device_category,
+            geo.country as country,
+            geo.city as city,
+            {DEMOGRAPHIC_SQL} as demographic,
+            ecommerce.purchase_revenue,
+            ecommerce.transaction_id,
+            items
+        FROM {EVENTS_TABLE}
+        WHERE _TABLE_SUFFIX BETWEEN '{prev_suffix}' AND '{next_suffix}'
+    ),
+    sessionized AS (
+        SELECT
+            *,
+            FIRST_VALUE(param_source) OVER (
+                PARTITION BY user_pseudo_id, sid
+                ORDER BY event_timestamp
+            ) as first_source,
+            CONCAT(
+                COALESCE(FIRST_VALUE(raw_source IGNORE NULLS) OVER session_window, '(direct)'),
+                ' / ',
+                COALESCE(FIRST_VALUE(raw_medium IGNORE NULLS) OVER session_window, '(none)')
+            ) as channel
+        FROM events
+        WINDOW session_window AS (
+            PARTITION BY user_pseudo_id, sid
+            ORDER BY event_timestamp
+            ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+        )
+    ),
+    day_events AS (
+        SELECT * FROM sessionized WHERE suffix = '{suffix}'
+    ),
+    easy_repair_only_orders AS (
+        SELECT
+            transaction_id,
+            LOGICAL_AND({EASY_REPAIR_ITEM_SQL}) as easy_repair_only
+        FROM day_events, UNNEST(items) as item
+        WHERE event_name = 'purchase'
+        GROUP BY transaction_id
+    )
+    SELECT
+        PARSE_DATE('%Y%m%d', '{suffix}') as date,
+        e.user_pseudo_id,
+        e.sid,
+        IFNULL(LOGICAL_OR(e.s_num = 1), FALSE) as is_new_session,
+        ANY_VALUE(e.first_source) as first_source,
+        ANY_VALUE(e.first_source) IN {STORE_SOURCES} as is_store,
+        ANY_VALUE(e.channel) as channel,
+        ARRAY_AGG(e.device_category IGNORE NULLS ORDER BY e.event_timestamp LIMIT 1)[SAFE_OFFSET(0)] as device_category,
+        ARRAY_AGG(e.country IGNORE NULLS ORDER BY e.event_timestamp LIMIT 1)[SAFE_OFFSET(0)] as country,
+        ARRAY_AGG(e.city IGNORE NULLS ORDER BY e.event_timestamp LIMIT 1)[SAFE_OFFSET(0)] as city,
+        ARRAY_AGG(DISTINCT e.demographic) as demographics,
+        COUNT(*) as event_count,
+        COUNTIF(e.event_name = 'sign_up') as signups,
+        SUM(IFNULL(e.purchase_revenue, 0)) as revenue,
+        ARRAY_AGG(
+            IF(e.event_name = 'purchase', STRUCT(
+                e.transaction_id,
+                e.purchase_revenue as revenue,
+                IFNULL(o.easy_repair_only, FALSE) as easy_repair_only,
+                e.country,
+                e.city,
+                e.device_category,
+                e.demographic
+            ), NULL) IGNORE NULLS
+            ORDER BY e.event_timestamp
+        ) as purchases
+    FROM day_events e
+    LEFT JOIN easy_repair_only_orders o
+    ON e.event_name = 'purchase' AND e.transaction_id = o.transaction_id
+    GROUP BY e.user_pseudo_id, e.sid
+    """
+
+
+# -------------------------------------------------
+# 고유 수 스케치 일별 롤업: (date, data_source, dimension, dimension_value) 당 1행
+# 같은 일자의 session_daily 행에서 만듦 -> ROLLUPS에서 session_daily 다음 순서로 refresh
+# 원본 샤드 대신 session_daily 적재 기록을 기준으로 refresh (depends_on) - session_daily가 아직 없는 일자는 건너뛰고,
+# session_daily가 다시 적재되면 (refreshed_at이 바뀌면) 스케치도 다시 만듦
+# data_source: '전체' + 세션 ID가 있으면 시작 소스에 따라 '매장 단독'/'온라인 단독' (롤업 쿼리의 @data_source 필터와 동일)
+# dimension: 'total'(dimension_value '') / 'channel' / 'demographic' - 채널/인구통계 분석은 데이터 소스와 무관해서 '전체'만
+# -------------------------------------------------
+SKETCH_DAILY_DDL = f"""
+CREATE TABLE IF NOT EXISTS {SKETCH_ROLLUP_TABLE} (
+    date DATE NOT NULL,
+    data_source STRING NOT NULL,
+    dimension STRING NOT NULL,
+    dimension_value STRING,
+    user_sketch BYTES,
+    new_user_sketch BYTES,
+    session_sketch BYTES
+)
+PARTITION BY date
+CLUSTER BY data_source, dimension
+OPTIONS (description = 'SIDIZ 대시보드 HLL++ 고유 수 스케치 일별 롤업 (rollups.py refresh로 관리)')
+"""
+
+
+def distinct_sketch_daily_insert_sql(suffix):
+    precision = config.HLL_PRECISION
+    return f"""
+    INSERT INTO {SKETCH_ROLLUP_TABLE} (
+        date, data_source, dimension, dimension_value, user_sketch, new_user_sketch, session_sketch
+    )
+    WITH sessions AS (
+        SELECT
+            s.user_pseudo_id,
+            s.is_new_session,
+            CONCAT(s.user_pseudo_id, CAST(s.sid AS STRING)) as session_key,
+            s.channel,
+            s.demographics,
+            data_source
+        FROM {SESSION_ROLLUP_TABLE} s,
+        UNNEST(ARRAY_CONCAT(['전체'], IF(s.sid IS NULL, [], [IF(s.is_store, '매장 단독', '온라인 단독')]))) as data_source
+        WHERE s.date = PARSE_DATE('%Y%m%d', '{suffix}')
+    ),
+    dimensions AS (
+        SELECT data_source, 'total' as dimension, '' as dimension_value, user_pseudo_id, is_new_session, session_key
+        FROM sessions
+        UNION ALL
+        SELECT data_source, 'channel', channel, user_pseudo_id, is_new_session, session_key
+        FROM sessions
+        WHERE data_source = '전체'
+        UNION ALL
+        SELECT data_source, 'demographic', demographic, user_pseudo_id, is_new_session, session_key
+        FROM sessions, UNNEST(demographics) as demographic
+        WHERE data_source = '전체'
+    )
+    SELECT
+        PARSE_DATE('%Y%m%d', '{suffix}') as date,
+        data_source,
+        dimension,
+        dimension_value,
+        HLL_COUNT.INIT(user_pseudo_id, {precision}) as user_sketch,
+        HLL_COUNT.INIT(IF(is_new_session, user_pseudo_id, NULL), {precision}) as new_user_sketch,
+        HLL_COUNT.INIT(session_key, {precision}) as session_sketch
+    FROM dimensions
+    GROUP BY data_source, dimension, dimension_value
+    """
+
+
+# -------------------------------------------------
+# 주문 분류: (date, transaction_id) 당 1행 - 요약 쿼리의 이지리페어 단독 주문 판정을 미리 계산
+# 규칙(EASY_REPAIR_ITEM_SQL)은 queries.TRANSACTION_RULES_VERSION으로 버전 관리
+# 대량 구매 여부는 사이드바 기준으로 쿼리에서 revenue와 비교 (기준을 테이블에 고정하지 않음)
+# -------------------------------------------------
+TRANSACTION_CLASS_DDL = f"""
+CREATE TABLE IF NOT EXISTS {TRANSACTION_CLASS_TABLE} (
+    date DATE NOT NULL,
+    transaction_id STRING NOT NULL,
+    rule_version INT64 NOT NULL,
+    is_easy_repair_only BOOL,
+    item_count INT64,
+    revenue FLOAT64,
+    classified_at TIMESTAMP
+)
+PARTITION BY date
+CLUSTER BY transaction_id
+OPTIONS (description = 'SIDIZ 대시보드 주문 분류 (rollups.py refresh/backfill로 관리)')
+"""
+
+
+def transaction_class_insert_sql(suffix):
+    return f"""
+    INSERT INTO {TRANSACTION_CLASS_TABLE} (
+        date, transaction_id, rule_version, is_easy_repair_only, item_count, revenue, classified_at
+    )
+    WITH purchases AS (
+        SELECT
+            ecommerce.transaction_id,
+            ecommerce.purchase_revenue,
+            items
+        FROM {EVENTS_TABLE}
+        WHERE _TABLE_SUFFIX = '{suffix}'
+        AND event_name = 'purchase'
+        AND ecommerce.transaction_id IS NOT NULL
+    ),
+    item_class AS (
+        SELECT
+            transaction_id,
+            LOGICAL_AND({EASY_REPAIR_ITEM_SQL}) as is_easy_repair_only,
+            SUM(IFNULL(item.quantity, 0)) as item_count
+        FROM purchases, UNNEST(items) as item
+        GROUP BY transaction_id
+    ),
+    revenue AS (
+        SELECT
+            transaction_id,
+            SUM(IFNULL(purchase_revenue, 0)) as revenue
+        FROM purchases
+        GROUP BY transaction_id
+    )
+    SELECT
+        PARSE_DATE('%Y%m%d', '{suffix}') as date,
+        r.transaction_id,
+        {TRANSACTION_RULES_VERSION} as rule_version,
+        IFNULL(i.is_easy_repair_only, FALSE) as is_easy_repair_only,
+        IFNULL(i.item_count, 0) as item_count,
+        r.revenue,
+        CURRENT_TIMESTAMP() as classified_at
+    FROM revenue r
+    LEFT JOIN item_class i ON r.transaction_id = i.transaction_id
+    """
+
+
+# -------------------------------------------------
+# 구매 품목: (date, transaction_id, item_index) 당 1행 - 대량 구매 요약/상세를 넓은 이벤트 행 대신 이 테이블에서
+# GA4가 같은 주문을 여러 번 보낸 경우 transaction_id별 첫 구매 이벤트만 적재 (전날 샤드까지 보고 전날에 이미 있는 주문은 제외)
+# is_store: 세션의 첫 유입 소스 기준 (전날 시작한 세션도 전날 샤드에서 판정) - 롤업 쿼리의 @data_source 필터와 동일
+# 품목이 없는 구매 이벤트도 주문 매출은 남도록 item_index NULL 행 하나로 적재
+# 전날 샤드만 필요하므로 다음 날 샤드를 기다리지 않음 (lookahead 없음)
+# -------------------------------------------------
+PURCHASE_ITEMS_DDL = f"""
+CREATE TABLE IF NOT EXISTS {PURCHASE_ITEMS_TABLE} (
+    date DATE NOT NULL,
+    transaction_id STRING,
+    purchase_revenue FLOAT64,
+    item_index INT64,
+    item_id STRING,
+    item_name STRING,
+    item_category STRING,
+    price FLOAT64,
+    quantity INT64,
+    country STRING,
+    city STRING,
+    device_category STRING,
+    user_pseudo_id STRING,
+    sid INT64,
+    is_store BOOL
+)
+PARTITION BY date
+CLUSTER BY transaction_id
+OPTIONS (description = 'SIDIZ 대시보드 구매 품목 (rollups.py refresh로 관리)')
+"""
+
+
+def purchase_items_insert_sql(suffix):
+    prev_suffix = _shift(suffix, -1)
+    return f"""
+    INSERT INTO {PURCHASE_ITEMS_TABLE} (
+        date, transaction_id, purchase_revenue, item_index, item_id, item_name, item_category, price, quantity,
+        country, city, device_category, user_pseudo_id, sid, is_store
+    )
+    WITH events AS (
+        SELECT
+            _TABLE_SUFFIX as suffix,
+            user_pseudo_id,
+            event_timestamp,
+            event_name,
+            (SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id' LIMIT 1) as sid,
+            LOWER(COALESCE(
+                (SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'source' LIMIT 1),
+                traffic_source.source,
+                '(direct)'
+            )) as param_source,
+            device.category as device_category,
+            geo.country as country,
+            geo.city as city,
+            ecommerce.purchase_revenue,
+            ecommerce.transaction_id,
+            items
+        FROM {EVENTS_TABLE}
+        WHERE _TABLE_SUFFIX BETWEEN '{prev_suffix}' AND '{suffix}'
+    ),
+    purchases AS (
+        SELECT
+            *,
+            FIRST_VALUE(param_source) OVER (
+                PARTITION BY user_pseudo_id, sid
+                ORDER BY event_timestamp
+            ) IN {STORE_SOURCES} as is_store
+        FROM events
+        QUALIFY event_name = 'purchase'
+        AND (transaction_id IS NULL OR ROW_NUMBER() OVER (
+            PARTITION BY event_name, transaction_id
+            ORDER BY event_timestamp
+        ) = 1)
+    )
+    SELECT
+        PARSE_DATE('%Y%m%d', '{suffix}') as date,
+        p.transaction_id,
+        p.purchase_revenue,
+        item_index,
+        item.item_id,
+        item.item_name,
+        item.item_category,
+        item.price,
+        item.quantity,
+        p.country,
+        p.city,
+        p.device_category,
+        p.user_pseudo_id,
+        p.sid,
+        p.is_store
+    FROM purchases p
+    LEFT JOIN UNNEST(p.items) as item WITH OFFSET as item_index
+    WHERE p.suffix = '{suffix}'
+    """
+
+
+ROLLUPS = {
+    'events_mirror': {
+        'table': EVENTS_MIRROR_TABLE,
+        'date_column': 'event_day',
+        'ddl': EVENTS_MIRROR_DDL,
+        'insert_sql': events_mirror_insert_sql,
+        'lookahead': False,
+    },
+    'session_daily': {
+        'table': SESSION_ROLLUP_TABLE,
+        'date_column': 'date',
+        'ddl': SESSION_DAILY_DDL,
+        'insert_sql': session_daily_insert_sql,
+    },
+    'distinct_sketch_daily': {
+        'table': SKETCH_ROLLUP_TABLE,
+        'date_column': 'date',
+        'ddl': SKETCH_DAILY_DDL,
+        'insert_sql': distinct_sketch_daily_insert_sql,
+        'depends_on': 'session_daily',
+    },
+    'purchase_items': {
+        'table': PURCHASE_ITEMS_TABLE,
+        'date_column': 'date',
+        'ddl': PURCHASE_ITEMS_DDL,
+        'insert_sql': purchase_items_insert_sql,
+        'lookahead': False,
+    },
+    'transaction_class': {
+        'table': TRANSACTION_CLASS_TABLE,
+        'date_column': 'date',
+        'ddl': TRANSACTION_CLASS_DDL,
+        'insert_sql': transaction_class_insert_sql,
+        'version': TRANSACTION_RULES_VERSION,
+    },
+}
+
+
+def log_name(name):
+    # _refresh_log.table_name - 규칙 버전이 있으면 '이름@v버전'
+    version = ROLLUPS[name].get('version')
+    return name if version is None else f"{name}@v{version}"
+
+
+# -------------------------------------------------
+# 증분 refresh
+# -------------------------------------------------
+def ensure_tables(client, names=None):
+    client.query(f"CREATE SCHEMA IF NOT EXISTS {DATASET} OPTIONS (location = '{config.BQ_LOCATION}')").result()
+    client.query(f"""
+    CREATE TABLE IF NOT EXISTS {REFRESH_LOG_TABLE} (
+        table_name STRING NOT NULL,
+        suffix STRING NOT NULL,
+        source_modified TIMESTAMP,
+        lookahead_complete BOOL,
+        refreshed_at TIMESTAMP
+    )
+    """).result()
+    for name in names or ROLLUPS:
+        client.query(ROLLUPS[name]['ddl']).result()
+
+
+def list_source_shards(client, start_suffix, end_suffix):
+    # {YYYYMMDD: 원본 샤드 last_modified} - 일별 export 샤드만 (intraday 제외)
+    rows = client.query(f"""
+    SELECT
+        SUBSTR(table_id, 8) as suffix,
+        TIMESTAMP_MILLIS(last_modified_time) as last_modified
+    FROM {SOURCE_TABLES}
+    WHERE REGEXP_CONTAINS(table_id, r'^events_[0-9]{{8}}$')
+    AND SUBSTR(table_id, 8) BETWEEN '{start_suffix}' AND '{end_suffix}'
+    """).result()
+    return {row.suffix: row.last_modified for row in rows}
+
+
+def refreshed_days(client, name):
+    rows = client.query(f"""
+    SELECT suffix, source_modified, lookahead_complete
+    FROM {REFRESH_LOG_TABLE}
+    WHERE table_name = '{log_name(name)}'
+    """).result()
+    return {row.suffix: (row.source_modified, row.lookahead_complete) for row in rows}
+
+
+def upstream_days(client, name):
+    # 다른 집계 테이블에서 만드는 테이블의 기준 - {YYYYMMDD: (그 테이블 refreshed_at, lookahead_complete)}
+    rows = client.query(f"""
+    SELECT suffix, refreshed_at, lookahead_complete
+    FROM {REFRESH_LOG_TABLE}
+    WHERE table_name = '{log_name(name)}'
+    """).result()
+    return {row.suffix: (row.refreshed_at, row.lookahead_complete) for row in rows}
+
+
+def source_days(client, name, start_suffix, end_suffix):
+    # {YYYYMMDD: (기준 시각, 다음 날까지 반영 여부)} - 원본 샤드 last_modified 또는 depends_on 테이블의 적재 기록
+    spec = ROLLUPS[name]
+    if spec.get('depends_on'):
+        upstream = upstream_days(client, spec['depends_on'])
+        return {suffix: upstream[suffix] for suffix in upstream if start_suffix <= suffix <= end_suffix}
+    shards = list_source_shards(client, start_suffix, _shift(end_suffix, 1))
+    lookahead = spec.get('lookahead', True)
+    return {
+        suffix: (modified, not lookahead or _shift(suffix, 1) in shards)
+        for suffix, modified in shards.items() if suffix <= end_suffix
+    }
+
+
+def outdated_days(client, name):
+    # 이전 규칙 버전으로 적재된 일자 (현재 버전으로는 아직 적재되지 않은 일자만) - backfill 대상
+    if ROLLUPS[name].get('version') is None:
+        return set()
+    rows = client.query(f"""
+    SELECT DISTINCT suffix
+    FROM {REFRESH_LOG_TABLE}
+    WHERE STARTS_WITH(table_name, '{name}@v')
+    AND table_name != '{log_name(name)}'
+    """).result()
+    return {row.suffix for row in rows} - set(refreshed_days(client, name))
+
+
+def pending_days(client, name, start_suffix, end_suffix, force=False, backfill=False):
+    # 1) 아직 적재되지 않은 일자 2) 원본 샤드가 다시 export된 일자 3) 다음 날 샤드 없이 적재됐는데 이제 들어온 일자
+    # 이전 규칙 버전으로 적재된 일자는 backfill=True일 때만
+    # lookahead가 없는 테이블(원본 사본)은 다음 날 샤드와 무관하게 항상 완료로 기록
+    # depends_on 테이블(스케치)은 원본 샤드 대신 기준 테이블의 적재 기록 (refreshed_at, lookahead_complete)으로 판단
+    sources = source_days(client, name, start_suffix, end_suffix)
+    in_range = sorted(sources)
+    if force:
+        return [(suffix, *sources[suffix]) for suffix in in_range]
+    done = refreshed_days(client, name)
+    outdated = set() if backfill else outdated_days(client, name)
+    pending = []
+    for suffix in in_range:
+        if suffix in outdated:
+            continue
+        modified, has_next = sources[suffix]
+        logged_modified, logged_lookahead = done.get(suffix, (None, None))
+        if (suffix not in done or logged_modified is None or logged_modified < modified
+                or (has_next and not logged_lookahead)):
+            pending.append((suffix, modified, has_next))
+    return pending
+
+
+def refresh_day(client, name, suffix, source_modified, lookahead_complete):
+    spec = ROLLUPS[name]
+    modified_sql = f"TIMESTAMP '{source_modified.isoformat()}'" if source_modified else "NULL"
+    script = f"""
+    BEGIN TRANSACTION;
+    DELETE FROM {spec['table']} WHERE {spec['date_column']} = PARSE_DATE('%Y%m%d', '{suffix}');
+    {spec['insert_sql'](suffix)};
+    DELETE FROM {REFRESH_LOG_TABLE} WHERE (table_name = '{name}' OR STARTS_WITH(table_name, '{name}@v')) AND suffix = '{suffix}';
+    INSERT INTO {REFRESH_LOG_TABLE} (table_name, suffix, source_modified, lookahead_complete, refreshed_at)
+    VALUES ('{log_name(name)}', '{suffix}', {modified_sql}, {'TRUE' if lookahead_complete else 'FALSE'}, CURRENT_TIMESTAMP());
+    COMMIT TRANSACTION;
+    """
+    client.query(script, job_config=job_config()).result()
+
+
+def refresh(client, names=None, start_suffix=None, end_suffix=None, force=False, backfill=False, log=print):
+    # 기본 범위: 최근 ROLLUP_BACKFILL_DAYS일 ~ 어제 (오늘 샤드는 아직 없음)
+    today = datetime.now().date()
+    start_suffix = start_suffix or (today - timedelta(days=config.ROLLUP_BACKFILL_DAYS)).strftime('%Y%m%d')
+    end_suffix = end_suffix or (today - timedelta(days=1)).strftime('%Y%m%d')
+    names = names or list(ROLLUPS)
+
+    ensure_tables(client, names)
+    refreshed = {}
+    for name in names:
+        days = pending_days(client, name, start_suffix, end_suffix, force, backfill)
+        log(f"[{name}] refresh 대상 {len(days)}일")
+        for suffix, modified, lookahead_complete in days:
+            refresh_day(client, name, suffix, modified, lookahead_complete)
+            log(f"[{name}] {suffix} 완료")
+        refreshed[name] = [suffix for suffix, _, _ in days]
+    return refreshed
+
+
+def rollup_coverage(client, name):
+    # 적재가 끝난 일자(YYYYMMDD) 목록 - 대시보드가 롤업을 읽어도 되는 기간인지 판단할 때 사용
+    return sorted(refreshed_days(client, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIDIZ 대시보드 집계 테이블 증분 refresh")
+    sub = parser.add_subparsers(dest='command', required=True)
+    refresh_parser = sub.add_parser('refresh', help="누락/재export된 일자 refresh")
+    refresh_parser.add_argument('--table', action='append', choices=list(ROLLUPS), help="대상 테이블 (기본: 전체)")
+    refresh_parser.add_argument('--from', dest='start', help="시작 일자 YYYYMMDD")
+    refresh_parser.add_argument('--to', dest='end', help="종료 일자 YYYYMMDD")
+    refresh_parser.add_argument('--force', action='store_true', help="이미 적재된 일자도 다시 적재")
+    backfill_parser = sub.add_parser('backfill', help="refresh + 이전 규칙 버전으로 적재된 일자 재적재")
+    backfill_parser.add_argument('--table', action='append', choices=[n for n in ROLLUPS if ROLLUPS[n].get('version') is not None],
+                                 required=True, help="대상 테이블 (규칙 버전이 있는 테이블)")
+    backfill_parser.add_argument('--from', dest='start', help="시작 일자 YYYYMMDD")
+    backfill_parser.add_argument('--to', dest='end', help="종료 일자 YYYYMMDD")
+    status_parser = sub.add_parser('status', help="테이블별 적재 현황")
+    status_parser.add_argument('--table', action='append', choices=list(ROLLUPS))
+    args = parser.parse_args()
+
+    client = cli_client()
+    if args.command == 'refresh':
+        refresh(client, args.table, args.start, args.end, args.force)
+    elif args.command == 'backfill':
+        refresh(client, args.table, args.start, args.end, backfill=True)
+    else:
+        for name in args.table or ROLLUPS:
+            days = rollup_coverage(client, name)
+            if days:
+                print(f"[{log_name(name)}] {len(days)}일 적재 ({days[0]} ~ {days[-1]})")
+            else:
+                print(f"[{log_name(name)}] 적재된 일자 없음")
+            outdated = outdated_days(client, name)
+            if outdated:
+                print(f"[{log_name(name)}] 이전 규칙 버전으로 적재된 일자 {len(outdated)}일 - backfill 필요")
+
+
+if __name__ == '__main__':
+    main()
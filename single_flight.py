@@ -0,0 +1,69 @@
+# SIDIZ Dashboard - 동일 쿼리 합치기 (single-flight)
+# 여러 세션이 같은 기간/조건으로 동시에 열면 세션마다 같은 BigQuery job을 만든다.
+# -> 같은 fingerprint(템플릿 SQL + 파라미터)의 쿼리가 이미 실행 중이면 새 job 없이 그 결과를 기다려서 함께 사용
+# 결과 DataFrame은 호출자마다 복사본으로 넘김 (pandas 3 이상은 copy-on-write 얕은 복사본, 그 이전 버전은 깊은 복사본)
+# -> postprocess_insight의 rename/fillna/컬럼명 변경 같은 in-place 수정이 다른 호출자의 결과에 번지지 않음
+# 전역 pandas 옵션(mode.copy_on_write)은 바꾸지 않음 - 이 모듈을 import해도 프로세스의 다른 코드 동작은 그대로
+import threading
+
+import pandas as pd
+
+# pandas 3부터는 항상 copy-on-write - 얕은 복사본도 한쪽의 수정이 다른 쪽에 보이지 않음
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def join(self, key):
+        # 반환: (직접 실행할지 여부, call) - False면 call.wait()로 실행 중인 결과를 기다림
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return False, call
+            call = self._calls[key] = _Call()
+            self.executed += 1
+            return True, call
+
+    def finish(self, key, call, result=None, error=None):
+        # 직접 실행한 쪽이 반드시 호출 (실패해도) - 기다리던 호출자를 깨우고 다음 호출부터는 새로 실행
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.result, call.error = result, error
+        call.done.set()
+
+    def wait(self, call):
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        if call.result is None:
+            raise RuntimeError("같은 쿼리의 실행이 중단되었습니다")
+        return shared(call.result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls),
+            }
+
+
+def shared(result):
+    # 함께 쓰는 결과(DataFrame 또는 {이름: DataFrame})의 호출자별 복사본 (copy-on-write면 데이터는 수정될 때만 복사됨)
+    if isinstance(result, dict):
+        return {name: df.copy(deep=not COPY_ON_WRITE) for name, df in result.items()}
+    return result.copy(deep=not COPY_ON_WRITE)
@@ -0,0 +1,7 @@
+# 저장소 루트 모듈(result_store, query_runner ...)과 bench/ 헬퍼(fixtures ...)를 import 경로에 추가
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, 'bench'))
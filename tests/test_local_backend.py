@@ -0,0 +1,136 @@
+# 로컬 백엔드 (SIDIZ_BACKEND=local) - bench/seed_local_data로 만든 합성 데이터를 로컬 Parquet로 sync하고
+# local_data.open_client()로 대시보드 쿼리를 실행
+# local_engine의 BigQuery -> DuckDB 재작성(ARRAY_AGG LIMIT, UNNEST WITH OFFSET, HLL_COUNT)이 바뀌어도
+# 원본 이벤트에서 직접 구한 값과 같은지 확인
+from datetime import date, timedelta
+
+import pytest
+
+from check_session_attribution import DAILY_FILTER_SQL, _frames_equal, legacy_query
+from dashboard_data import (
+    DATA_SOURCES,
+    bulk_summary_queries,
+    dashboard_queries,
+    insight_queries,
+    postprocess_insight,
+    timeseries_queries,
+)
+from local_data import EVENTS, SYNC_TABLES, open_client, sync
+from local_engine import LocalClient
+from queries import BULK_REVENUE_THRESHOLD, EVENTS_TABLE, SCAN_FILTER_SQL
+from query_runner import run_queries
+from rollups import ROLLUPS
+from seed_local_data import build_source
+
+FIRST = date(2026, 1, 1)
+LAST = FIRST + timedelta(days=13)
+# (현재 기간, 비교 기간) - 맞닿은 두 주
+PERIODS = (FIRST + timedelta(days=7), LAST, FIRST, FIRST + timedelta(days=6))
+ROLLUP_NAMES = [name for name in SYNC_TABLES if name in ROLLUPS]
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    root = str(tmp_path_factory.mktemp('local'))
+    source = build_source(FIRST, LAST, 300, 7, ROLLUP_NAMES)
+    sync(LocalClient(source), [EVENTS] + ROLLUP_NAMES, FIRST.strftime('%Y%m%d'), LAST.strftime('%Y%m%d'),
+         force=True, root=root, log=lambda message: None)
+    return open_client(root)
+
+
+def _run(client, queries):
+    results, errors = run_queries(client, queries)
+    assert not errors
+    return results
+
+
+def _records(df):
+    # 행 순서/정수·실수 dtype과 무관하게 비교
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    return sorted((tuple(round(v, 6) if isinstance(v, float) else v for v in row) for row in rows), key=repr)
+
+
+@pytest.mark.parametrize('data_source', ["매장 단독", "온라인 단독"])
+def test_summary_and_timeseries_match_legacy_join(client, data_source):
+    # check_session_attribution과 같은 기대값: 기존 self-join 쿼리 결과
+    summary = dashboard_queries(*PERIODS, data_source)['summary']
+    daily = timeseries_queries(PERIODS[0], PERIODS[1], data_source)['timeseries']
+    results = _run(client, {
+        'summary': summary,
+        'timeseries': daily,
+        'legacy_summary': summary._replace(sql=legacy_query(summary, SCAN_FILTER_SQL, data_source)),
+        'legacy_timeseries': daily._replace(sql=legacy_query(daily, DAILY_FILTER_SQL, data_source)),
+    })
+    assert len(results['summary']) == 2
+    assert _frames_equal(results['summary'], results['legacy_summary'], 'type')
+    assert _frames_equal(results['timeseries'], results['legacy_timeseries'], 'date')
+
+
+@pytest.mark.parametrize('data_source', DATA_SOURCES)
+def test_rollups_match_raw_events(client, data_source):
+    # 세션 롤업(ARRAY_AGG ... LIMIT 1 재작성으로 적재) 경로 == 원본 이벤트 경로
+    raw = _run(client, {**dashboard_queries(*PERIODS, data_source),
+                        **timeseries_queries(PERIODS[0], PERIODS[1], data_source)})
+    rollup = _run(client, {**dashboard_queries(*PERIODS, data_source, use_rollup=True),
+                           **timeseries_queries(PERIODS[0], PERIODS[1], data_source, use_rollup=True)})
+    assert _frames_equal(raw['summary'], rollup['summary'], 'type')
+    assert _frames_equal(raw['timeseries'], rollup['timeseries'], 'date')
+
+
+def test_array_agg_limit_keeps_order(client):
+    # 합성 데이터는 세션 안에서 디바이스/지역이 바뀌지 않으므로 정렬 방향/IGNORE NULLS는 따로 확인
+    first = client.engine.query("""
+        SELECT
+            ARRAY_AGG(x ORDER BY y LIMIT 1)[OFFSET(0)] as first_x,
+            ARRAY_AGG(x IGNORE NULLS ORDER BY y DESC LIMIT 1)[SAFE_OFFSET(0)] as last_x
+        FROM UNNEST([STRUCT('a' as x, 2 as y), STRUCT('b' as x, 1 as y), STRUCT(CAST(NULL AS STRING) as x, 3 as y)])
+    """)
+    assert (first['first_x'][0], first['last_x'][0]) == ('b', 'a')
+
+
+def test_rollup_insights_match_raw_events(client):
+    raw = postprocess_insight(_run(client, insight_queries(*PERIODS)))
+    rollup = postprocess_insight(_run(client, insight_queries(*PERIODS, use_rollup=True)))
+    assert set(raw) == set(rollup)
+    for name in rollup:
+        assert not rollup[name].empty
+        assert _records(raw[name]) == _records(rollup[name]), name
+
+
+def test_sketch_insights_match_rollup(client):
+    # 스케치 테이블은 sync 대상이 아니므로 로컬 엔진에서 세션 롤업으로 만듦 (HLL_COUNT -> 정확한 고유값 목록)
+    sketch = ROLLUPS['distinct_sketch_daily']
+    client.engine.query(sketch['ddl'])
+    day = FIRST
+    while day <= LAST:
+        client.engine.query(sketch['insert_sql'](day.strftime('%Y%m%d')))
+        day += timedelta(days=1)
+    rollup = _run(client, insight_queries(*PERIODS, use_rollup=True))
+    sketches = _run(client, insight_queries(*PERIODS, use_sketches=True))
+    assert set(sketches) == set(rollup)
+    for name in rollup:
+        assert _records(sketches[name]) == _records(rollup[name]), name
+
+
+def test_purchase_items_count_each_order_once(client):
+    # 구매 품목 테이블(UNNEST WITH OFFSET 재작성으로 item_index 0부터 적재) -> 주문별 첫 구매 이벤트 매출
+    item_index = client.engine.query("SELECT MIN(item_index) as first, MAX(item_index) as last FROM purchase_items")
+    assert item_index['first'][0] == 0
+    expected = client.engine.query(f"""
+        SELECT
+            COUNT(DISTINCT CASE WHEN revenue >= {BULK_REVENUE_THRESHOLD} THEN transaction_id END) as bulk_orders,
+            SUM(CASE WHEN revenue >= {BULK_REVENUE_THRESHOLD} THEN revenue ELSE 0 END) as bulk_revenue,
+            SUM(revenue) as bulk_total_revenue
+        FROM (
+            SELECT
+                ecommerce.transaction_id,
+                ARRAY_AGG(ecommerce.purchase_revenue ORDER BY event_timestamp LIMIT 1)[OFFSET(0)] as revenue
+            FROM {EVENTS_TABLE}
+            WHERE event_name = 'purchase'
+            GROUP BY 1
+        )
+    """)
+    bulk = _run(client, bulk_summary_queries(FIRST, LAST, FIRST, LAST, "전체", purchase_items=True))['bulk_summary']
+    assert bulk['type'].tolist() == ['Current']
+    for column in ('bulk_orders', 'bulk_revenue', 'bulk_total_revenue'):
+        assert float(bulk[column][0]) == float(expected[column][0]), column
@@ -0,0 +1,62 @@
+# result_cache.ResultCache - TTL / LRU
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_hit_until_ttl_expires(clock):
+    cache = ResultCache(max_entries=4)
+    cache.put('a', 1, ttl=10)
+    clock[0] += 9
+    assert cache.get('a') == (True, 1)
+    clock[0] += 1
+    assert cache.get('a') == (False, None)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+    assert stats['entries'] == 0
+
+
+def test_contains_does_not_count(clock):
+    cache = ResultCache(max_entries=4)
+    cache.put('a', 1, ttl=10)
+    assert cache.contains('a')
+    assert not cache.contains('b')
+    clock[0] += 10
+    assert not cache.contains('a')
+    assert cache.stats()['hits'] == cache.stats()['misses'] == 0
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache = ResultCache(max_entries=2)
+    cache.put('a', 1, ttl=60)
+    cache.put('b', 2, ttl=60)
+    assert cache.get('a')[0]
+    cache.put('c', 3, ttl=60)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_get_or_compute_skips_failed_results(clock):
+    cache = ResultCache(max_entries=4)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None if len(calls) == 1 else 'ok'
+
+    assert cache.get_or_compute('a', 60, compute) is None
+    assert cache.get_or_compute('a', 60, compute) == 'ok'
+    assert cache.get_or_compute('a', 60, compute) == 'ok'
+    assert len(calls) == 2
+    assert cache.get_or_compute('b', 60, lambda: 'partial', should_cache=lambda value: False) == 'partial'
+    assert not cache.contains('b')
@@ -0,0 +1,151 @@
+# result_store.LocalResultStore - 오프라인 (임시 디렉터리)
+import os
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import config
+import result_store
+from queries import Query
+from result_store import LocalResultStore
+
+
+def _query(n):
+    sql = f"SELECT {n} as n"
+    return Query(sql, sql, (('n', 'INT64', n),))
+
+
+def _frame(rows=3):
+    return pd.DataFrame({
+        'date': [date(2026, 1, 1 + i) for i in range(rows)],
+        'type': ['Current'] * rows,
+        'orders': list(range(rows)),
+        'revenue': [1000.5 * i for i in range(rows)],
+    })
+
+
+def _parquet_files(root):
+    return sorted(os.path.join(d, name) for d, _, names in os.walk(root) for name in names)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'ARROW_DOWNLOAD', True)
+    return LocalResultStore(str(tmp_path), max_bytes=0)
+
+
+def test_round_trip_arrow_dtype(store):
+    df = _frame()
+    store.put(_query(1), df, ttl=60)
+    hit, loaded = store.get(_query(1))
+    assert hit
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in loaded.dtypes)
+    assert loaded['orders'].tolist() == df['orders'].tolist()
+    assert loaded['revenue'].tolist() == df['revenue'].tolist()
+    assert loaded['date'].tolist() == df['date'].tolist()
+    assert store.contains(_query(1))
+    assert store.stats()['hits'] == 1
+
+
+def test_miss_for_other_params(store):
+    store.put(_query(1), _frame(), ttl=60)
+    assert store.get(_query(2)) == (False, None)
+    assert not store.contains(_query(2))
+    assert store.stats()['misses'] == 1
+
+
+def test_expired_entry_is_miss_and_removed(store):
+    store.put(_query(1), _frame(), ttl=-1)
+    assert not store.contains(_query(1))
+    assert store.get(_query(1)) == (False, None)
+    assert not os.path.exists(store.path(_query(1)))
+    assert store.stats()['files'] == 0
+
+
+def test_corrupt_file_is_miss_and_removed(store):
+    store.put(_query(1), _frame(), ttl=60)
+    with open(store.path(_query(1)), 'wb') as f:
+        f.write(b'not parquet')
+    assert store.get(_query(1)) == (False, None)
+    assert not os.path.exists(store.path(_query(1)))
+    assert store.stats()['misses'] == 1
+
+
+def test_put_replaces_atomically(store, monkeypatch):
+    store.put(_query(1), _frame(2), ttl=60)
+    store.put(_query(1), _frame(3), ttl=60)
+    assert len(store.get(_query(1))[1]) == 3
+    assert _parquet_files(store.root) == [store.path(_query(1))]
+
+    # 쓰다가 실패하면 기존 파일은 그대로, 임시 파일은 남지 않음
+    def fail(table, where):
+        with open(where, 'wb') as f:
+            f.write(b'partial')
+        raise OSError("disk full")
+    monkeypatch.setattr(result_store.pq, 'write_table', fail)
+    with pytest.raises(OSError):
+        store.put(_query(1), _frame(5), ttl=60)
+    assert len(store.get(_query(1))[1]) == 3
+    assert _parquet_files(store.root) == [store.path(_query(1))]
+
+
+def test_evict_least_recently_used_first(store):
+    for n in (1, 2, 3):
+        store.put(_query(n), _frame(), ttl=60)
+    # 1 < 2 < 3 순으로 오래된 파일 -> 1을 읽으면 2가 가장 오래 사용하지 않은 파일
+    for age, n in ((300, 1), (200, 2), (100, 3)):
+        mtime = os.path.getmtime(store.path(_query(n))) - age
+        os.utime(store.path(_query(n)), (mtime, mtime))
+    assert store.get(_query(1))[0]
+
+    sizes = [os.path.getsize(store.path(_query(n))) for n in (1, 2, 3)]
+    store.max_bytes = sum(sizes) - 1
+    store.evict()
+    assert not os.path.exists(store.path(_query(2)))
+    assert os.path.exists(store.path(_query(1)))
+    assert os.path.exists(store.path(_query(3)))
+    stats = store.stats()
+    assert stats['evictions'] == 1
+    assert stats['files'] == 2
+    assert stats['bytes'] == sizes[0] + sizes[2]
+
+
+def test_size_counter_matches_directory(store):
+    store.max_bytes = 10 ** 9
+    for n in range(5):
+        store.put(_query(n), _frame(n + 1), ttl=60)
+    store.put(_query(0), _frame(10), ttl=60)
+    stats = store.stats()
+    files = _parquet_files(store.root)
+    assert stats['files'] == len(files) == 5
+    assert stats['bytes'] == sum(os.path.getsize(path) for path in files)
+    store.clear()
+    assert store.stats()['files'] == 0
+    assert store.stats()['bytes'] == 0
+
+
+
+@pytest.mark.parametrize('expires_at', [b'soon', b''])
+def test_bad_expiry_metadata_is_miss_and_removed(store, expires_at):
+    # 공유 디렉터리에 다른 형식으로 쓰인 파일 - 조회 오류 대신 미스
+    path = store.path(_query(1))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(pa.table({'n': [1]}).replace_schema_metadata({result_store.EXPIRES_KEY: expires_at}), path)
+    assert not store.contains(_query(1))
+    assert store.get(_query(1)) == (False, None)
+    assert not os.path.exists(path)
+    assert store.stats()['misses'] == 1
+
+
+def test_conversion_error_is_miss_and_removed(store, monkeypatch):
+    store.put(_query(1), _frame(), ttl=60)
+
+    def fail(arrow_type):
+        raise pa.ArrowInvalid("unsupported type")
+    monkeypatch.setattr(result_store.pd, 'ArrowDtype', fail)
+    assert store.get(_query(1)) == (False, None)
+    assert not os.path.exists(store.path(_query(1)))
+    assert store.stats()['misses'] == 1
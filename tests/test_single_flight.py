@@ -0,0 +1,113 @@
+# single_flight.SingleFlight - 동일 쿼리 합치기
+import threading
+
+import pandas as pd
+import pytest
+
+import single_flight
+from local_engine import LocalClient, LocalEngine
+from queries import Query
+from query_runner import run_queries
+from single_flight import SingleFlight, shared
+
+
+def _wait_in_thread(flight, call):
+    out = {}
+
+    def run():
+        try:
+            out['result'] = flight.wait(call)
+        except Exception as e:
+            out['error'] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, out
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight()
+    leader, call = flight.join('q')
+    follower, same = flight.join('q')
+    assert leader and not follower
+    assert same is call
+
+    thread, out = _wait_in_thread(flight, same)
+    df = pd.DataFrame({'revenue': [1.0, 2.0]})
+    flight.finish('q', call, result=df)
+    thread.join(timeout=5)
+    assert out['result']['revenue'].tolist() == [1.0, 2.0]
+    assert flight.stats() == {'executed': 1, 'coalesced': 1, 'in_flight': 0}
+
+    # 끝난 뒤의 호출은 새로 실행
+    assert flight.join('q')[0]
+
+
+def test_error_propagates_to_waiters():
+    flight = SingleFlight()
+    _, call = flight.join('q')
+    _, same = flight.join('q')
+    thread, out = _wait_in_thread(flight, same)
+    flight.finish('q', call, error=ValueError("quota"))
+    thread.join(timeout=5)
+    assert isinstance(out['error'], ValueError)
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_missing_result_raises():
+    flight = SingleFlight()
+    _, call = flight.join('q')
+    flight.finish('q', call)
+    with pytest.raises(RuntimeError):
+        flight.wait(call)
+
+
+def test_shared_results_are_independent():
+    df = pd.DataFrame({'type': ['Current'], 'revenue': [1.0]})
+    results = shared({'summary': df})
+    results['summary'].loc[0, 'revenue'] = 99.0
+    results['summary'].rename(columns={'type': 'period'}, inplace=True)
+    assert df['revenue'].tolist() == [1.0]
+    assert list(df.columns) == ['type', 'revenue']
+
+
+def test_deep_copy_without_copy_on_write(monkeypatch):
+    # pandas 3 미만 경로: 전역 옵션 없이 깊은 복사본
+    monkeypatch.setattr(single_flight, 'COPY_ON_WRITE', False)
+    df = pd.DataFrame({'revenue': [1.0]})
+    copy = shared(df)
+    copy.loc[0, 'revenue'] = 99.0
+    assert df['revenue'].tolist() == [1.0]
+
+
+def _query(n):
+    sql = f"SELECT {n} as n"
+    return Query(sql, sql, ())
+
+
+class _FailingStore:
+    # 두 번째 쿼리 조회에서 예외 - 첫 쿼리는 이미 직접 실행(join + 제출)한 상태
+    def get(self, query):
+        if query.sql == _query(2).sql:
+            raise ValueError("corrupt store entry")
+        return False, None
+
+
+def test_leader_finishes_when_caller_raises_after_join():
+    flight = SingleFlight()
+    client = LocalClient(LocalEngine())
+    queries = {'first': _query(1), 'second': _query(2)}
+    with pytest.raises(ValueError):
+        run_queries(client, queries, store=_FailingStore(), flight=flight)
+    assert flight.stats()['in_flight'] == 0
+
+    # 같은 쿼리를 다시 실행해도 멈추지 않음
+    out = {}
+
+    def run():
+        out['results'], out['errors'] = run_queries(client, queries, flight=flight)
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert not out['errors']
+    assert out['results']['first']['n'].tolist() == [1]
@@ -0,0 +1,67 @@
+# timeseries_store - 일별 집계 재구간화 / 누락 구간
+from datetime import date
+
+import pandas as pd
+
+from timeseries_store import DAILY_COLUMNS, TimeseriesStore, rebucket
+
+
+def _daily(rows):
+    # rows: [(date, sessions, continued_sessions, revenue, orders)]
+    return pd.DataFrame(rows, columns=DAILY_COLUMNS)
+
+
+# 2026-01-03(토) ~ 01-06(화): 주는 일요일 시작 -> 01-03은 12-28 주, 01-04부터 01-04 주
+DAILY = _daily([
+    (date(2026, 1, 3), 10, 1, 100.0, 1),
+    (date(2026, 1, 4), 20, 2, 200.0, 2),
+    (date(2026, 1, 5), 30, 3, 300.0, 3),
+    (date(2026, 1, 6), 40, 4, 400.0, 4),
+])
+
+
+def _rows(df):
+    return {row['period_label']: (row['sessions'], row['revenue'], row['orders']) for _, row in df.iterrows()}
+
+
+def test_daily_keeps_sessions():
+    assert _rows(rebucket(DAILY, 'daily')) == {
+        '2026-01-03': (10, 100.0, 1),
+        '2026-01-04': (20, 200.0, 2),
+        '2026-01-05': (30, 300.0, 3),
+        '2026-01-06': (40, 400.0, 4),
+    }
+
+
+def test_weekly_subtracts_continued_sessions_within_week():
+    # 주 첫날(01-04)의 continued_sessions는 전날이 다른 주라 빼지 않음
+    assert _rows(rebucket(DAILY, 'weekly')) == {
+        '2025-12-28': (10, 100.0, 1),
+        '2026-01-04': (20 + (30 - 3) + (40 - 4), 900.0, 9),
+    }
+
+
+def test_monthly_subtracts_continued_sessions_except_first_day():
+    # 조회 범위 첫날(01-03)의 전날은 daily에 없으므로 빼지 않음
+    assert _rows(rebucket(DAILY, 'monthly')) == {
+        '2026-01-01': (10 + (20 - 2) + (30 - 3) + (40 - 4), 1000.0, 10),
+    }
+
+
+def test_gap_day_is_not_subtracted():
+    daily = _daily([
+        (date(2026, 1, 5), 30, 3, 300.0, 3),
+        (date(2026, 1, 7), 50, 5, 500.0, 5),
+    ])
+    assert _rows(rebucket(daily, 'weekly')) == {'2026-01-04': (80, 800.0, 8)}
+
+
+def test_store_fetches_only_missing_days():
+    store = TimeseriesStore()
+    key = ('전체', False)
+    assert store.missing_range(key, date(2026, 1, 3), date(2026, 1, 6)) == (date(2026, 1, 3), date(2026, 1, 6))
+    store.update(key, date(2026, 1, 3), date(2026, 1, 5), DAILY.iloc[:2], ttl=60)
+    assert store.missing_range(key, date(2026, 1, 3), date(2026, 1, 5)) is None
+    assert store.missing_range(key, date(2026, 1, 3), date(2026, 1, 6)) == (date(2026, 1, 6), date(2026, 1, 6))
+    # 이벤트가 없던 01-05는 다시 조회하지 않고 행도 없음
+    assert store.daily(key, date(2026, 1, 3), date(2026, 1, 5))['date'].tolist() == [date(2026, 1, 3), date(2026, 1, 4)]
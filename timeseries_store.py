@@ -0,0 +1,109 @@
+# SIDIZ Dashboard - 매출 추이 증분 저장소
+# (데이터 소스, 원본/롤업) 별로 일별 집계를 보관하고, 저장되지 않았거나 만료된 일자만 BigQuery에서 다시 조회한다.
+# 확정된 일자는 CACHE_TTL_CLOSED, 최근 CACHE_OPEN_DAYS일은 CACHE_TTL_OPEN (result_cache.ttl_for와 같은 기준)
+# 주별/월별은 저장된 일별 집계를 다시 묶어서 만듦 -> 추이 분석 단위를 바꿔도 BigQuery 조회 없음
+# 세션은 일별 continued_sessions(전날에도 이벤트가 있는 세션 수)로 자정을 넘긴 세션의 중복을 빼서 구간 내 고유 세션 수를 맞춤
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from result_cache import ttl_for
+
+DAILY_COLUMNS = ['date', 'sessions', 'continued_sessions', 'revenue', 'orders']
+METRIC_COLUMNS = ['sessions', 'continued_sessions', 'revenue', 'orders']
+SERIES_COLUMNS = ['sessions', 'revenue', 'orders']
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def _days(start, end):
+    day = _as_date(start)
+    end = _as_date(end)
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+class TimeseriesStore:
+    def __init__(self):
+        # key -> {date: (만료 시각, {sessions, continued_sessions, revenue, orders} 또는 이벤트가 없는 날은 None)}
+        self._series = {}
+        self._lock = threading.Lock()
+        self.fetched_days = 0
+        self.served_days = 0
+
+    def missing_range(self, key, start, end):
+        # 저장되지 않았거나 만료된 첫 일자 ~ 마지막 일자 (모두 있으면 None) - 사이에 있는 일자까지 한 번의 쿼리로 다시 조회
+        now = time.monotonic()
+        with self._lock:
+            days = self._series.get(key, {})
+            missing = [day for day in _days(start, end) if day not in days or days[day][0] <= now]
+        return (missing[0], missing[-1]) if missing else None
+
+    def update(self, key, start, end, daily, today=None, ttl=None):
+        # daily: DAILY_COLUMNS (start~end 중 이벤트가 없는 일자는 행이 없음 -> None으로 기록해서 다시 조회하지 않음)
+        # ttl: 모든 일자에 같은 TTL (없으면 일자별 ttl_for)
+        rows = {
+            _as_date(record['date']): {col: record[col] for col in METRIC_COLUMNS}
+            for record in daily.to_dict('records')
+        }
+        now = time.monotonic()
+        with self._lock:
+            days = self._series.setdefault(key, {})
+            for day in _days(start, end):
+                days[day] = (now + (ttl if ttl is not None else ttl_for([(day, day)], today)), rows.get(day))
+                self.fetched_days += 1
+
+    def daily(self, key, start, end):
+        with self._lock:
+            days = self._series.get(key, {})
+            records = [
+                {'date': day, **days[day][1]}
+                for day in _days(start, end)
+                if day in days and days[day][1] is not None
+            ]
+            self.served_days += len(records)
+        return pd.DataFrame(records, columns=DAILY_COLUMNS)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'days': sum(len(days) for days in self._series.values()),
+                'fetched_days': self.fetched_days,
+                'served_days': self.served_days,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def rebucket(daily, group_by='daily'):
+    # 일별 집계 -> period_label(구간 시작일 'YYYY-MM-DD'), sessions, revenue, orders
+    # 주는 BigQuery DATE_TRUNC(date, WEEK)와 같이 일요일 시작
+    daily = daily.sort_values('date', ignore_index=True)
+    dates = pd.to_datetime(daily['date'])
+    if group_by == 'weekly':
+        period = dates - pd.to_timedelta((dates.dt.dayofweek + 1) % 7, unit='D')
+    elif group_by == 'monthly':
+        period = dates.dt.to_period('M').dt.start_time
+    else:
+        period = dates
+    # 전날이 같은 구간에 있는 일자의 continued_sessions는 이미 전날 sessions에 포함된 세션 -> 한 번만 셈
+    # (조회 범위 첫날의 전날 등 daily에 없는 날은 구간 밖이므로 빼지 않음)
+    prev_period = period.shift(1).where(dates.diff() == pd.Timedelta(days=1))
+    counted = daily['sessions'] - daily['continued_sessions'].where(period == prev_period, 0)
+    return (
+        daily[SERIES_COLUMNS]
+        .assign(sessions=counted, period_label=period.dt.strftime('%Y-%m-%d'))
+        .groupby('period_label', as_index=False)[SERIES_COLUMNS].sum()
+    )
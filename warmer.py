@@ -0,0 +1,200 @@
+# SIDIZ Dashboard - 기본 기간 캐시 워머
+# 대부분의 사용자는 기본 기간(최근 7일 vs 그 전 7일)으로 대시보드를 연다.
+# GA4 일별 export(어제 샤드)가 들어오면 세 가지 데이터 소스의 요약/일별 추이와 인사이트/대량 구매 상세를 미리 조회해 둔다.
+#
+#   python warmer.py            # cron: 어제 샤드가 있으면 한 번 실행 (없으면 종료 코드 1 -> 다음 cron에서 다시 시도)
+#   python warmer.py --force    # export 확인 없이 실행
+#
+# 앱 안에서는 start_thread()로 실행해서 앱 프로세스의 결과 캐시(ResultCache)/추이 저장소(TimeseriesStore)를 직접 채운다.
+# cron처럼 별도 프로세스에서 실행하면 앱 메모리 캐시는 채울 수 없지만, 쿼리 결과는 결과 저장소(result_store.py,
+# SIDIZ_RESULT_STORE_DIR)에 기록되므로 같은 디렉터리를 쓰는 앱은 BigQuery를 다시 조회하지 않는다.
+# 저장소를 쓰지 않아도 앱과 같은 SQL + 파라미터로 실행하므로 BigQuery 결과 캐시(24시간)에는 남는다.
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import config
+from dashboard_data import (
+    DATA_SOURCES,
+    bulk_detail_queries,
+    bulk_summary_queries,
+    choose_sources,
+    covers,
+    dashboard_queries,
+    default_periods,
+    insight_queries,
+    mirror_covers,
+    postprocess_insight,
+    purchase_items_cover,
+    rollup_enabled,
+    script_query,
+    split_script_results,
+    timeseries_queries,
+)
+from queries import SCRIPT_SECTIONS
+from query_runner import cli_client, run_queries, run_script
+from result_cache import query_key
+from result_store import open_store
+from rollups import list_source_shards, rollup_coverage
+
+
+def coverage_lookup(client):
+    # 한 번의 warm() 동안 테이블별 적재 일자 조회 결과를 재사용 (app.get_rollup_coverage와 같은 기준)
+    loaded = {}
+
+    def coverage(name):
+        if name not in loaded:
+            try:
+                loaded[name] = rollup_coverage(client, name) if rollup_enabled(name) else []
+            except Exception:
+                loaded[name] = []
+        return loaded[name]
+    return coverage
+
+
+def export_landed(client, day):
+    # day 샤드(events_YYYYMMDD)의 last_modified (아직 없으면 None)
+    suffix = day.strftime('%Y%m%d')
+    return list_source_shards(client, suffix, suffix).get(suffix)
+
+
+def _run(client, queries, label, log, record=None, result_store=None, ttl=None, flight=None):
+    results, errors = run_queries(client, queries, record=record, store=result_store, ttl=ttl, flight=flight)
+    for name, e in errors.items():
+        log(f"[warmer] {label} {name} 실패: {e}")
+    return None if errors else results
+
+
+def warm(client, cache=None, store=None, today=None, overwrite=False, log=print, result_store=None, flight=None):
+    # cache/store가 없으면 쿼리만 실행 (BigQuery 결과 캐시 + result_store만 채움)
+    # overwrite일 때는 result_store를 읽지 않고 다시 조회해서 덮어씀
+    # flight: 앱 프로세스의 SingleFlight - 워밍 중에 같은 쿼리를 조회한 세션은 워머의 job 결과를 함께 사용
+    # 캐시 키/쿼리 선택은 app.py의 load_* 함수와 동일 - 이미 캐시에 있으면 건너뜀 (overwrite: 재export 시 다시 조회)
+    # 어제 export가 들어온 뒤에 실행되므로 기간 전체를 확정된 일자로 보고 CACHE_TTL_CLOSED로 저장
+    today = today or datetime.now().date()
+    (start_c, end_c), (start_p, end_p) = default_periods(today)
+    coverage = coverage_lookup(client)
+    sources = choose_sources(coverage, start_c, end_c, start_p, end_p)
+    ttl = config.CACHE_TTL_CLOSED
+    writer = _Overwrite(result_store) if overwrite and result_store is not None else result_store
+    # 구매 품목 테이블이 있으면 앱은 대량 구매 요약/상세를 그 테이블에서 따로 조회 (app.separate_bulk - 기본 기준)
+    purchase_items = purchase_items_cover(coverage, start_c, end_c, start_p, end_p)
+    # 실제로 실행한 BigQuery job (result_store에 있던 쿼리는 제외)
+    executed = []
+
+    def warm_cached(kind, queries, extract):
+        key = query_key(kind, queries)
+        if cache is not None and not overwrite and cache.contains(key):
+            return
+        results = _run(client, queries, kind, log, executed, writer, ttl, flight)
+        if results is not None and cache is not None:
+            cache.put(key, extract(results), ttl)
+
+    def warm_script(script):
+        # 스크립트 모드 (app.load_script_data와 같은 키) - 요약/추이/인사이트/대량 구매 상세를 한 번에
+        key = query_key('script', {'script': script})
+        if cache is not None and not overwrite and cache.contains(key):
+            return
+        results, errors = run_script(client, script, SCRIPT_SECTIONS, record=executed, store=writer, ttl=ttl, flight=flight)
+        for name, e in errors.items():
+            log(f"[warmer] script {name} 실패: {e}")
+        if not errors and cache is not None:
+            cache.put(key, split_script_results(results), ttl)
+
+    scripted = False
+    for data_source in DATA_SOURCES:
+        if purchase_items:
+            warm_cached(
+                'bulk_summary',
+                bulk_summary_queries(start_c, end_c, start_p, end_p, data_source, purchase_items=True),
+                lambda results: results['bulk_summary'],
+            )
+
+        script = script_query(start_c, end_c, start_p, end_p, data_source, **sources)
+        if script is not None:
+            warm_script(script)
+            scripted = True
+            continue
+
+        warm_cached(
+            'dashboard',
+            dashboard_queries(start_c, end_c, start_p, end_p, data_source, **sources),
+            lambda results: results['summary'],
+        )
+
+        use_rollup = covers(coverage('session_daily'), start_c, end_c, start_c, end_c)
+        key = (data_source, use_rollup)
+        if store is None or overwrite or store.missing_range(key, start_c, end_c) is not None:
+            queries = timeseries_queries(start_c, end_c, data_source, use_rollup, mirror_covers(coverage, start_c, end_c))
+            results = _run(client, queries, 'timeseries', log, executed, writer, ttl, flight)
+            if results is not None and store is not None:
+                store.update(key, start_c, end_c, results['timeseries'], ttl=ttl)
+
+    # 인사이트/대량 구매 상세는 데이터 소스와 무관 (스크립트 모드는 스크립트에 포함 - 구매 품목 테이블이 있으면 상세는 따로)
+    if not scripted:
+        warm_cached(
+            'insight',
+            insight_queries(start_c, end_c, start_p, end_p, sources['use_rollup'], sources['use_sketches'], sources['mirrored']),
+            postprocess_insight,
+        )
+    if not scripted or purchase_items:
+        warm_cached(
+            'bulk_detail',
+            bulk_detail_queries(start_c, end_c, mirror_covers(coverage, start_c, end_c),
+                                purchase_items=purchase_items_cover(coverage, start_c, end_c)),
+            lambda results: results['bulk_detail'],
+        )
+    log(f"[warmer] {start_c}~{end_c} vs {start_p}~{end_p}: 쿼리 {len(executed)}개 실행")
+    return len(executed)
+
+
+class _Overwrite:
+    # 재export 후 warm: 저장된 결과는 읽지 않고 새 결과로 덮어씀
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, query):
+        return False, None
+
+    def put(self, query, df, ttl):
+        self.store.put(query, df, ttl)
+
+
+def start_thread(client, cache, store, interval=None, log=print, result_store=None, flight=None):
+    # interval마다 어제 샤드 적재 여부 확인 -> 새로 적재됐거나 다시 export됐으면 warm()
+    def loop():
+        warmed_for = None
+        while True:
+            try:
+                today = datetime.now().date()
+                landed = export_landed(client, today - timedelta(days=1))
+                if landed is not None and warmed_for != (today, landed):
+                    reexported = warmed_for is not None and warmed_for[0] == today
+                    warm(client, cache, store, today, overwrite=reexported, log=log, result_store=result_store, flight=flight)
+                    warmed_for = (today, landed)
+            except Exception as e:
+                log(f"[warmer] 오류: {e}")
+            time.sleep(interval or config.WARMER_INTERVAL)
+
+    thread = threading.Thread(target=loop, name='sidiz-cache-warmer', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SIDIZ 대시보드 기본 기간 캐시 워머")
+    parser.add_argument('--force', action='store_true', help="어제 export 적재 여부를 확인하지 않고 실행")
+    args = parser.parse_args()
+
+    client = cli_client()
+    yesterday = datetime.now().date() - timedelta(days=1)
+    if not args.force and export_landed(client, yesterday) is None:
+        print(f"[warmer] {yesterday:%Y%m%d} export가 아직 없음")
+        sys.exit(1)
+    warm(client, result_store=open_store())
+
+
+if __name__ == '__main__':
+    main()